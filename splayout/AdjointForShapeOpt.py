@@ -65,7 +65,7 @@ class AdjointForShapeOpt:
         """
         fdtd_engine.switch_to_layout()
         fdtd_engine.eval("{0} = cell({1});".format(data_name, params.size))
-        fdtd_engine.lumapi.putDouble(fdtd_engine.fdtd.handle, "dx", dx * 1e-6)
+        fdtd_engine.fdtd.putv("dx", dx * 1e-6)
         fdtd_engine.fdtd.redrawoff()
         for i, param in enumerate(params):
             perturbed_params = params.copy()
@@ -117,7 +117,7 @@ class AdjointForShapeOpt:
                 forward_field_name) +
             "    }" +
             "}")
-        partial_fom = fdtd_engine.lumapi.getVar(fdtd_engine.fdtd.handle, 'partial_fom_derivs_vs_lambda')
+        partial_fom = fdtd_engine.fdtd.getv('partial_fom_derivs_vs_lambda')
         return partial_fom
 
     def call_fom(self, params):
@@ -187,7 +187,7 @@ class AdjointForShapeOpt:
         epsilon_diff_name = self.cal_epsilon_diff_in_CAD(self.fdtd_engine, self.design_region, params,
                                                                       self.forward_epsilon_name, "epsilon_diff", self.dx)
 
-        self.fdtd_engine.lumapi.putMatrix(self.fdtd_engine.fdtd.handle, "scaling_factor", scaling_factor)
+        self.fdtd_engine.fdtd.putv("scaling_factor", scaling_factor)
         partial_fom = self.cal_partial_fom_in_CAD(self.fdtd_engine, self.forward_field_name, self.adjoint_field_name,
                                                         "scaling_factor", epsilon_diff_name)
 
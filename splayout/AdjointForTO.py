@@ -1,8 +1,13 @@
 from splayout.utils import *
 from splayout.TopologyOptRegion3D import TopologyOptRegion3D
+from splayout.fieldtransfer import complex_einsum
+import itertools
 import numpy as np
 import scipy.constants
 
+## numbers of the CAD variables that keep the forward fields, one for every AdjointForTO object
+_forward_field_numbers = itertools.count()
+
 class AdjointForTO:
     """
     Adjoint Method for Topology Optimization.
@@ -23,8 +28,17 @@ class AdjointForTO:
         Source names for Adjoint simulation.
     y_antisymmetric : Bool or Int
         Whether set y-axis antisymmetric in the simulation(default: 0).
+    chunk : Int
+        Number of frequency points in every field chunk for the gradient, None means the whole fields are transferred
+        at once. With chunk, the forward field is kept in CAD and dF_dEps is accumulated chunk by chunk, so the memory
+        scales with the chunk size instead of the number of frequency points (default: None).
+
+    Notes
+    -----
+    With chunk, the forward field is kept in the CAD variable named by forward_field_name, which is unique for every
+    object, so several adjoint problems can share one FDTDSimulation.
     """
-    def __init__(self,fdtd_engine, fom_monitor_name, target_fom, design_region, forward_source_name, backward_source_name, sim_name = "Adjoint", y_antisymmetric = 0):
+    def __init__(self,fdtd_engine, fom_monitor_name, target_fom, design_region, forward_source_name, backward_source_name, sim_name = "Adjoint", y_antisymmetric = 0, chunk = None):
         self.fdtd_engine = fdtd_engine
         self.design_region = design_region
         self.fom_monitor_name = fom_monitor_name
@@ -33,6 +47,8 @@ class AdjointForTO:
         self.backward_source_name = backward_source_name
         self.sim_name = sim_name
         self.y_antisymmetric = y_antisymmetric
+        self.chunk = chunk
+        self.forward_field_name = "ForwardField{}".format(next(_forward_field_numbers))
         self.multi_target_flag = 0
         if (type(fom_monitor_name) == list or type(target_fom) == list or type(forward_source_name) == list or type(backward_source_name) == list):
             if (len(fom_monitor_name) == len(target_fom) == len(forward_source_name) == len(backward_source_name)):
@@ -50,20 +66,28 @@ class AdjointForTO:
         Parameters
         ----------
         params : Array
-            Parameters for the structure.
+            Parameters for the structure, the parameter matrix of the design region, size: (x_size, y_size), or its
+            parameter vector, size: (get_dof(),).
 
         Returns
         -------
         - self.fom : Float
             Figure of Merit (Lower, better).
         """
-        params = np.reshape(params,(self.design_region.get_x_size(),self.design_region.get_y_size()))
+        if (type(self.design_region) == TopologyOptRegion3D):
+            params = np.reshape(params,(self.design_region.get_x_size(),self.design_region.get_y_size()))
+        else:
+            params = self.design_region.expand_parameters(params)
         self.fdtd_engine.switch_to_layout()
         self.fdtd_engine.set_enable(self.forward_source_name)
         self.fdtd_engine.set_disable(self.backward_source_name)
         self.design_region.update(params)
         self.fdtd_engine.run(self.sim_name)
-        self.forward_field = self.design_region.get_E_distribution()
+        if (type(self.chunk) == type(None)):
+            self.forward_field = self.design_region.get_E_distribution()
+        else:
+            self.forward_field = None
+            self.design_region.get_E_distribution_in_CAD(self.forward_field_name)
         wavelength = self.fdtd_engine.get_wavelength()
         wavelength_range = wavelength.max() - wavelength.min()
         if (not self.multi_target_flag):
@@ -106,14 +130,21 @@ class AdjointForTO:
         Parameters
         ----------
         params : Array
-            Parameters for the structure.
+            Parameters for the structure, the parameter matrix of the design region, size: (x_size, y_size), or its
+            parameter vector, size: (get_dof(),).
 
         Returns
         -------
         - T_fwd_partial_derivs: Array
-            Gradients.
+            Gradients with respect to the flattened parameter matrix, with y_antisymmetric only the upper half in y is
+            covered, size: (x_size * (y_size - int(y_size/2)),). When the symmetry of the design region is set, the
+            gradients with respect to its parameter vector (the upper half is mirrored to the whole region first with
+            y_antisymmetric), size: (get_dof(),).
         """
-        params = np.reshape(params, (self.design_region.get_x_size(), self.design_region.get_y_size()))
+        if (type(self.design_region) == TopologyOptRegion3D):
+            params = np.reshape(params, (self.design_region.get_x_size(), self.design_region.get_y_size()))
+        else:
+            params = self.design_region.expand_parameters(params)
         self.fdtd_engine.switch_to_layout()
         self.fdtd_engine.set_disable(self.forward_source_name)
         if (not self.multi_target_flag):
@@ -124,22 +155,25 @@ class AdjointForTO:
             adjoint_source_power = self.fdtd_engine.get_source_power(self.backward_source_name)
             scaling_factor = np.conj(self.phase_prefactors) * omega * 1j / np.sqrt(adjoint_source_power)
 
-            if (type(self.design_region) == TopologyOptRegion3D):
+            if (type(self.chunk) != type(None)):
+                dF_dEps = self.__accumulate_dF_dEps(scaling_factor)
+            elif (type(self.design_region) == TopologyOptRegion3D):
                 self.adjoint_field, x_list, y_list, z_list = self.design_region.get_E_distribution(if_get_spatial=1)
                 # gradient_field = 2.0 * self.design_region.x_mesh * 1e-6 * self.design_region.y_mesh * 1e-6 * scipy.constants.epsilon_0 *\
                 #                  scipy.integrate.simps(self.forward_field * self.adjoint_field,z_list, axis=2)*1e6
                 cell = self.design_region.x_mesh * 1e-6 * self.design_region.y_mesh * 1e-6 * self.design_region.z_mesh * 1e-6
-                gradient_field =np.sum( np.sum(2.0 *cell * scipy.constants.epsilon_0 *self.forward_field * self.adjoint_field, axis=4), axis=2 )
+                gradient_field = 2.0 * cell * scipy.constants.epsilon_0 * complex_einsum("xyzfc,xyzfc->xyf", self.forward_field, self.adjoint_field)
                 # gradient_field =np.mean( np.sum(2.0 *cell * scipy.constants.epsilon_0 *self.forward_field * self.adjoint_field, axis=4), axis=2 )
                 dF_dEps = gradient_field
             else:
                 self.adjoint_field = self.design_region.get_E_distribution()
-                gradient_field = 2.0 * self.design_region.x_mesh*1e-6 * self.design_region.y_mesh*1e-6 * scipy.constants.epsilon_0 *self.forward_field * self.adjoint_field
-                dF_dEps = np.squeeze(np.sum(gradient_field, axis=-1), axis=2)
+                gradient_field = 2.0 * self.design_region.x_mesh*1e-6 * self.design_region.y_mesh*1e-6 * scipy.constants.epsilon_0 * complex_einsum("xyzfc,xyzfc->xyzf", self.forward_field, self.adjoint_field)
+                dF_dEps = np.squeeze(gradient_field, axis=2)
 
 
-            for wl in range(0, len(omega)):
-                dF_dEps[:,:, wl] = dF_dEps[:,:, wl]*scaling_factor[wl]
+            if (type(self.chunk) == type(None)):
+                for wl in range(0, len(omega)):
+                    dF_dEps[:,:, wl] = dF_dEps[:,:, wl]*scaling_factor[wl]
 
             if (self.y_antisymmetric):
                 dF_dEps = np.real(dF_dEps)[:, int(dF_dEps.shape[1]/2):, :]
@@ -180,15 +214,18 @@ class AdjointForTO:
                 self.fdtd_engine.set_disable(self.backward_source_name)
                 self.fdtd_engine.set_enable(self.backward_source_name[i])
                 self.fdtd_engine.run(self.sim_name)
-                self.adjoint_field = self.design_region.get_E_distribution()
                 omega = self.fdtd_engine.get_omega()
                 adjoint_source_power = self.fdtd_engine.get_source_power(self.backward_source_name[i])
                 scaling_factor = np.conj(self.phase_prefactors[i]) * omega * 1j / np.sqrt(adjoint_source_power)
-                gradient_field = 2.0 * self.design_region.x_mesh * 1e-6 * self.design_region.y_mesh * 1e-6 * scipy.constants.epsilon_0 * self.forward_field * self.adjoint_field
-                dF_dEps = np.squeeze(np.sum(gradient_field, axis=-1), axis=2)
+                if (type(self.chunk) != type(None)):
+                    dF_dEps = self.__accumulate_dF_dEps(scaling_factor)
+                else:
+                    self.adjoint_field = self.design_region.get_E_distribution()
+                    gradient_field = 2.0 * self.design_region.x_mesh * 1e-6 * self.design_region.y_mesh * 1e-6 * scipy.constants.epsilon_0 * complex_einsum("xyzfc,xyzfc->xyzf", self.forward_field, self.adjoint_field)
+                    dF_dEps = np.squeeze(gradient_field, axis=2)
 
-                for wl in range(0, len(omega)):
-                    dF_dEps[:, :, wl] = dF_dEps[:, :, wl] * scaling_factor[wl]
+                    for wl in range(0, len(omega)):
+                        dF_dEps[:, :, wl] = dF_dEps[:, :, wl] * scaling_factor[wl]
 
                 if (self.y_antisymmetric):
                     dF_dEps = np.real(dF_dEps)[:, int(dF_dEps.shape[1] / 2):, :]
@@ -224,8 +261,40 @@ class AdjointForTO:
                 self.grad_list.append(T_fwd_partial_derivs)
             T_fwd_partial_derivs = np.sum(np.array(self.grad_list), axis=0)
 
+        if (type(self.design_region) != TopologyOptRegion3D and type(self.design_region.symmetry) != type(None)):
+            T_fwd_partial_derivs = self.design_region.reduce_gradient(self.__unfold_gradient(T_fwd_partial_derivs))
         return - T_fwd_partial_derivs
 
+    def __unfold_gradient(self, gradient):
+        x_size = self.design_region.get_x_size()
+        y_size = self.design_region.get_y_size()
+        if (np.size(gradient) == x_size * y_size):
+            return np.reshape(gradient, (x_size, y_size))
+        ## with y_antisymmetric, the gradient only covers the upper half in y, the lower half is its mirror image
+        half = y_size - int(y_size / 2)
+        if (self.y_antisymmetric and np.size(gradient) == x_size * half):
+            gradient = np.reshape(gradient, (x_size, half))
+            return np.concatenate((gradient[:, ::-1][:, 0:int(y_size / 2)], gradient), axis=1)
+        raise Exception("Size of the gradient does not match the design region!")
+
+    def __accumulate_dF_dEps(self, scaling_factor):
+        cell = self.design_region.x_mesh * 1e-6 * self.design_region.y_mesh * 1e-6
+        if (type(self.design_region) == TopologyOptRegion3D):
+            cell = cell * self.design_region.z_mesh * 1e-6
+        forward_chunks = self.fdtd_engine.iter_E_distribution_in_CAD(data_name=self.forward_field_name, chunk=self.chunk)
+        adjoint_chunks = self.design_region.iter_E_distribution(chunk=self.chunk)
+        dF_dEps = None
+        try:
+            for (frequency_slice, forward_field), (adjoint_slice, adjoint_field) in zip(forward_chunks, adjoint_chunks):
+                if (type(dF_dEps) == type(None)):
+                    dF_dEps = np.zeros(forward_field.shape[0:2] + (len(scaling_factor),), dtype=complex)
+                dF_dEps[:, :, frequency_slice] = 2.0 * cell * scipy.constants.epsilon_0 * scaling_factor[frequency_slice] *\
+                                                 complex_einsum("xyzfc,xyzfc->xyf", forward_field, adjoint_field)
+        finally:
+            forward_chunks.close()
+            adjoint_chunks.close()
+        return dF_dEps
+
     def reset_fom_monitor_name(self, fom_monitor_name):
         """
         Rest fom monitor for deriving FoM.
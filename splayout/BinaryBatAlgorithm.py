@@ -2,10 +2,11 @@
 ## Reference: Mirjalili, S., Mirjalili, S.M. & Yang, XS. Binary bat algorithm. Neural Comput &
 ##            Applic 25, 663–681 (2014). https://doi.org/10.1007/s00521-013-1525-5
 #####################################################################################################
+from splayout.BinaryOptimizer import BinaryOptimizer
 import numpy as np
 import math
 
-class BinaryBatAlgorithm:
+class BinaryBatAlgorithm(BinaryOptimizer):
     """
     Binary Bat Algorithm.
 
@@ -17,6 +18,7 @@ class BinaryBatAlgorithm:
         Length of a single solution.
     cost_function : func
         Cost function for evaluating a single solution, input: Array, size (loS,), output: Float, lower means better .
+        It can be None when the solutions are evaluated outside and given back with "tell" (see BinaryOptimizer).
     max_iteration : Int
         Maximum of iterations (default: 500).
     callback_function : func
@@ -25,123 +27,147 @@ class BinaryBatAlgorithm:
         Loudness in Binary Bat Algorithm (default: 0.25).
     pulse_rate : Float
         Pulse rate in Binary Bat Algorithm (default: 0.1).
+    executor : Executor
+        Object with "map(cost_function, candidates)" for evaluating every iteration in parallel, e.g.
+        concurrent.futures.ThreadPoolExecutor or SimulationPool with pass_engine=False (default: None).
+    batch_cost_function : func
+        Cost function for evaluating all the solutions of an iteration at once, input: Array, size (noS,loS),
+        output: Array, size (noS,). cost_function can be None when it is specified (default: None).
+    synchronous : Bool
+        Whether all the bats of an iteration move towards the best solution found before the iteration, so that the
+        iteration can be evaluated as one batch (default: None, means True when executor or batch_cost_function is
+        specified).
+
+    Notes
+    -----
+    The move of a bat is computed for all its bits at once, with a new frequency for every bit (Equation 3), the
+    velocity update (Equation 1), the V-shaped transfer function and the pulse rate applied element-wise. The bats
+    always take their new solutions, while their stored costs are only replaced when the new cost is not higher and the
+    loudness test passes.
+
+    By default the bats move and are evaluated one after another, every bat moves towards the best solution updated by
+    the bats before it, and "ask()" returns one bat, size: (1,loS). With synchronous=True the whole population moves
+    at once towards the best solution found before the iteration and "ask()" returns all the bats, size: (noS,loS).
+    The best solution is then only updated once per iteration, which usually slows down the convergence per iteration,
+    in exchange for evaluating the population in parallel.
     """
-    def __init__(self, noS , loS, cost_function , max_iteration = 500,callback_function=None ,loudness = 0.25, pulse_rate = 0.1):
-        self.max_iteration = max_iteration
+    def __init__(self, noS , loS, cost_function , max_iteration = 500,callback_function=None ,loudness = 0.25, pulse_rate = 0.1, executor = None, batch_cost_function = None, synchronous = None):
+        BinaryOptimizer.__init__(self, loS, cost_function, max_iteration, callback_function, executor, batch_cost_function)
         self.noS = noS
-        self.loS = loS
         self.loudness = loudness
         self.pulse_rate = pulse_rate
-        self.cost_function = cost_function
+        if (type(synchronous) == type(None)):
+            synchronous = (type(executor) != type(None) or type(batch_cost_function) != type(None))
+        self.synchronous = synchronous
         ## some default parameters
         self.__Qmin = 0
         self.__Qmax = 2
         self.__N_iter = 0
         ## initial arrays
-        self.__Q = np.zeros((noS,1)) # Frequency
+        self.__Q = np.zeros((noS,loS)) # Frequency
         self.__v = np.zeros((noS,loS)) # Velocities
         self.__Sol = np.random.randint(0,2,size=(noS,loS)) # Initialize the solutions
         self.cg_curve = np.zeros((max_iteration))
         self.__cost = np.zeros((noS,1)) ## the cost of the population, the lower , the better (1 - FoM)
-        self.__engine_flag = 0
-        self.__iter = 0
-        self.best_solution = np.zeros((1,loS))
-        self.min_cost = math.inf
         self.__min_position = math.inf
-        self.engine_init()
-        if (callback_function == None):
-            def call_back():
-                pass
-            self.call_back = call_back
-        else:
-            self.call_back = callback_function
-
-    def engine_init(self):
-        """
-        Initialize the Binary Bat Algorithm, evaluate the first iteration.
-        """
-        for i in range(0, self.noS):
-            self.__cost[i] = self.cost_function(self.__Sol[i, :])
-        self.min_cost = np.min(self.__cost, axis=0)[0]
-        self.__min_position = np.argmin(self.__cost, axis=0)[0]
-        self.best_solution = self.__Sol[self.__min_position, :].copy()
+        self.__bat = 0
+        if (type(cost_function) != type(None) or type(batch_cost_function) != type(None)):
+            self.engine_init()
 
-        ## Initialize the iteration
-        self.__iter = 0
-        self.__engine_flag = 1
-
-    def run(self):
-        """
-        Run the engine.
-        """
-        if(self.__engine_flag == 0):
-            raise Exception("Engine has not been initialized, run: \"obj.engine_init()\" first")
-        while (self.__iter < self.max_iteration):
-            self.cg_curve[self.__iter] = self.min_cost
-            self.__iter += 1
-            for i in range(0,self.noS):
-                ## create a temporal solution
-                temp_solution = self.__Sol[i,:]
-                for j in range(0,self.loS):
-                    self.__Q[i] = self.__Qmin + (self.__Qmin - self.__Qmax)*np.random.rand() # Equation 3
-                    self.__v[i,j] = self.__v[i,j] + (temp_solution[j] - self.best_solution[j]) * self.__Q[i] # Equation 1
-
-                    V_shaped_transfer_function = abs((2/math.pi)*math.atan((math.pi/2)*self.__v[i,j]))
-
-                    if np.random.rand() < V_shaped_transfer_function :
-                        temp_solution[j] = (temp_solution[j] + 1 ) %2
-
-                    if np.random.rand() > self.pulse_rate:
-                        temp_solution[j] = self.best_solution[j].copy()
-
-                ## Calculate the cost
-                new_cost =  self.cost_function(temp_solution)
-                if (new_cost <= self.__cost[i]) and (np.random.rand() < self.loudness):
-                    self.__Sol[i,:] = temp_solution
-                    self.__cost[i] = new_cost
-
-                # Ppdate the current best
-                if new_cost <= self.min_cost:
-                    self.best_solution = temp_solution.copy()
-                    self.min_cost = new_cost
-
-            ## Call back function
-            self.call_back()
-
-        self.__engine_flag = 0
-
-    def get_iteration_number(self):
+    def initial_candidates(self):
         """
-        Get the temporal iteration number.
+        Get the initial solutions.
 
         Returns
         -------
-        out : Int
-            Iteration number.
+        out : Array
+            Initial solutions, size: (noS,loS).
         """
-        return self.__iter
+        return self.__Sol.copy()
 
-    def get_min_cost(self):
+    def initialize(self, candidates, costs):
         """
-        Get the temporal minimum of cost.
-
-        Returns
-        -------
-        out : Float
-            Minimum of cost.
+        Initialize the bats with the costs of the initial solutions.
+
+        Parameters
+        ----------
+        candidates : Array
+            Initial solutions, size: (noS,loS).
+        costs : Array
+            Costs of the solutions, size: (noS,).
         """
-        return self.min_cost
+        self.__Sol = candidates.copy()
+        self.__cost[:, 0] = costs
+        self.min_cost = np.min(self.__cost, axis=0)[0]
+        self.__min_position = np.argmin(self.__cost, axis=0)[0]
+        self.best_solution = self.__Sol[self.__min_position, :].copy()
 
-    def get_best_solution(self):
+        ## Initialize the iteration
+        self.iteration = 0
+        self.__bat = 0
+
+    def propose(self):
         """
-        Get the temporal best solution.
+        Move the next bat, or all the bats with synchronous=True.
 
         Returns
         -------
         out : Array
-            Best solution.
+            Candidates, size: (1,loS), or (noS,loS) with synchronous=True.
+        """
+        return self.__move(self.__get_moving_bats())
+
+    def update(self, candidates, costs):
+        """
+        Update the bats with the costs of the moved solutions.
+
+        Parameters
+        ----------
+        candidates : Array
+            Candidates from propose, size: (1,loS), or (noS,loS) with synchronous=True.
+        costs : Array
+            Costs of the candidates, size: (1,), or (noS,) with synchronous=True.
         """
-        return self.best_solution
+        if (self.__bat == 0 and self.iteration < self.max_iteration):
+            self.cg_curve[self.iteration] = self.min_cost
+        self.__accept(self.__get_moving_bats(), candidates, costs)
+        if (not self.synchronous and self.__bat < self.noS - 1):
+            self.__bat += 1
+            return
+        self.__bat = 0
+        self.iteration += 1
+
+        ## Call back function
+        self.call_back()
+
+    def __get_moving_bats(self):
+        ## a slice, so that the rows of the moving bats are views and one bat is moved without copying the arrays
+        if self.synchronous:
+            return slice(0, self.noS)
+        return slice(self.__bat, self.__bat + 1)
+
+    def __move(self, bats):
+        Sol = self.__Sol[bats]
+        v = self.__v[bats]
+        Q = self.__Q[bats]
+        Q[...] = self.__Qmin + (self.__Qmin - self.__Qmax)*np.random.rand(*Sol.shape) # Equation 3
+        v += (Sol - self.best_solution) * Q # Equation 1
+
+        V_shaped_transfer_function = np.abs((2/math.pi)*np.arctan((math.pi/2)*v))
+
+        temp_solutions = np.where(np.random.rand(*Sol.shape) < V_shaped_transfer_function, 1 - Sol, Sol)
+        Sol[...] = np.where(np.random.rand(*Sol.shape) > self.pulse_rate, self.best_solution, temp_solutions)
+        return Sol.copy()
+
+    def __accept(self, bats, temp_solutions, new_costs):
+        accepted = (new_costs <= self.__cost[bats, 0]) & (np.random.rand(len(new_costs)) < self.loudness)
+        self.__cost[np.arange(self.noS)[bats][accepted], 0] = new_costs[accepted]
+
+        # Ppdate the current best (the last bat with the minimum cost, as in the sequential update)
+        best_position = len(new_costs) - 1 - np.argmin(new_costs[::-1])
+        if new_costs[best_position] <= self.min_cost:
+            self.best_solution = temp_solutions[best_position, :].copy()
+            self.min_cost = new_costs[best_position]
 
     def get_total_solutions(self):
         """
@@ -4,10 +4,11 @@
 ## NCSUIE-TR-95-09. North Carolina State University, Raleigh, NC, USA. 22.
 ## (2) https://github.com/bigzhao/Binary-Genetic-Algorithm/
 ##########################################################################
+from splayout.BinaryOptimizer import BinaryOptimizer
 import numpy as np
 import math
 
-class BinaryGeneticAlgorithm:
+class BinaryGeneticAlgorithm(BinaryOptimizer):
     """
     Binary Genetic Algorithm.
     Parameters
@@ -18,152 +19,206 @@ class BinaryGeneticAlgorithm:
         Length of a single solution.
     cost_function : func
         Cost function for evaluating a single solution, input: Array, size (loS,), output: Float, lower means better .
+        It can be None when the solutions are evaluated outside and given back with "tell" (see BinaryOptimizer).
     max_iteration : Int
         Maximum of iterations (default: 500).
     callback_function : func
         Self-defined callback function that will be called after every iteration (default: None).
     p_crossover : Float
-        Probability of crossover (default: 0.8).
+        Probability of crossover (default: 0.9).
     p_mutation : Float
-        Probability of mutation (default: 0.2).
+        Probability of mutation (default: 0.005).
+    executor : Executor
+        Object with "map(cost_function, candidates)" for evaluating every iteration in parallel, e.g.
+        concurrent.futures.ThreadPoolExecutor or SimulationPool with pass_engine=False (default: None).
+    batch_cost_function : func
+        Cost function for evaluating all the solutions of an iteration at once, input: Array, size (noS,loS),
+        output: Array, size (noS,). cost_function can be None when it is specified (default: None).
+    crossover_type : String
+        "one_point" or "uniform" crossover (default: "one_point").
+
+    Notes
+    -----
+    A generation is built on the whole population array: the parents of all the pairs are drawn with one roulette
+    wheel selection, and crossover and mutation (one flipped bit in both children of a pair) are applied with boolean
+    masks. The worst solution of the new generation is replaced by the best solution so far (elitism).
+
+    Three details differ from the earlier loop over the pairs:
+    the elite solution is given the minimum cost (the earlier loop stored the index of the best solution as its cost),
+    an odd noS keeps the population size (the last pair has only its first child kept, the earlier loop dropped one
+    solution every iteration), and the replaced worst solution is the first one with the maximum cost (np.argmax).
     """
-    def __init__(self, noS , loS, cost_function , max_iteration = 500,callback_function=None ,p_crossover = 0.9, p_mutation = 0.005):
-        self.max_iteration = max_iteration
-        self.loS = loS
+    def __init__(self, noS , loS, cost_function , max_iteration = 500,callback_function=None ,p_crossover = 0.9, p_mutation = 0.005, executor = None, batch_cost_function = None, crossover_type = "one_point"):
+        BinaryOptimizer.__init__(self, loS, cost_function, max_iteration, callback_function, executor, batch_cost_function)
         self.p_crossover = p_crossover
         self.p_mutation = p_mutation
-        self.cost_function = cost_function
+        if (crossover_type != "one_point" and crossover_type != "uniform"):
+            raise Exception("Wrong crossover type!")
+        self.crossover_type = crossover_type
         self.__Sol = np.random.randint(0,2,size=(noS,loS)) # Initialize the solutions
         self.cg_curve = np.zeros((max_iteration))
         self.__cost = np.zeros(noS) ## the cost of the population, the lower , the better (1 - FoM)
-        self.__engine_flag = 0
-        self.__iter = 0
-        self.best_solution = np.zeros((1,loS))
-        self.min_cost = math.inf
         self.__min_position = math.inf
-        self.engine_init()
-        if (callback_function == None):
-            def call_back():
-                pass
-            self.call_back = call_back
-        else:
-            self.call_back = callback_function
-
-    def engine_init(self):
-        """
-        Initialize the Binary Genetic Algorithm, evaluate the first iteration.
-        """
-        for i in range(0, self.__Sol.shape[0]):
-            self.__cost[i] = self.cost_function(self.__Sol[i, :])
-        self.min_cost = np.min(self.__cost, axis=0)
-        self.__min_position = np.argmin(self.__cost, axis=0)
-        self.best_solution = self.__Sol[self.__min_position, :].copy()
+        if (type(cost_function) != type(None) or type(batch_cost_function) != type(None)):
+            self.engine_init()
 
-        ## Initialize the iteration
-        self.__iter = 0
-        self.__engine_flag = 1
-
-    def rws(self):
+    def rws(self, size = 2):
         '''
         reference: https://github.com/bigzhao/Binary-Genetic-Algorithm/
         '''
         temp_cost = - self.__cost - (-self.__cost).min()
-        sid = np.random.choice(np.arange(len(temp_cost)), size=2, replace=True,
-               p=temp_cost/temp_cost.sum())
+        if (temp_cost.sum() > 0):
+            p = temp_cost/temp_cost.sum()
+        else:
+            p = None
+        sid = np.random.choice(np.arange(len(temp_cost)), size=size, replace=True, p=p)
         return sid
 
     @staticmethod
-    def crossover(sol_0, sol_1):
-        assert (len(sol_0) == len(sol_1))
-        point = np.random.randint(len(sol_0))
-        new_sol_0 = np.hstack((sol_0[:point], sol_1[point:]))
-        new_sol_1 = np.hstack((sol_1[:point], sol_0[point:]))
+    def crossover(sol_0, sol_1, swap = None):
+        """
+        Exchange the bits of two solutions, or of the two solutions of every pair.
+
+        Parameters
+        ----------
+        sol_0 : Array
+            First solution(s), size: (loS,) or (number of pairs,loS).
+        sol_1 : Array
+            Second solution(s), with the same size as sol_0.
+        swap : Array
+            Bool mask of the exchanged bits, with the same size as sol_0 (default: None, means one point crossover at
+            a random point for every pair).
+
+        Returns
+        -------
+        out : Array, Array
+            The two new solution(s).
+        """
+        sol_0 = np.asarray(sol_0)
+        sol_1 = np.asarray(sol_1)
+        assert (sol_0.shape == sol_1.shape)
+        if (type(swap) == type(None)):
+            swap = np.arange(sol_0.shape[-1]) >= np.random.randint(sol_0.shape[-1], size=sol_0.shape[:-1] + (1,))
+        new_sol_0 = np.where(swap, sol_1, sol_0)
+        new_sol_1 = np.where(swap, sol_0, sol_1)
 
         return new_sol_0, new_sol_1
 
     @staticmethod
-    def mutation(sol):
-        point = np.random.randint(len(sol))
-        sol[point] = 1 - sol[point]
-        return sol
+    def mutation(sol, flip = None):
+        """
+        Flip bits of a solution, or of every solution.
+
+        Parameters
+        ----------
+        sol : Array
+            Solution(s), size: (loS,) or (number of solutions,loS).
+        flip : Array
+            Bool mask of the flipped bits, with the same size as sol (default: None, means one random bit of every
+            solution).
 
-    def evaluate(self):
-        for i in range(0, self.__Sol.shape[0]):
-            self.__cost[i] = self.cost_function(self.__Sol[i, :])
+        Returns
+        -------
+        out : Array
+            The mutated solution(s).
+        """
+        sol = np.asarray(sol)
+        if (type(flip) == type(None)):
+            flip = np.arange(sol.shape[-1]) == np.random.randint(sol.shape[-1], size=sol.shape[:-1] + (1,))
+        return np.where(flip, 1 - sol, sol)
 
+    def __update_best(self):
         if np.min(self.__cost, axis=0) <= self.min_cost:
             self.min_cost = np.min(self.__cost, axis=0)
             self.__min_position = np.argmin(self.__cost, axis=0)
             self.best_solution = self.__Sol[self.__min_position, :].copy()
 
-    def run(self):
-        """
-        Run the engine.
-        """
-        if(self.__engine_flag == 0):
-            raise Exception("Engine has not been initialized, run: \"obj.engine_init()\" first")
-        while (self.__iter < self.max_iteration):
-            self.cg_curve[self.__iter] = self.min_cost
-            self.__iter += 1
-
-            ## get a new iteration
-            temp_Sol = self.__Sol.copy()
-            self.__Sol = []
-
-            for i in range(0,int(temp_Sol.shape[0]/2)):
-                id_0, id_1 = self.rws()
-                sol_0, sol_1 = temp_Sol[id_0,:].copy(), temp_Sol[id_1,:].copy()
-                if np.random.rand() < self.p_crossover:
-                    sol_0, sol_1 = self.crossover(sol_0, sol_1)
+    def __breed(self):
+        noS = self.__Sol.shape[0]
+        n_pairs = int((noS + 1)/2)
+        parents = self.rws(size=(n_pairs, 2))
+        children = self.__Sol[parents, :]
 
-                if np.random.rand() < self.p_mutation:
-                    sol_0 = self.mutation(sol_0)
-                    sol_1 = self.mutation(sol_1)
-
-                self.__Sol.append(sol_0)
-                self.__Sol.append(sol_1)
-
-            self.__Sol = np.array(self.__Sol)
-            self.evaluate()
-
-            worst_index = np.argsort(self.__cost)[-1]
-            self.__Sol[worst_index, :] = self.best_solution
-            self.__cost[worst_index] = self.__min_position
+        ## crossover
+        if (self.crossover_type == "uniform"):
+            swap = np.random.rand(n_pairs, self.loS) < 0.5
+        else:
+            swap = np.arange(self.loS) >= np.random.randint(self.loS, size=(n_pairs, 1))
+        swap = swap & (np.random.rand(n_pairs, 1) < self.p_crossover)
+        children = np.stack(self.crossover(children[:, 0, :], children[:, 1, :], swap), axis=1)
 
-            ## Call back function
-            self.call_back()
+        ## mutation
+        flip = np.zeros(children.shape, dtype=bool)
+        mutated = np.flatnonzero(np.random.rand(n_pairs) < self.p_mutation)
+        points = np.random.randint(self.loS, size=(len(mutated), 2))
+        flip[mutated, 0, points[:, 0]] = True
+        flip[mutated, 1, points[:, 1]] = True
+        children = self.mutation(children, flip)
 
-        self.__engine_flag = 0
+        return children.reshape(2*n_pairs, self.loS)[0:noS, :]
 
-    def get_iteration_number(self):
+    def initial_candidates(self):
         """
-        Get the temporal iteration number.
+        Get the initial solutions.
         Returns
         -------
-        out : Int
-            Iteration number.
+        out : Array
+            Initial solutions, size: (noS,loS).
         """
-        return self.__iter
+        return self.__Sol.copy()
 
-    def get_min_cost(self):
+    def initialize(self, candidates, costs):
         """
-        Get the temporal minimum of cost.
-        Returns
-        -------
-        out : Float
-            Minimum of cost.
+        Initialize the population with the costs of the initial solutions.
+        Parameters
+        ----------
+        candidates : Array
+            Initial solutions, size: (noS,loS).
+        costs : Array
+            Costs of the solutions, size: (noS,).
         """
-        return self.min_cost
+        self.__Sol = candidates.copy()
+        self.__cost = costs
+        self.min_cost = np.min(self.__cost, axis=0)
+        self.__min_position = np.argmin(self.__cost, axis=0)
+        self.best_solution = self.__Sol[self.__min_position, :].copy()
 
-    def get_best_solution(self):
+        ## Initialize the iteration
+        self.iteration = 0
+
+    def propose(self):
         """
-        Get the temporal best solution.
+        Breed a new generation.
         Returns
         -------
         out : Array
-            Best solution.
+            Candidates, size: (noS,loS).
+        """
+        return self.__breed()
+
+    def update(self, candidates, costs):
+        """
+        Replace the population with the new generation and its costs.
+        Parameters
+        ----------
+        candidates : Array
+            Candidates from propose, size: (noS,loS).
+        costs : Array
+            Costs of the candidates, size: (noS,).
         """
-        return self.best_solution
+        self.__Sol = candidates.copy()
+        self.__cost = costs
+        if (self.iteration < self.max_iteration):
+            self.cg_curve[self.iteration] = self.min_cost
+        self.iteration += 1
+        self.__update_best()
+
+        worst_index = np.argmax(self.__cost)
+        self.__Sol[worst_index, :] = self.best_solution
+        self.__cost[worst_index] = self.min_cost
+
+        ## Call back function
+        self.call_back()
 
     def get_total_solutions(self):
         """
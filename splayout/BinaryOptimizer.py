@@ -0,0 +1,228 @@
+from splayout.batchevaluation import evaluate_batch
+import numpy as np
+import math
+
+def _to_costs(candidates, costs):
+    costs = np.array(costs, dtype=np.double).flatten()
+    if (costs.size != len(candidates)):
+        raise Exception("The number of costs does not match the number of solutions!")
+    return costs
+
+class BinaryOptimizer:
+    """
+    Base class of the binary optimizers with an ask/tell interface.
+
+    Parameters
+    ----------
+    loS : Int
+        Length of a single solution.
+    cost_function : func
+        Cost function for evaluating a single solution, input: Array, size (loS,), output: Float, lower means better.
+        It can be None when the optimizer is driven with ask and tell.
+    max_iteration : Int
+        Maximum of iterations.
+    callback_function : func
+        Self-defined callback function that will be called in tell (default: None).
+    executor : Executor
+        Object with "map(cost_function, candidates)" for evaluating the candidates in parallel, e.g.
+        concurrent.futures.ThreadPoolExecutor or SimulationPool with pass_engine=False (default: None).
+    batch_cost_function : func
+        Cost function for evaluating all the candidates at once, input: Array, size (number of candidates,loS),
+        output: Array, size (number of candidates,) (default: None).
+
+    Notes
+    -----
+    "ask()" returns the next candidates, size: (number of candidates,loS), and "tell(candidates, costs)" gives their
+    costs back to the optimizer. The first call of ask returns the initial solutions if they have not been evaluated
+    yet. The candidates can be evaluated by any scheduler (a simulation pool, a job queue, an event loop...). ask does
+    not change the state of the optimizer: it returns the same pending candidates until they are given back with tell.
+    "run()" is a loop of ask, evaluation with cost_function, executor or batch_cost_function, and tell until
+    "is_finished()" returns True. As before, run can not be called again once the maximum of iterations is reached,
+    unless the optimizer is initialized again with "engine_init()".
+
+    A subclass implements "initial_candidates()" and "initialize(candidates, costs)" for the initial solutions, and
+    "propose()" and "update(candidates, costs)" for the following steps.
+    """
+    def __init__(self, loS, cost_function, max_iteration, callback_function = None, executor = None, batch_cost_function = None):
+        self.loS = loS
+        self.cost_function = cost_function
+        self.max_iteration = max_iteration
+        self.executor = executor
+        self.batch_cost_function = batch_cost_function
+        self.best_solution = np.zeros((1,loS))
+        self.min_cost = math.inf
+        self.iteration = 0
+        self.__initialized = False
+        self.__pending = None
+
+        if (callback_function == None):
+            def call_back():
+                pass
+            self.call_back = call_back
+        else:
+            self.call_back = callback_function
+
+    def engine_init(self):
+        """
+        Initialize the optimizer, evaluate the initial solutions.
+        """
+        self.__initialized = False
+        self.__pending = None
+        candidates = self.ask()
+        self.tell(candidates, self.evaluate_candidates(candidates))
+
+    def ask(self):
+        """
+        Get the next candidates to evaluate, the initial solutions if they have not been evaluated yet.
+
+        Returns
+        -------
+        out : Array
+            Candidates, size: (number of candidates,loS).
+        """
+        if (type(self.__pending) == type(None)):
+            if self.__initialized:
+                self.__pending = np.array(self.propose())
+            else:
+                self.__pending = np.array(self.initial_candidates())
+        return self.__pending.copy()
+
+    def tell(self, candidates, costs):
+        """
+        Update the optimizer with the costs of the candidates from ask.
+
+        Parameters
+        ----------
+        candidates : Array
+            Candidates from ask, size: (number of candidates,loS).
+        costs : Array
+            Costs of the candidates, size: (number of candidates,).
+        """
+        candidates = np.array(candidates).reshape(-1, self.loS)
+        costs = _to_costs(candidates, costs)
+        self.__pending = None
+        if self.__initialized:
+            self.update(candidates, costs)
+        else:
+            self.initialize(candidates, costs)
+            self.__initialized = True
+
+    def initial_candidates(self):
+        """
+        Get the initial solutions.
+
+        Returns
+        -------
+        out : Array
+            Initial solutions, size: (number of solutions,loS).
+        """
+        raise Exception("initial_candidates is not implemented in " + type(self).__name__ + "!")
+
+    def initialize(self, candidates, costs):
+        """
+        Initialize the optimizer with the costs of the initial solutions.
+
+        Parameters
+        ----------
+        candidates : Array
+            Initial solutions, size: (number of solutions,loS).
+        costs : Array
+            Costs of the solutions, size: (number of solutions,).
+        """
+        raise Exception("initialize is not implemented in " + type(self).__name__ + "!")
+
+    def propose(self):
+        """
+        Generate the next candidates, called by ask.
+
+        Returns
+        -------
+        out : Array
+            Candidates, size: (number of candidates,loS).
+        """
+        raise Exception("propose is not implemented in " + type(self).__name__ + "!")
+
+    def update(self, candidates, costs):
+        """
+        Update the optimizer with the costs of the proposed candidates, called by tell.
+
+        Parameters
+        ----------
+        candidates : Array
+            Candidates, size: (number of candidates,loS).
+        costs : Array
+            Costs of the candidates, size: (number of candidates,).
+        """
+        raise Exception("update is not implemented in " + type(self).__name__ + "!")
+
+    def is_finished(self):
+        """
+        Check whether the maximum of iterations is reached.
+
+        Returns
+        -------
+        out : Bool
+            True if the optimization is finished.
+        """
+        return self.iteration >= self.max_iteration
+
+    def evaluate_candidates(self, candidates):
+        """
+        Evaluate candidates with cost_function, executor or batch_cost_function.
+
+        Parameters
+        ----------
+        candidates : Array
+            Candidates, size: (number of candidates,loS).
+
+        Returns
+        -------
+        out : Array
+            Costs of the candidates, size: (number of candidates,).
+        """
+        if (type(self.cost_function) == type(None) and type(self.batch_cost_function) == type(None)):
+            raise Exception("No cost function specified, evaluate the candidates and use tell instead!")
+        return evaluate_batch(candidates, self.cost_function, self.executor, self.batch_cost_function)
+
+    def run(self):
+        """
+        Run the engine until the maximum of iterations is reached.
+        """
+        if self.is_finished():
+            raise Exception("The maximum of iterations is reached, run: \"obj.engine_init()\" first")
+        while (not self.is_finished()):
+            candidates = self.ask()
+            self.tell(candidates, self.evaluate_candidates(candidates))
+
+    def get_iteration_number(self):
+        """
+        Get the temporal iteration number.
+
+        Returns
+        -------
+        out : Int
+            Iteration number.
+        """
+        return self.iteration
+
+    def get_min_cost(self):
+        """
+        Get the temporal minimum of cost.
+
+        Returns
+        -------
+        out : Float
+            Minimum of cost.
+        """
+        return self.min_cost
+
+    def get_best_solution(self):
+        """
+        Get the temporal best solution.
+
+        Returns
+        -------
+        out : Array
+            Best solution.
+        """
+        return self.best_solution
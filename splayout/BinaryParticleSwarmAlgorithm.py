@@ -4,10 +4,11 @@
 ## The Journal of Computer Society of Iran (CSI) On Computer Scienceand Engineering (JCSE),.
 ## 6. 21-32.
 ################################################################################################
+from splayout.BinaryOptimizer import BinaryOptimizer
 import numpy as np
 import math
 
-class BinaryParitcleSwarmAlgorithm:
+class BinaryParitcleSwarmAlgorithm(BinaryOptimizer):
     """
     Binary Particle Swarm Optimization Algorithm.
     Parameters
@@ -18,6 +19,7 @@ class BinaryParitcleSwarmAlgorithm:
         Length of a single solution.
     cost_function : func
         Cost function for evaluating a single solution, input: Array, size (loS,), output: Float, lower means better .
+        It can be None when the solutions are evaluated outside and given back with "tell" (see BinaryOptimizer).
     max_iteration : Int
         Maximum of iterations (default: 500).
     callback_function : func
@@ -34,113 +36,140 @@ class BinaryParitcleSwarmAlgorithm:
         Ratio for self-cognition (default: 0.2).
     ratio_global : Float
         Ratio for social-cognition (default: 0.8).
+    executor : Executor
+        Object with "map(cost_function, candidates)" for evaluating every iteration in parallel, e.g.
+        concurrent.futures.ThreadPoolExecutor or SimulationPool with pass_engine=False (default: None).
+    batch_cost_function : func
+        Cost function for evaluating all the solutions of an iteration at once, input: Array, size (noS,loS),
+        output: Array, size (noS,). cost_function can be None when it is specified (default: None).
+    synchronous : Bool
+        Whether the whole swarm moves towards the best solution found before the iteration, so that the iteration can
+        be evaluated as one batch (default: None, means True when executor or batch_cost_function is specified).
+
+    Notes
+    -----
+    By default the particles move and are evaluated one after another, every particle moves towards the global best
+    solution updated by the particles before it, and "ask()" returns one particle, size: (1,loS). With
+    synchronous=True an iteration is an update step for the whole swarm (velocity, clipping, sigmoid mapping and
+    Bernoulli sampling of all the particles towards the best solution found before the iteration) followed by an
+    evaluation step of all the particles, and "ask()" returns the whole swarm, size: (noS,loS). The global best is then
+    only updated once per iteration, which usually slows down the convergence per iteration.
     """
-    def __init__(self, noS , loS, cost_function , max_iteration = 500,callback_function=None , v_max = 6, inertia_weight = 0.99, c_1 = 2, c_2 = 2, ratio_personal = 0.2, ratio_global = 0.8):
-        self.max_iteration = max_iteration
+    def __init__(self, noS , loS, cost_function , max_iteration = 500,callback_function=None , v_max = 6, inertia_weight = 0.99, c_1 = 2, c_2 = 2, ratio_personal = 0.2, ratio_global = 0.8, executor = None, batch_cost_function = None, synchronous = None):
+        BinaryOptimizer.__init__(self, loS, cost_function, max_iteration, callback_function, executor, batch_cost_function)
         self.noS = noS
-        self.loS = loS
         self.v_max = v_max
         self.inertia_weight = inertia_weight
         self.c_1 = c_1
         self.c_2 = c_2
         self.ratio_personal = ratio_personal
         self.ratio_global = ratio_global
-        self.cost_function = cost_function
+        if (type(synchronous) == type(None)):
+            synchronous = (type(executor) != type(None) or type(batch_cost_function) != type(None))
+        self.synchronous = synchronous
         self.__Sol = np.random.randint(0,2,size=(noS,loS)) # Initialize the solutions
         self.__Best_Sol = self.__Sol.copy()
         self.__v = np.zeros((noS,loS))
         self.cg_curve = np.zeros((max_iteration))
         self.__cost = np.zeros(noS) ## the cost of the population, the lower , the better (1 - FoM)
-        self.__engine_flag = 0
-        self.__iter = 0
-        self.best_solution = np.zeros((1,loS))
-        self.min_cost = math.inf
-        self.engine_init()
-        if (callback_function == None):
-            def call_back():
-                pass
-            self.call_back = call_back
-        else:
-            self.call_back = callback_function
-
-    def engine_init(self):
+        self.__particle = 0
+        if (type(cost_function) != type(None) or type(batch_cost_function) != type(None)):
+            self.engine_init()
+
+    def initial_candidates(self):
+        """
+        Get the initial solutions.
+        Returns
+        -------
+        out : Array
+            Initial solutions, size: (noS,loS).
+        """
+        return self.__Sol.copy()
+
+    def initialize(self, candidates, costs):
         """
-        Initialize the Binary Particle Swarm Optimization, evaluate the first iteration.
+        Initialize the particles with the costs of the initial solutions.
+        Parameters
+        ----------
+        candidates : Array
+            Initial solutions, size: (noS,loS).
+        costs : Array
+            Costs of the solutions, size: (noS,).
         """
-        for i in range(0, self.__Sol.shape[0]):
-            self.__cost[i] = self.cost_function(self.__Sol[i, :])
+        self.__Sol = candidates.copy()
+        self.__Best_Sol = candidates.copy()
+        self.__cost = costs
         self.min_cost = np.min(self.__cost, axis=0)
         __min_position = np.argmin(self.__cost, axis=0)
         self.best_solution = self.__Sol[__min_position, :].copy()
 
         ## Initialize the iteration
-        self.__iter = 0
-        self.__engine_flag = 1
+        self.iteration = 0
+        self.__particle = 0
 
-
-    def run(self):
-        """
-        Run the engine.
+    def propose(self):
         """
-        if(self.__engine_flag == 0):
-            raise Exception("Engine has not been initialized, run: \"obj.engine_init()\" first")
-        while (self.__iter < self.max_iteration):
-            self.cg_curve[self.__iter] = self.min_cost
-            self.__iter += 1
-
-            for i in range(0, self.noS):
-                self.__v[i,:] = self.inertia_weight*self.__v[i,:] + self.c_1*self.ratio_personal*(self.__Best_Sol[i,:] - self.__Sol[i,:]) + \
-                    self.c_2*self.ratio_global*(self.best_solution - self.__Sol[i,:])
-
-                self.__v[i,:] = np.clip(self.__v[i,:], -self.v_max, self.v_max)
-                mapped_v =  1/(1+(np.exp((-self.__v[i,:]))))
-
-                self.__Sol[i,:] = np.random.rand(self.loS) <= mapped_v
-
-                ## Calculate the cost
-                new_cost = self.cost_function(self.__Sol[i,:])
-                if (new_cost <= self.__cost[i]) :
-                    self.__Best_Sol[i, :] = self.__Sol[i,:].copy()
-                    self.__cost[i] = new_cost
-
-                if new_cost <= self.min_cost:
-                    self.best_solution = self.__Sol[i,:].copy()
-                    self.min_cost = new_cost
-
-            ## Call back function
-            self.call_back()
-
-        self.__engine_flag = 0
-
-    def get_iteration_number(self):
-        """
-        Get the temporal iteration number.
+        Move the next particle, or the whole swarm with synchronous=True.
         Returns
         -------
-        out : Int
-            Iteration number.
-        """
-        return self.__iter
-
-    def get_min_cost(self):
-        """
-        Get the temporal minimum of cost.
-        Returns
-        -------
-        out : Float
-            Minimum of cost.
+        out : Array
+            Candidates, size: (1,loS), or (noS,loS) with synchronous=True.
         """
-        return self.min_cost
+        particles = self.__get_moving_particles()
+        self.__move(particles)
+        return self.__Sol[particles].copy()
 
-    def get_best_solution(self):
+    def update(self, candidates, costs):
         """
-        Get the temporal best solution.
-        Returns
-        -------
-        out : Array
-            Best solution.
+        Update the particles with the costs of the moved solutions.
+        Parameters
+        ----------
+        candidates : Array
+            Candidates from propose, size: (1,loS), or (noS,loS) with synchronous=True.
+        costs : Array
+            Costs of the candidates, size: (1,), or (noS,) with synchronous=True.
         """
-        return self.best_solution
+        if (self.__particle == 0 and self.iteration < self.max_iteration):
+            self.cg_curve[self.iteration] = self.min_cost
+        self.__accept(self.__get_moving_particles(), candidates, costs)
+        if (not self.synchronous and self.__particle < self.noS - 1):
+            self.__particle += 1
+            return
+        self.__particle = 0
+        self.iteration += 1
+
+        ## Call back function
+        self.call_back()
+
+    def __get_moving_particles(self):
+        ## a slice, so that the rows of the moving particles are views and one particle is moved without copying the arrays
+        if self.synchronous:
+            return slice(0, self.noS)
+        return slice(self.__particle, self.__particle + 1)
+
+    def __move(self, particles):
+        Sol = self.__Sol[particles]
+        v = self.__v[particles]
+        v[...] = self.inertia_weight*v + \
+            self.c_1*self.ratio_personal*(self.__Best_Sol[particles] - Sol) + \
+            self.c_2*self.ratio_global*(self.best_solution - Sol)
+
+        np.clip(v, -self.v_max, self.v_max, out=v)
+        mapped_v =  1/(1+(np.exp((-v))))
+
+        Sol[...] = np.random.rand(*Sol.shape) <= mapped_v
+
+    def __accept(self, particles, candidates, new_costs):
+        improved = new_costs <= self.__cost[particles]
+        improved_particles = np.arange(self.noS)[particles][improved]
+        self.__Best_Sol[improved_particles, :] = candidates[improved, :]
+        self.__cost[improved_particles] = new_costs[improved]
+
+        ## the last particle with the minimum cost, as in the sequential update
+        best_position = len(new_costs) - 1 - np.argmin(new_costs[::-1])
+        if new_costs[best_position] <= self.min_cost:
+            self.best_solution = candidates[best_position,:].copy()
+            self.min_cost = new_costs[best_position]
 
     def get_total_solutions(self):
         """
@@ -3,9 +3,10 @@
 ##            beamsplitter with 2.4 × 2.4 μm2 footprint. Nature Photon 9, 378–382 (2015).
 ##            https://doi.org/10.1038/nphoton.2015.80
 #####################################################################################################
+from splayout.BinaryOptimizer import BinaryOptimizer
 import numpy as np
 
-class DirectBianrySearchAlgorithm:
+class DirectBianrySearchAlgorithm(BinaryOptimizer):
     """
     Direct Binary Search Algorithm.
 
@@ -15,6 +16,7 @@ class DirectBianrySearchAlgorithm:
         Length of a single solution.
     cost_function : func
         Cost function for evaluating a single solution, input: Array, size (loS,), output: Float, lower means better.
+        It can be None when the solutions are evaluated outside and given back with "tell" (see BinaryOptimizer).
     max_iteration : Int
         Maximum of iterations (default: 500).
     callback_function : func
@@ -23,9 +25,7 @@ class DirectBianrySearchAlgorithm:
         Initialize the solution, size: (noS,) (default: None, means random).
     """
     def __init__(self,loS,cost_function,max_iteration = 4,callback_function = None,initial_solution = None):
-        self.loS = loS
-        self.cost_function = cost_function
-        self.max_iteration = max_iteration
+        BinaryOptimizer.__init__(self, loS, cost_function, max_iteration, callback_function)
 
         if (type(initial_solution) != type(None)):
             self.__Sol = initial_solution
@@ -34,46 +34,85 @@ class DirectBianrySearchAlgorithm:
 
         self.cg_curve = np.zeros((max_iteration*self.loS))
         self.cost = np.zeros(1)
-        self.__iter = 0
         self.best_solution = np.zeros(loS)
         self.__undisturbed = np.array(range(0,self.loS))
+        self.__position = 0
 
-        if (callback_function == None):
-            def call_back():
-                pass
-            self.call_back = call_back
-        else:
-            self.call_back = callback_function
+        if (type(cost_function) != type(None)):
+            self.engine_init()
 
-        self.__engine_init()
+    def initial_candidates(self):
+        """
+        Get the initial solution.
 
-    def __engine_init(self):
-        self.cost = self.cost_function(self.__Sol)
+        Returns
+        -------
+        out : Array
+            Initial solution, size: (1,loS).
+        """
+        return np.array(self.__Sol).reshape(1, self.loS)
+
+    def initialize(self, candidates, costs):
+        """
+        Initialize the search with the cost of the initial solution.
+
+        Parameters
+        ----------
+        candidates : Array
+            Initial solution, size: (1,loS).
+        costs : Array
+            Cost of the solution, size: (1,).
+        """
+        self.__Sol = candidates[0]
+        self.cost = costs[0]
+        self.min_cost = self.cost
         self.best_solution = self.__Sol.copy()
-        self.__iter = 0
+        self.iteration = 0
+        self.__position = 0
 
-    def run(self):
+    def propose(self):
         """
-        Run the DBS engine.
+        Flip one more undisturbed position of the solution.
+
+        Returns
+        -------
+        out : Array
+            Candidate, size: (1,loS).
         """
-        while (self.__iter < self.max_iteration):
+        temp_solution = np.array(self.__Sol).copy()
+        if (self.__position == 0):
             self.__undisturbed = np.array(range(0, self.loS))
-            for i in range(0,self.loS):
-                temp_solution = self.__Sol.copy()
-                perturbate_shuffle = np.random.randint(0,self.__undisturbed.size)
-                perturbate_position = self.__undisturbed[perturbate_shuffle]
-                if (i != self.loS -1):
-                    self.__undisturbed = np.delete(self.__undisturbed,perturbate_shuffle)
-                temp_solution[perturbate_position] = (temp_solution[perturbate_position] + 1)%2
-                new_cost = self.cost_function(temp_solution)
-                if (new_cost <= self.cost):
-                    self.__Sol = temp_solution
-                    self.cost = new_cost
-                    self.best_solution = self.__Sol
-
-                self.cg_curve[self.__iter * self.loS + i] = self.cost
-                self.call_back()
-            self.__iter += 1
+        perturbate_shuffle = np.random.randint(0,self.__undisturbed.size)
+        perturbate_position = self.__undisturbed[perturbate_shuffle]
+        if (self.__position != self.loS -1):
+            self.__undisturbed = np.delete(self.__undisturbed,perturbate_shuffle)
+        temp_solution[perturbate_position] = (temp_solution[perturbate_position] + 1)%2
+        return temp_solution.reshape(1, self.loS)
+
+    def update(self, candidates, costs):
+        """
+        Keep the candidate if its cost is not higher.
+
+        Parameters
+        ----------
+        candidates : Array
+            Candidate from propose, size: (1,loS).
+        costs : Array
+            Cost of the candidate, size: (1,).
+        """
+        if (costs[0] <= self.cost):
+            self.__Sol = candidates[0]
+            self.cost = costs[0]
+            self.min_cost = self.cost
+            self.best_solution = self.__Sol
+
+        if (self.iteration < self.max_iteration):
+            self.cg_curve[self.iteration * self.loS + self.__position] = self.cost
+        self.call_back()
+        self.__position += 1
+        if (self.__position == self.loS):
+            self.__position = 0
+            self.iteration += 1
 
     def get_remained_size(self):
         """
@@ -97,17 +136,6 @@ class DirectBianrySearchAlgorithm:
         """
         return self.__undisturbed
 
-    def get_iteration_number(self):
-        """
-        Get the temporal iteration number.
-
-        Returns
-        -------
-        out : Int
-            Iteration number.
-        """
-        return self.__iter
-
     def get_cost(self):
         """
         Get the temporal cost.
@@ -118,20 +146,3 @@ class DirectBianrySearchAlgorithm:
             cost.
         """
         return self.cost
-
-    def get_best_solution(self):
-        """
-        Get the temporal best solution.
-
-        Returns
-        -------
-        out : Array
-            Best solution.
-        """
-        return self.best_solution
-
-
-
-
-
-
@@ -1,4 +1,5 @@
 from splayout.utils import *
+from splayout.symmetry import get_symmetry_index, expand_symmetric, reduce_symmetric
 import numpy as np
 import os
 import matplotlib
@@ -39,9 +40,14 @@ class TopologyOptRegion2D:
         Eta for the smoothing filter (default: 0.5)
     beta : Float
         Beta fort hte smoothing filter (default: 1)
+    symmetry : String
+        Symmetry of the parameters about the center of the region, X_MIRROR (x -> -x), Y_MIRROR (y -> -y), XY_MIRROR or
+        C2 (180 degree rotation). The optimizer then works on the reduced parameter vector (see "get_dof") that is
+        expanded by the region. Y_MIRROR can be paired with the y_antisymmetric or y_symmetric boundary of
+        FDTDSimulation.add_fdtd_region when the region is centered at y = 0 (default: None).
     """
     def __init__(self, bottom_left_corner_point, top_right_corner_point, fdtd_engine, x_mesh = 0.02,y_mesh = 0.02,z_mesh = 0.0071, lower_index = 1.444, higher_index = 3.478, z_start=-0.11, z_end=0.11, rename = "ToOptRegion",
-                 filter_R = 0.5, eta=0.5, beta=1 ):
+                 filter_R = 0.5, eta=0.5, beta=1, symmetry = None):
         self.left_down_point = tuple_to_point(bottom_left_corner_point)
         self.right_up_point = tuple_to_point(top_right_corner_point)
         self.__last_params = None
@@ -72,6 +78,8 @@ class TopologyOptRegion2D:
         self.beta = beta
         self.index_region_name = self.rename + "_index"
         self.field_region_name = self.rename + "_field"
+        self.symmetry = symmetry
+        self.symmetry_index = get_symmetry_index((self.x_size, self.y_size), symmetry)
         self.__initialize()
         self.epsilon_figure = None
         self.field_figure = None
@@ -110,6 +118,56 @@ class TopologyOptRegion2D:
         """
         return self.y_size
 
+    def get_dof(self):
+        """
+        Return the number of the parameters that the optimizer works on.
+
+        Returns
+        -------
+        out : Int
+            x_size * y_size, or the size of the reduced parameter vector with symmetry.
+        """
+        return int(self.symmetry_index.max()) + 1
+
+    def expand_parameters(self, params):
+        """
+        Expand the parameter vector of the optimizer to the parameter matrix of the region.
+
+        Parameters
+        ----------
+        params : Array
+            Parameter vector, size: (get_dof(),), or the parameter matrix, size: (x_size, y_size) or
+            (x_size * y_size,), which is returned as it is.
+
+        Returns
+        -------
+        out : Array
+            Parameter matrix, size: (x_size, y_size).
+        """
+        params = np.asarray(params, dtype=np.double)
+        if (params.shape == self.symmetry_index.shape):
+            return params
+        if (params.size == self.x_size * self.y_size):
+            return np.reshape(params, self.symmetry_index.shape)
+        if (params.size != self.get_dof()):
+            raise Exception("Size of the parameters does not match the region!")
+        return expand_symmetric(params.flatten(), self.symmetry_index)
+
+    def reduce_gradient(self, gradient):
+        """
+        Reduce the gradient with respect to the parameter matrix to the gradient with respect to the parameter vector.
+
+        Parameters
+        ----------
+        gradient : Array
+            Gradient, size: (x_size, y_size) or (x_size * y_size,).
+
+        Returns
+        -------
+        out : Array
+            Gradient, size: (get_dof(),).
+        """
+        return reduce_symmetric(gradient, self.symmetry_index)
 
     def update(self, params_matrix):
         '''
@@ -119,8 +177,9 @@ class TopologyOptRegion2D:
         Parameters
         ----------
         params_matrix : numpy.array
-            A two-dimensional array in [0,1].
+            A two-dimensional array in [0,1], or the parameter vector (size: (get_dof(),)).
         '''
+        params_matrix = self.expand_parameters(params_matrix)
         self.fdtd_engine.fdtd.putv("topo_rho", params_matrix)
         self.fdtd_engine.fdtd.eval(('params = struct;'
                        'params.eps_levels=[{0},{1}];'
@@ -171,6 +230,45 @@ class TopologyOptRegion2D:
             return self.fdtd_engine.get_E_distribution(field_monitor_name=self.field_region_name,
                                                        if_get_spatial=if_get_spatial)
 
+    def iter_E_distribution(self, chunk = 10, data_name = "field_data"):
+        """
+        Get electric field distribution from the region in frequency chunks.
+
+        Parameters
+        ----------
+        chunk : Int
+            Number of frequency points in every chunk (default: 10).
+        data_name : String
+            Name of the data in Lumeircal FDTD (default: "field_data").
+
+        Yields
+        ------
+        frequency_slice : slice
+            Indices of the frequency points in the chunk.
+        field : Array
+            size: (x mesh, y mesh, z mesh, frequency points in the chunk, 3).
+        """
+        for frequency_slice, field in self.fdtd_engine.iter_E_distribution(field_monitor_name=self.field_region_name,
+                                                                          data_name=data_name, chunk=chunk):
+            yield frequency_slice, field
+
+    def get_E_distribution_in_CAD(self, data_name):
+        """
+        Get electric field distribution from the region and save the data in CAD.
+
+        Parameters
+        ----------
+        data_name : String
+            Name of the data in Lumeircal FDTD.
+
+        Returns
+        -------
+        data_name : String
+            The name of the data in Lumerical.
+        """
+        self.fdtd_engine.get_E_distribution_in_CAD(field_monitor_name=self.field_region_name, data_name=data_name)
+        return data_name
+
     def get_epsilon_distribution(self):
         """
         Get epsilon distribution from the region.
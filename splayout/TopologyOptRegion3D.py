@@ -172,6 +172,45 @@ class TopologyOptRegion3D:
             return self.fdtd_engine.get_E_distribution(field_monitor_name=self.field_region_name,
                                                        if_get_spatial=if_get_spatial)
 
+    def iter_E_distribution(self, chunk = 10, data_name = "field_data"):
+        """
+        Get electric field distribution from the region in frequency chunks.
+
+        Parameters
+        ----------
+        chunk : Int
+            Number of frequency points in every chunk (default: 10).
+        data_name : String
+            Name of the data in Lumeircal FDTD (default: "field_data").
+
+        Yields
+        ------
+        frequency_slice : slice
+            Indices of the frequency points in the chunk.
+        field : Array
+            size: (x mesh, y mesh, z mesh, frequency points in the chunk, 3).
+        """
+        for frequency_slice, field in self.fdtd_engine.iter_E_distribution(field_monitor_name=self.field_region_name,
+                                                                          data_name=data_name, chunk=chunk):
+            yield frequency_slice, field
+
+    def get_E_distribution_in_CAD(self, data_name):
+        """
+        Get electric field distribution from the region and save the data in CAD.
+
+        Parameters
+        ----------
+        data_name : String
+            Name of the data in Lumeircal FDTD.
+
+        Returns
+        -------
+        data_name : String
+            The name of the data in Lumerical.
+        """
+        self.fdtd_engine.get_E_distribution_in_CAD(field_monitor_name=self.field_region_name, data_name=data_name)
+        return data_name
+
     def get_epsilon_distribution(self):
         """
         Get epsilon distribution from the region.
@@ -15,9 +15,16 @@ from splayout.sbend import SBend,ASBend
 from splayout.filledpattern import Circle,Rectangle
 from splayout.fdtdapi import FDTDSimulation
 from splayout.modeapi import MODESimulation
+from splayout.lumapitransport import LumapiTransport, FakeLumapiTransport
+from splayout.simulationpool import SimulationPool
+from splayout.resultcache import ResultCache
+from splayout.simulationresult import SimulationResult
+from splayout.profiler import LumericalProfiler
+from splayout.lumericaltrace import LumericalTraceRecorder, LumericalTraceReplayer
 from splayout.BinaryBatAlgorithm import BinaryBatAlgorithm
+from splayout.BinaryOptimizer import BinaryOptimizer
 from splayout.DirectBinarySearchAlgorithm import DirectBianrySearchAlgorithm
-from splayout.pixelsregion import RectanglePixelsRegion,CirclePixelsRegion
+from splayout.pixelsregion import RectanglePixelsRegion,CirclePixelsRegion,RasterPixelsRegion
 from splayout.ShapeOptRegion2D import ShapeOptRegion2D
 from splayout.ShapeOptRegion3D import ShapeOptRegion3D
 from splayout.TopologyOptRegion2D import TopologyOptRegion2D
@@ -0,0 +1,36 @@
+import numpy as np
+
+
+def evaluate_batch(candidates, cost_function = None, executor = None, batch_cost_function = None):
+    """
+    Evaluate a batch of solutions (e.g. a generation of a population optimizer).
+
+    Parameters
+    ----------
+    candidates : Array
+        Solutions, size: (number of solutions, loS).
+    cost_function : func
+        Cost function for evaluating a single solution, input: Array, size (loS,), output: Float.
+    executor : Executor
+        Object with "map(cost_function, candidates)", e.g. concurrent.futures.ThreadPoolExecutor,
+        concurrent.futures.ProcessPoolExecutor, multiprocessing.Pool or SimulationPool with pass_engine=False
+        (default: None, means the solutions are evaluated one by one).
+    batch_cost_function : func
+        Cost function for evaluating all the solutions at once, input: Array, size (number of solutions, loS),
+        output: Array, size (number of solutions,). It is used instead of cost_function and executor (default: None).
+
+    Returns
+    -------
+    out : Array
+        Costs of the solutions, size: (number of solutions,).
+    """
+    if (type(batch_cost_function) != type(None)):
+        costs = batch_cost_function(np.array(candidates))
+    elif (type(executor) != type(None)):
+        costs = list(executor.map(cost_function, [candidate for candidate in candidates]))
+    else:
+        costs = [cost_function(candidate) for candidate in candidates]
+    costs = np.array(costs, dtype=np.double).flatten()
+    if (costs.size != len(candidates)):
+        raise Exception("The number of costs does not match the number of solutions!")
+    return costs
@@ -1,8 +1,16 @@
 from splayout.utils import *
+from splayout.lumericalsession import LumericalSession, make_item_script, match_item_names
+from splayout.lumapitransport import LumapiTransport
+from splayout.simulationresult import make_fetch_script, parse_fetched_results
+from splayout.fieldtransfer import FieldTransfer
+from splayout.profiler import LumericalProfiler
+from splayout.lumericaltrace import LumericalTraceRecorder
 import sys, os
 import numpy as np
 import scipy.constants
 import time
+import threading
+import shutil
 
 
 class FDTDSimulation:
@@ -17,26 +25,36 @@ class FDTDSimulation:
         Path to the Lumerical Python API folder.
     load_file : String
         Path to the .fsp file that what want to be loaded (default: None).
+    transport : LumapiTransport or FakeLumapiTransport
+        The transport that the commands are sent to, None means a LumapiTransport to Lumerical FDTD (default: None).
 
     """
-    def __init__(self,hide=0,fdtd_path = "C:\\Program Files\\Lumerical\\v202\\api\\python\\", load_file = None):
-        sys.path.append(fdtd_path)
-        sys.path.append(os.path.dirname(__file__))
-        try:
-            os.add_dll_directory(fdtd_path)
-        except:
-            pass
-        try:
-            import lumapi
-        except:
-            raise Exception(
-                "Lumerical FDTD is not installed in the default path, please specify the python api path with fdtd_path=***.")
-        self.lumapi = lumapi
-        self.fdtd = self.lumapi.FDTD(hide=hide)
+    def __init__(self,hide=0,fdtd_path = "C:\\Program Files\\Lumerical\\v202\\api\\python\\", load_file = None, transport = None):
+        if (type(transport) == type(None)):
+            transport = LumapiTransport("FDTD", hide=hide, lumapi_path=fdtd_path)
+        self.transport = transport
+        self.lumapi = getattr(transport, "lumapi", None)
+        self.fdtd = LumericalSession(self.transport)
         if (type(load_file) != type(None)):
             self.fdtd.eval("load(\"" + load_file + "\");")
         self.global_monitor_set_flag = 0
         self.global_source_set_flag = 0
+        self.field_transfer = None
+        self.completion_check = "none"
+        self.max_retries = 2
+        self.run_statistics = {"runs": 0, "retries": 0, "failures": 0}
+        self.save_policy = "always"
+        self.save_every = 1
+        self.save_statistics = []
+        self.checkpoint_statistics = []
+        self.best_cost = None
+        self.__saved_filename = None
+        self.__checkpoint_thread = None
+        self.__monitor_names = []
+        self.__disabled_monitor_names = []
+        self.__jobs = []
+        self.__spectral_cache = {}
+        self.__cache_generation = self.fdtd.generation
 
     def add_structure_from_gdsii(self,filename,cellname,layer=1,datatype=0,material=Si, z_start = -0.11, z_end = 0.11,rename = None):
         """
@@ -101,6 +119,10 @@ class FDTDSimulation:
             self.fdtd.setglobalmonitor('frequency points', points)
             self.frequency_points = points
             self.global_monitor_set_flag = 1
+        if monitor_name not in self.__monitor_names:
+            self.__monitor_names.append(monitor_name)
+        if monitor_name in self.__disabled_monitor_names:
+            self.__disabled_monitor_names.remove(monitor_name)
 
     def add_mode_expansion(self,position, mode_list, width=2, height=0.8, expansion_name="expansion", points = 251, update_mode = 0):
         """
@@ -294,7 +316,7 @@ class FDTDSimulation:
         self.fdtd.eval("set(\"phase\"," +  "%.6f"%(phase) + ");")
 
 
-    def add_fdtd_region(self,bottom_left_corner_point,top_right_corner_point,simulation_time=5000,background_index=1.444,mesh_order =2,dimension=3,height = 1, z_symmetric = 0, y_antisymmetric = 0, y_periodic = 0, pml_layers = 8):
+    def add_fdtd_region(self,bottom_left_corner_point,top_right_corner_point,simulation_time=5000,background_index=1.444,mesh_order =2,dimension=3,height = 1, z_symmetric = 0, y_antisymmetric = 0, y_periodic = 0, pml_layers = 8, y_symmetric = 0):
         """
         Add simulation region in Lumerical FDTD.
 
@@ -322,6 +344,10 @@ class FDTDSimulation:
             Whether set anti-symmetric in y-axis (default: 0).
         y_periodic : Bool or Int
             Whether set periodic in y-axis (default: 0).
+        pml_layers : Int
+            Number of the PML layers (default: 8).
+        y_symmetric : Bool or Int
+            Whether set symmetric in y-axis, e.g. for Y_MIRROR symmetric design regions with sources of even parity (default: 0).
         """
         self.fdtd.eval("addfdtd;")
         self.fdtd.eval("set(\"dimension\"," + str(dimension-1) + ");")
@@ -346,6 +372,10 @@ class FDTDSimulation:
             self.fdtd.eval("set(\"y min bc\", \"Anti-Symmetric\");")
             self.fdtd.eval("set(\"force symmetric y mesh\", 1);")
 
+        if (y_symmetric == 1):
+            self.fdtd.eval("set(\"y min bc\", \"Symmetric\");")
+            self.fdtd.eval("set(\"force symmetric y mesh\", 1);")
+
         if (y_periodic == 1):
             self.fdtd.eval("set(\"y min bc\", \"Periodic\");")
 
@@ -486,24 +516,35 @@ class FDTDSimulation:
         ----------
         filename : String
             File name or File path (default: "temp").
+
+        Returns
+        -------
+        filepath : String
+            The path that the simulation is saved to.
         """
+        filepath = self.__save_file(filename)
+        self.__saved_filename = filename
+        return filepath
+
+    def __save_file(self, filename):
+        self.wait_checkpoint()
         if (filename[0:2] == './'):
             filepath = os.path.abspath('./') + '/'+filename[2:]
             filedir = os.path.split(filepath)[0]
             if not os.path.isdir(filedir):
                 os.makedirs(filedir)
-            self.fdtd.save(filepath)
         elif (filename[0:3] == '../'):
             filepath = os.path.abspath('../') + '/' + filename[3:]
             filedir = os.path.split(filepath)[0]
             if not os.path.isdir(filedir):
                 os.makedirs(filedir)
-            self.fdtd.save(filepath)
         else:
-            self.fdtd.save(filename)
+            filepath = filename
+        self.fdtd.save(filepath)
+        return filepath
 
 
-    def run(self,filename="temp", min_time_threshold = 3):
+    def run(self,filename="temp", min_time_threshold = None):
         """
         Save the simulation as a ".fsp" file and run.
 
@@ -512,16 +553,256 @@ class FDTDSimulation:
         filename : String
             File name or File path (default: "temp").
         min_time_threshold : Float or Int
-            The minimum time for a possible simulation.
+            The minimum time for a possible simulation, the simulation runs again when it returns earlier. None means 3
+            (unit: s) with the "time" completion check and no time check otherwise (default: None).
+
+        Notes
+        -----
+        By default the simulation runs once and an exception raised by the run is raised immediately. With the "status"
+        completion check (see "set_completion_check"), the simulation is run again when the run raises or
+        "check_completion" fails, at most "max_retries" times, which costs one more eval and getv for every run. The
+        counters are kept in "run_statistics".
         """
-        self.save(filename)
+        self.__save_for_run(filename)
         self.fdtd.eval("switchtolayout;")
-        time_consumption = 0
-        while (time_consumption < min_time_threshold):
-            time_before_sim = time.perf_counter()
-            self.fdtd.eval("run;")
-            time_consumption = time.perf_counter() - time_before_sim
+        if (type(min_time_threshold) != type(None) or self.completion_check == "time"):
+            if (type(min_time_threshold) == type(None)):
+                min_time_threshold = 3
+            time_consumption = -1
+            while (time_consumption < min_time_threshold):
+                if (time_consumption >= 0):
+                    self.run_statistics["retries"] += 1
+                time_before_sim = time.perf_counter()
+                self.fdtd.eval("run;")
+                time_consumption = time.perf_counter() - time_before_sim
+            return
+        if (self.completion_check == "none"):
+            try:
+                self.fdtd.eval("run;")
+            except Exception:
+                self.run_statistics["failures"] += 1
+                raise
+            return
+        for attempt in range(0, self.max_retries + 1):
+            if (attempt > 0):
+                self.run_statistics["retries"] += 1
+                self.fdtd.eval("switchtolayout;")
+            try:
+                self.fdtd.eval("run;")
+                if self.check_completion():
+                    return
+            except Exception:
+                if (attempt == self.max_retries):
+                    self.run_statistics["failures"] += 1
+                    raise
+        self.run_statistics["failures"] += 1
+        raise Exception("The simulation is not completed after " + str(self.max_retries) + " retries!")
+
+    def __save_for_run(self, filename):
+        self.wait_checkpoint()
+        self.run_statistics["runs"] += 1
+        run_index = self.run_statistics["runs"]
+        record = {"run": run_index, "saved": False, "bytes": 0, "time": 0}
+        if (filename != self.__saved_filename or self.save_policy == "always" or
+                (self.save_policy == "every" and (run_index - 1) % self.save_every == 0)):
+            time_before_save = time.perf_counter()
+            filepath = self.save(filename)
+            record["time"] = time.perf_counter() - time_before_save
+            record["saved"] = True
+            record["bytes"] = self.__get_file_size(filepath)
+        self.save_statistics.append(record)
+
+    @staticmethod
+    def __get_file_size(filepath):
+        if (filepath[-4:] != ".fsp"):
+            filepath += ".fsp"
+        return os.path.getsize(filepath) if os.path.isfile(filepath) else 0
+
+    def set_save_policy(self, policy = "always", every = 1):
+        """
+        Set when "run" saves the simulation as a ".fsp" file before running.
+
+        Parameters
+        ----------
+        policy : String
+            "always": before every run, "every": before every "every" runs, "never": only when needed (default: "always").
+        every : Int
+            Number of runs between two saves for the "every" policy (default: 1).
+
+        Notes
+        -----
+        The simulation is always saved when "run" is called with a different filename from the last save, since
+        Lumerical FDTD needs a project file to run. Lumerical FDTD writes the project file itself when it runs, so the
+        skipped saves only skip the extra write before the run. Keep the improved designs with "checkpoint".
+        """
+        if policy not in ["always", "every", "never"]:
+            raise Exception("Wrong save policy!")
+        self.save_policy = policy
+        self.save_every = max(int(every), 1)
+
+    def checkpoint(self, cost, checkpoint_file = None, asynchronous = True):
+        """
+        Copy the project file of the last run (with its results) as a checkpoint when the cost is improved.
+
+        Parameters
+        ----------
+        cost : Float
+            Cost of the last run (lower, better).
+        checkpoint_file : String
+            Path of the checkpoint, None means the project file name with "_best" (default: None).
+        asynchronous : Bool
+            Whether to copy the file in a background thread, the next "run" or "save" waits for the copy (default: True).
+
+        Returns
+        -------
+        out : Bool
+            Whether a checkpoint is made.
+
+        Notes
+        -----
+        The project is saved before it is copied, so the copy starts after Lumerical has finished writing the file.
+        """
+        if (type(self.best_cost) != type(None) and not cost < self.best_cost):
+            return False
+        if (type(self.__saved_filename) == type(None)):
+            raise Exception("The simulation has not been saved!")
+        self.best_cost = cost
+        filepath = self.__saved_filename if self.__saved_filename[-4:] == ".fsp" else self.__saved_filename + ".fsp"
+        if (type(checkpoint_file) == type(None)):
+            checkpoint_file = filepath[:-4] + "_best.fsp"
+        self.wait_checkpoint()
+        self.fdtd.save(filepath)
+        if (asynchronous):
+            self.__checkpoint_thread = threading.Thread(target=self.__copy_checkpoint, args=(filepath, checkpoint_file))
+            self.__checkpoint_thread.start()
+        else:
+            self.__copy_checkpoint(filepath, checkpoint_file)
+        return True
+
+    def __copy_checkpoint(self, filepath, checkpoint_file):
+        record = {"run": self.run_statistics["runs"], "file": checkpoint_file, "bytes": 0, "time": 0}
+        time_before_copy = time.perf_counter()
+        if os.path.isfile(filepath):
+            shutil.copyfile(filepath, checkpoint_file)
+            record["bytes"] = os.path.getsize(checkpoint_file)
+        record["time"] = time.perf_counter() - time_before_copy
+        self.checkpoint_statistics.append(record)
+
+    def wait_checkpoint(self):
+        """
+        Wait for the checkpoint that is copied in the background.
+        """
+        if (type(self.__checkpoint_thread) != type(None)):
+            self.__checkpoint_thread.join()
+            self.__checkpoint_thread = None
+
+    def get_save_statistics(self):
+        """
+        Get the bytes written and the time spent by the saves of "run" and the checkpoints.
+
+        Returns
+        -------
+        out : Dict
+            {"saves": number of saves, "bytes": total bytes, "time": total time (unit: s), "per_run": [{"run", "saved",
+            "bytes", "time"} for every run], "checkpoints": [{"run", "file", "bytes", "time"} for every checkpoint]}.
+        """
+        self.wait_checkpoint()
+        return {"saves": sum([record["saved"] for record in self.save_statistics]),
+                "bytes": sum([record["bytes"] for record in self.save_statistics]),
+                "time": sum([record["time"] for record in self.save_statistics]),
+                "per_run": list(self.save_statistics),
+                "checkpoints": list(self.checkpoint_statistics)}
+
+    def set_completion_check(self, mode = "status", max_retries = 2):
+        """
+        Set how "run" verifies that a simulation is completed.
+
+        Parameters
+        ----------
+        mode : String
+            "status": check the solver status and the monitor data (see "check_completion"), "time": run again until the
+            run takes "min_time_threshold" of "run" (the old behavior), "none": no check, the mode before any call of
+            this function (default: "status").
+        max_retries : Int
+            Maximum number of runs again for a failed simulation in "status" mode (default: 2).
+        """
+        if mode not in ["status", "time", "none"]:
+            raise Exception("Wrong completion check mode!")
+        self.completion_check = mode
+        self.max_retries = max_retries
 
+    def check_completion(self):
+        """
+        Check whether the last simulation is completed: the solver has left "Layout" mode and every enabled power monitor
+        (including the ones of the mode expansion monitors) has finite data.
+
+        Returns
+        -------
+        out : Bool
+            Whether the simulation is completed.
+        """
+        monitor_names = [name for name in self.__monitor_names if name not in self.__disabled_monitor_names]
+        script = "splayout_status = struct;splayout_status.layout = layoutmode;splayout_data = 0;"
+        for i, monitor_name in enumerate(monitor_names):
+            script += "splayout_status.data_{0} = havedata(\"{1}\");".format(i, monitor_name)
+            script += "if (splayout_status.data_{0}) {{ splayout_data = getresult(\"{1}\",\"T\");splayout_status.sum_{0} = sum(splayout_data.T); }}".format(i, monitor_name)
+        script += "clear(splayout_data);"
+        self.fdtd.eval(script, read=True)
+        status = self.fdtd.getv("splayout_status")
+        if (status["layout"]):
+            return False
+        for i in range(0, len(monitor_names)):
+            if (not status["data_" + str(i)] or not np.all(np.isfinite(status["sum_" + str(i)]))):
+                return False
+        return True
+
+    def get_run_statistics(self):
+        """
+        Get the counters of "run".
+
+        Returns
+        -------
+        out : Dict
+            {"runs": number of calls, "retries": number of runs again, "failures": number of runs that raised}.
+        """
+        return dict(self.run_statistics)
+
+    def add_job(self, filename="temp"):
+        """
+        Save the simulation as a ".fsp" file and add it to the job queue of Lumerical FDTD.
+
+        Parameters
+        ----------
+        filename : String
+            File name or File path, should be unique for every job (default: "temp").
+
+        Notes
+        -----
+        The queue is cleared when the first job is added after "run_jobs". The job file does not replace the file that
+        "run" saves to.
+        """
+        filepath = self.__save_file(filename)
+        if (filepath[-4:] != ".fsp"):
+            filepath += ".fsp"
+        if (len(self.__jobs) == 0):
+            self.fdtd.eval("clearjobs;")
+        self.fdtd.eval("addjob(\"" + filepath + "\");")
+        self.__jobs.append(filepath)
+
+    def run_jobs(self):
+        """
+        Run all the jobs in the queue with the job manager of Lumerical FDTD (the jobs run concurrently according to
+        the resource configuration of Lumerical) and wait for them.
+
+        Returns
+        -------
+        out : List of FDTDJob
+            The jobs in the order they are added, call "job.load()" to load the results of a job.
+        """
+        jobs = [FDTDJob(self, filepath) for filepath in self.__jobs]
+        self.__jobs = []
+        self.fdtd.eval("runjobs;")
+        return jobs
 
     def get_transmission(self,monitor_name,datafile = None):
         """
@@ -539,8 +820,8 @@ class FDTDSimulation:
         out : Array
             Spectrum [wavelength,transmission], size: (2,frequency points).
         """
-        self.fdtd.eval("data = getresult(\"" + monitor_name + "\",\"T\");")
-        data = self.lumapi.getVar(self.fdtd.handle, varname="data")
+        self.fdtd.eval("data = getresult(\"" + monitor_name + "\",\"T\");", read=True)
+        data = self.fdtd.getv("data")
         wavelength = np.reshape(data["lambda"],(data["lambda"].shape[0]))
         transmission = data["T"]
         spectrum = np.zeros((2,data["T"].shape[0]))
@@ -566,15 +847,15 @@ class FDTDSimulation:
         out : Array
             Spectrum [[wavelength,transmission],...], size: (number of modes,2,frequency points).
         """
-        self.fdtd.eval("data = getresult(\"" + expansion_name + "\",\"expansion for Output\");")
+        self.fdtd.eval("data = getresult(\"" + expansion_name + "\",\"expansion for Output\");", read=True)
         self.fdtd.eval("wavelength = data.lambda;")
         if (direction == FORWARD):
             self.fdtd.eval("mode_transmission = data.T_forward;")
         elif (direction == BACKWARD):
             self.fdtd.eval("mode_transmission = data.T_backward;")
-        wavelength = self.lumapi.getVar(self.fdtd.handle, varname="wavelength")
+        wavelength = self.fdtd.getv("wavelength")
         wavelength = np.reshape(wavelength, (wavelength.shape[0]))
-        transmission = self.lumapi.getVar(self.fdtd.handle, varname="mode_transmission").T
+        transmission = self.fdtd.getv("mode_transmission").T
         spectrum = np.zeros((transmission.shape[0], 2, transmission.shape[1]))
         for i in range(0, transmission.shape[0]):
             spectrum[i, 0, :] = wavelength
@@ -583,6 +864,37 @@ class FDTDSimulation:
             np.save(datafile, spectrum)
         return spectrum
 
+    def fetch_results(self, spec, direction = FORWARD):
+        """
+        Get several quantities from several monitors and sources with one script and one data transfer.
+
+        Parameters
+        ----------
+        spec : Dict
+            {monitor or source name: quantity or list of quantities}, available quantities: "transmission" (power monitor),
+            "mode_transmission", "mode_coefficient", "mode_phase" (mode expansion monitor) and "source_power" (source).
+        direction : Int
+            The light propagation direction for the mode expansion quantities 1: the positive direction of x-axis, 0: the negative direction of x-axis(FORWARD:1, BACKWARD:0 , default: FORWARD).
+
+        Returns
+        -------
+        out : SimulationResult
+            The results, e.g. result["expansion", "mode_transmission"] has the same format as get_mode_transmission("expansion").
+
+        Notes
+        -----
+        "mode_coefficient" and "mode_phase" of the same monitor share one transfer.
+        """
+        if not (self.global_source_set_flag and self.global_monitor_set_flag):
+            raise Exception("The source is not well defined!")
+        script, requests = make_fetch_script(spec, direction, self.wavelength_start, self.wavelength_end, self.frequency_points)
+        self.fdtd.eval(script, read=True)
+        result = parse_fetched_results(self.fdtd.getv("splayout_results"), requests, self.get_wavelength())
+        for name, quantity in result.keys():
+            if (quantity == "source_power"):
+                self.__get_cached(("source_power", name), lambda: result[name, quantity].copy())
+        return result
+
     def get_mode_phase(self, expansion_name, direction = FORWARD, datafile = None):
         """
         Get data and calculate phase vs wavelength from mode expansion monitor after running the simulation.
@@ -664,20 +976,24 @@ class FDTDSimulation:
         Notes
         -----
         This function should be called after setting the frequency points in any frequency domain monitor.
+        The source power is fetched once per run generation (see "get_run_generation").
         """
+        source_power = self.__get_cached(("source_power", source_name), lambda: self.__get_source_power(source_name))
+        if (datafile != None):
+            np.save(datafile, source_power)
+        return source_power
+
+    def __get_source_power(self, source_name):
         if self.global_source_set_flag  and self.global_monitor_set_flag:
-            wavelength = np.linspace(self.wavelength_start, self.wavelength_end, self.frequency_points)
-            frequency = scipy.constants.speed_of_light / wavelength
+            frequency = self.get_frequency()
             if (type(source_name) == type(None)):
                 source_power = self.fdtd.sourcepower(frequency)
             else:
-                self.lumapi.putMatrix(self.fdtd.handle, "frequency", frequency)
-                self.fdtd.eval("data = sourcepower(frequency,2,\""+source_name+"\");")
-                source_power = self.lumapi.getVar(self.fdtd.handle, varname="data")
+                self.fdtd.putv("frequency", frequency)
+                self.fdtd.eval("data = sourcepower(frequency,2,\""+source_name+"\");", read=True)
+                source_power = self.fdtd.getv("data")
         else:
             raise Exception("The source is not well defined!")
-        if (datafile != None):
-            np.save(datafile, source_power.flatten())
         return np.asarray(source_power).flatten()
 
     def get_wavelength(self):
@@ -692,7 +1008,11 @@ class FDTDSimulation:
         Notes
         -----
         This function should be called after setting the wavelength range in source and the frequency points in any frequency domain monitor.
+        The result is cached until the next run generation (see "get_run_generation").
         """
+        return self.__get_cached("wavelength", self.__get_wavelength)
+
+    def __get_wavelength(self):
         if self.global_source_set_flag  and self.global_monitor_set_flag:
             wavelength = np.linspace(self.wavelength_start, self.wavelength_end, self.frequency_points)
         else:
@@ -711,13 +1031,9 @@ class FDTDSimulation:
         Notes
         -----
         This function should be called after setting the wavelength range in source and the frequency points in any frequency domain monitor.
+        The result is cached until the next run generation (see "get_run_generation").
         """
-        if self.global_source_set_flag  and self.global_monitor_set_flag:
-            wavelength = np.linspace(self.wavelength_start, self.wavelength_end, self.frequency_points,endpoint=True)
-            frequency = scipy.constants.speed_of_light / wavelength
-        else:
-            raise Exception("The source is not well defined!")
-        return frequency
+        return self.__get_cached("frequency", lambda: scipy.constants.speed_of_light / self.get_wavelength())
 
     def get_omega(self):
         """
@@ -731,14 +1047,78 @@ class FDTDSimulation:
         Notes
         -----
         This function should be called after setting the wavelength range in source and the frequency points in any frequency domain monitor.
+        The result is cached until the next run generation (see "get_run_generation").
         """
-        if self.global_source_set_flag  and self.global_monitor_set_flag:
-            wavelength = np.linspace(self.wavelength_start, self.wavelength_end, self.frequency_points)
-            omega = 2.0 * np.pi * scipy.constants.speed_of_light / wavelength
+        return self.__get_cached("omega", lambda: 2.0 * np.pi * scipy.constants.speed_of_light / self.get_wavelength())
+
+    def __get_cached(self, key, function):
+        if (self.__cache_generation != self.fdtd.generation):
+            self.__spectral_cache = {}
+            self.__cache_generation = self.fdtd.generation
+        if key not in self.__spectral_cache:
+            value = function()
+            ## the calls made for fetching the value (e.g. putv of the frequency points) do not change the simulation
+            self.__cache_generation = self.fdtd.generation
+            self.__spectral_cache[key] = value
+        return self.__spectral_cache[key].copy()
+
+    def get_run_generation(self):
+        """
+        Get the run generation, the generation of the Lumerical session, which is increased by every call that may
+        change the simulation (run, save, putv and every eval that is not a read of results, including the evals of
+        the other objects working on this simulation).
+
+        Returns
+        -------
+        out : Int
+            Run generation.
+
+        Notes
+        -----
+        Wavelength, frequency, omega and source power are fetched once per run generation.
+        """
+        return self.fdtd.generation
+
+    def new_run_generation(self):
+        """
+        Increase the run generation, so that the cached wavelength, frequency, omega and source power are fetched again.
+        """
+        self.fdtd.generation += 1
+
+
+    def set_field_transfer(self, mode = "getv", transfer_dir = None):
+        """
+        Set how the field and index distributions are transferred from Lumerical FDTD.
+
+        Parameters
+        ----------
+        mode : String
+            "getv": through the Python API, "file": through ".mat" files that are opened memory-mapped (default: "getv").
+        transfer_dir : String
+            Scratch directory for the ".mat" files in "file" mode, it should be accessible for Lumerical FDTD, None means a new temporary directory (default: None).
+
+        Notes
+        -----
+        The "file" mode avoids copying multi-GB field arrays (e.g. TopologyOptRegion3D with fine mesh and many frequency points)
+        through the Python API, it affects get_E_distribution and get_epsilon_distribution. The fields are then returned
+        as MappedComplexArray objects over the memory-mapped real and imaginary parts (see FieldTransfer).
+        """
+        if (mode == "getv"):
+            self.field_transfer = None
+        elif (mode == "file"):
+            self.field_transfer = FieldTransfer(transfer_dir)
         else:
-            raise Exception("The source is not well defined!")
-        return omega
+            raise Exception("Wrong field transfer mode!")
+
+    def __get_data(self, data_name, result_script, fields):
+        self.fdtd.eval(data_name + " = " + result_script + ";", read=True)
+        return self.__transfer_data(data_name, fields)
 
+    def __transfer_data(self, data_name, fields):
+        if (type(self.field_transfer) == type(None)):
+            data = self.fdtd.getv(data_name)
+            return dict([(field, data[field]) for field in fields])
+        return self.field_transfer.transfer(self.fdtd, data_name, fields)
 
     def get_epsilon_distribution(self,index_monitor_name="index", data_name = "index_data",  datafile = None):
         """
@@ -758,13 +1138,12 @@ class FDTDSimulation:
         out : Array
             Spectrum, size: (x mesh, y mesh, z mesh, 1).
         """
-        self.fdtd.eval("{0} = getresult(\"".format(data_name) + index_monitor_name + "\",\"index\");")
-        index = self.lumapi.getVar(self.fdtd.handle, "{0}".format(data_name))
-        fields_eps = np.stack((np.power(index['index_x'], 2),
-                               np.power(index['index_y'], 2),
-                               np.power(index['index_z'], 2)),
-                              axis=-1)
-        fields_eps = np.squeeze(fields_eps,axis = -2)
+        index = self.__get_data(data_name, "getresult(\"" + index_monitor_name + "\",\"index\")", ["index_x", "index_y", "index_z"])
+        shape = index['index_x'].shape
+        shape = (shape + (1,) * (4 - len(shape)))[:-1]
+        fields_eps = np.empty(shape + (3,), dtype=np.result_type(index['index_x']))
+        for i, axis in enumerate(["index_x", "index_y", "index_z"]):
+            np.square(index[axis].reshape(shape), out=fields_eps[..., i])
         if (datafile != None):
             np.save(datafile, fields_eps)
         return fields_eps
@@ -792,7 +1171,7 @@ class FDTDSimulation:
                   "{0}(:, :, :, :, 1) = {1}_data_set.index_x^2;".format(data_name, index_monitor_name) +
                   "{0}(:, :, :, :, 2) = {1}_data_set.index_y^2;".format(data_name, index_monitor_name) +
                   "{0}(:, :, :, :, 3) = {1}_data_set.index_z^2;".format(data_name, index_monitor_name) +
-                  "clear({0}_data_set);".format(index_monitor_name))
+                  "clear({0}_data_set);".format(index_monitor_name), read=True)
         return data_name
 
     def get_E_distribution(self, field_monitor_name = "field", data_name = "field_data",datafile = None, if_get_spatial = 0):
@@ -818,8 +1197,8 @@ class FDTDSimulation:
             if if_get_spatial == 1: field, x mesh, y mesh, z mesh
                 size: (x mesh, y mesh, z mesh, frequency points, 3), (x mesh,), (y mesh,), (z mesh,)
         """
-        self.fdtd.eval("{0} = getresult(\"".format(data_name) + field_monitor_name + "\",\"E\");")
-        field = self.lumapi.getVar(self.fdtd.handle, "{0}".format(data_name))
+        field = self.__get_data(data_name, "getresult(\"" + field_monitor_name + "\",\"E\")", ["E", "x", "y", "z"] if if_get_spatial else ["E"])
+        field['E'] = field['E'].reshape(field['E'].shape + (1,) * (5 - field['E'].ndim))
         if (datafile != None):
             np.save(datafile, field['E'])
         if if_get_spatial:
@@ -827,6 +1206,65 @@ class FDTDSimulation:
         else:
             return field['E']
 
+    def iter_E_distribution(self, field_monitor_name = "field", data_name = "field_data", chunk = 10):
+        """
+        Get electric field distribution from field monitor in frequency chunks.
+
+        Parameters
+        ----------
+        field_monitor_name : String
+            Name of the field monitor (default: "field").
+        data_name : String
+            Name of the data in Lumeircal FDTD (default: "field_data").
+        chunk : Int
+            Number of frequency points in every chunk (default: 10).
+
+        Yields
+        ------
+        frequency_slice : slice
+            Indices of the frequency points in the chunk.
+        field : Array
+            size: (x mesh, y mesh, z mesh, frequency points in the chunk, 3).
+        """
+        self.fdtd.eval("{0} = getresult(\"".format(data_name) + field_monitor_name + "\",\"E\");", read=True)
+        for frequency_slice, field in self.iter_E_distribution_in_CAD(data_name = data_name, chunk = chunk):
+            yield frequency_slice, field
+
+    def iter_E_distribution_in_CAD(self, data_name = "field_data", chunk = 10):
+        """
+        Get electric field distribution in frequency chunks from the data saved in CAD (e.g. by get_E_distribution_in_CAD).
+
+        Parameters
+        ----------
+        data_name : String
+            Name of the data in Lumeircal FDTD (default: "field_data").
+        chunk : Int
+            Number of frequency points in every chunk (default: 10).
+
+        Yields
+        ------
+        frequency_slice : slice
+            Indices of the frequency points in the chunk.
+        field : Array
+            size: (x mesh, y mesh, z mesh, frequency points in the chunk, 3).
+
+        Notes
+        -----
+        Only one chunk is transferred from Lumerical FDTD at a time, so the memory scales with the chunk size
+        instead of the number of frequency points.
+        """
+        frequency_points = len(self.get_wavelength())
+        chunk_name = data_name + "_chunk"
+        self.fdtd.eval("{0}_E = {0}.E;".format(data_name))
+        try:
+            for start in range(0, frequency_points, chunk):
+                stop = min(start + chunk, frequency_points)
+                self.fdtd.eval("{0} = struct;{0}.E = {1}_E(:,:,:,{2}:{3},:);".format(chunk_name, data_name, start + 1, stop))
+                field = self.__transfer_data(chunk_name, ["E"])['E']
+                yield slice(start, stop), field.reshape(field.shape + (1,) * (5 - field.ndim))
+        finally:
+            self.fdtd.eval("clear({0}_E,{1});".format(data_name, chunk_name))
+
     def get_E_distribution_in_CAD(self, field_monitor_name = "field", data_name = "field_data"):
         """
         Get electric field distribution from field monitor and save the data in CAD.
@@ -845,7 +1283,7 @@ class FDTDSimulation:
 
         """
         self.fdtd.eval("options=struct; options.unfold=true;"+
-            "{0} = getresult(\"".format(data_name) + field_monitor_name + "\",\"E\",options);")
+            "{0} = getresult(\"".format(data_name) + field_monitor_name + "\",\"E\",options);", read=True)
 
         return data_name
 
@@ -865,66 +1303,57 @@ class FDTDSimulation:
 
     def set_disable(self,item_name):
         """
-        Set an item of the simulation to "disable" state.
+        Set items of the simulation to "disable" state.
 
         Parameters
         ----------
         item_name : String or list
-            Name of the item.
+            Name(s) of the item(s), "*" matches any characters (e.g. "pixels*"), a group name applies to the whole group.
 
         Notes
         -----
-        This function should be called in "Layout" mode for the Lumerical FDTD simulaiton.
+        This function should be called in "Layout" mode for the Lumerical FDTD simulaiton. All the items are handled by one script.
         """
-        if (type(item_name) == list):
-            for name in item_name:
-                self.fdtd.eval("select(\"" + name + "\");")
-                self.fdtd.eval("set(\"enabled\",0);")
-        else:
-            self.fdtd.eval("select(\""+item_name+"\");")
-            self.fdtd.eval("set(\"enabled\",0);")
+        self.fdtd.eval(make_item_script(item_name, "disable"))
+        for name in match_item_names(item_name, self.__monitor_names):
+            if name not in self.__disabled_monitor_names:
+                self.__disabled_monitor_names.append(name)
 
     def set_enable(self,item_name):
         """
-        Set an item of the simulation to "enable" state.
+        Set items of the simulation to "enable" state.
 
         Parameters
         ----------
         item_name : String or list
-            Name of the item.
+            Name(s) of the item(s), "*" matches any characters (e.g. "pixels*"), a group name applies to the whole group.
 
         Notes
         -----
-        This function should be called in "Layout" mode for the Lumerical FDTD simulaiton.
+        This function should be called in "Layout" mode for the Lumerical FDTD simulaiton. All the items are handled by one script.
         """
-        if (type(item_name) == list):
-            for name in item_name:
-                self.fdtd.eval("select(\"" + name + "\");")
-                self.fdtd.eval("set(\"enabled\",1);")
-        else:
-            self.fdtd.eval("select(\"" + item_name + "\");")
-            self.fdtd.eval("set(\"enabled\",1);")
+        self.fdtd.eval(make_item_script(item_name, "enable"))
+        for name in match_item_names(item_name, self.__disabled_monitor_names):
+            self.__disabled_monitor_names.remove(name)
 
     def remove(self, item_name):
         """
-        Remove an item of the simulation.
+        Remove items of the simulation.
 
         Parameters
         ----------
         item_name : String or list
-            Name of the item.
+            Name(s) of the item(s), "*" matches any characters (e.g. "pixels*"), a group name applies to the whole group.
 
         Notes
         -----
-        This function should be called in "Layout" mode for the Lumerical FDTD simulaiton.
+        This function should be called in "Layout" mode for the Lumerical FDTD simulaiton. All the items are handled by one script.
         """
-        if (type(item_name) == list):
-            for name in item_name:
-                self.fdtd.eval("select(\"" + name + "\");")
-                self.fdtd.eval("delete;")
-        else:
-            self.fdtd.eval("select(\"" + item_name + "\");")
-            self.fdtd.eval("delete;")
+        self.fdtd.eval(make_item_script(item_name, "remove"))
+        for name in match_item_names(item_name, self.__monitor_names):
+            self.__monitor_names.remove(name)
+            if name in self.__disabled_monitor_names:
+                self.__disabled_monitor_names.remove(name)
 
     @staticmethod
     def str_list(list):
@@ -1210,8 +1639,115 @@ class FDTDSimulation:
         '''
         self.fdtd.eval(command)
 
+    def enable_profiler(self, profiler = None):
+        """
+        Time and count every call to Lumerical FDTD (eval, putv, getv, getresult, run, ...) by the splayout method it originates from.
 
+        Parameters
+        ----------
+        profiler : LumericalProfiler
+            The profiler, None means a new one (default: None).
 
+        Returns
+        -------
+        out : LumericalProfiler
+            The profiler, e.g. pass "profiler.wrap_callback()" as the callback function of an optimizer and export the
+            per-iteration reports with "profiler.export_json" or "profiler.export_csv".
+        """
+        if (type(profiler) == type(None)):
+            profiler = LumericalProfiler()
+        self.fdtd.profiler = profiler
+        return profiler
 
+    def disable_profiler(self):
+        """
+        Stop profiling the calls to Lumerical FDTD.
+        """
+        self.fdtd.profiler = None
+
+    def get_profiler(self):
+        """
+        Get the profiler.
+
+        Returns
+        -------
+        out : LumericalProfiler or None
+            The profiler, None if profiling is not enabled.
+        """
+        return self.fdtd.profiler
 
+    def start_trace(self, filename):
+        """
+        Record every call to Lumerical FDTD (the eval scripts, the putv payloads and the other calls) to a trace file.
+
+        Parameters
+        ----------
+        filename : String
+            Path of the trace file.
+
+        Returns
+        -------
+        out : LumericalTraceRecorder
+            The recorder, replay the trace with LumericalTraceReplayer(filename).replay(target).
+        """
+        self.stop_trace()
+        self.fdtd.recorder = LumericalTraceRecorder(filename)
+        return self.fdtd.recorder
+
+    def stop_trace(self):
+        """
+        Stop recording and close the trace file.
+        """
+        if (type(self.fdtd.recorder) != type(None)):
+            self.fdtd.flush()
+            self.fdtd.recorder.close()
+            self.fdtd.recorder = None
 
+    def batch(self):
+        '''
+        Buffer the scripts generated by the functions of this object and send them to Lumerical as one single eval.
+
+        Returns
+        -------
+        out : context manager
+            Use as "with sim.batch(): ...", the scripts are flushed when the block ends.
+
+        Notes
+        -----
+        Calls that need data from Lumerical (e.g. getting results) flush the buffered scripts first.
+        If an exception leaves the block, the scripts buffered since the last flush are dropped without being sent
+        to Lumerical, and the exception is raised again.
+        '''
+        return self.fdtd.batch()
+
+
+class FDTDJob:
+    """
+    A job that runs by the job manager of Lumerical FDTD, returned by "FDTDSimulation.run_jobs".
+
+    Parameters
+    ----------
+    fdtd_engine : FDTDSimulation
+        The FDTDSimulation object.
+    filepath : String
+        Path of the ".fsp" file of the job.
+    """
+    def __init__(self, fdtd_engine, filepath):
+        self.fdtd_engine = fdtd_engine
+        self.filepath = filepath
+
+    def load(self):
+        """
+        Load the results of this job into the Lumerical session.
+
+        Returns
+        -------
+        out : FDTDSimulation
+            The FDTDSimulation object, whose results (e.g. get_mode_transmission) now come from this job.
+
+        Notes
+        -----
+        Loading a job replaces the current project in the session, load the base project again before editing it.
+        """
+        self.fdtd_engine.fdtd.eval("load(\"" + self.filepath + "\");")
+        return self.fdtd_engine
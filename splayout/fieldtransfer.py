@@ -0,0 +1,340 @@
+import os
+import tempfile
+import numpy as np
+import scipy.io
+
+## data types of MAT-file (level 5) data elements
+_MI_DTYPES = {1: "i1", 2: "u1", 3: "i2", 4: "u2", 5: "i4", 6: "u4", 7: "f4", 9: "f8", 12: "i8", 13: "u8"}
+_MI_MATRIX = 14
+_MX_NUMERIC_CLASSES = (6, 7, 8, 9, 10, 11, 12, 13, 14, 15)
+_COMPLEX_FLAG = 0x0800
+
+
+class FieldTransfer:
+    """
+    Transfer of large datasets (field and index distributions) from Lumerical through ".mat" files.
+
+    Lumerical writes the requested datasets into a ".mat" file in a scratch directory with "matlabsave", and the
+    numeric arrays in the file are opened memory-mapped instead of being copied through the Python API.
+
+    Parameters
+    ----------
+    transfer_dir : String
+        Scratch directory for the ".mat" files, None means a new temporary directory (default: None).
+
+    Notes
+    -----
+    Every transfer writes a new file, so the arrays returned by a transfer are not changed by the next one. Real arrays
+    are returned as read-only memory maps. Complex arrays are stored as separate real and imaginary parts in ".mat"
+    files, they are returned as MappedComplexArray objects over the two mapped parts, which are only assembled into
+    complex arrays when they are sliced or used in calculations. A file is removed as soon as it is not mapped any
+    more: right after the transfer on POSIX systems (the mapped data stays valid), when the returned arrays are
+    released on Windows (checked at every transfer and by "cleanup"). Arrays that can not be mapped (e.g. compressed
+    files) are read with scipy.io.loadmat.
+    """
+    def __init__(self, transfer_dir = None):
+        if (type(transfer_dir) == type(None)):
+            transfer_dir = tempfile.mkdtemp(prefix="splayout_")
+        elif not os.path.isdir(transfer_dir):
+            os.makedirs(transfer_dir)
+        self.transfer_dir = transfer_dir
+        self.__transfer_count = 0
+        self.__stale_files = []
+
+    def new_filepath(self, data_name):
+        """
+        Get the path of a new ".mat" file for a transfer of a dataset.
+
+        Parameters
+        ----------
+        data_name : String
+            Name of the data in Lumerical.
+
+        Returns
+        -------
+        out : String
+            File path (with "/" as separator so that it can be used in Lumerical scripts).
+        """
+        self.__transfer_count += 1
+        filename = "{0}_{1}_{2}.mat".format(data_name, os.getpid(), self.__transfer_count)
+        return os.path.abspath(os.path.join(self.transfer_dir, filename)).replace("\\", "/")
+
+    def make_save_script(self, data_name, fields, filepath):
+        """
+        Generate the Lumerical script that saves fields of a dataset into a ".mat" file.
+
+        Parameters
+        ----------
+        data_name : String
+            Name of the data in Lumerical.
+        fields : List of String
+            Fields of the data, e.g. ["E", "x", "y", "z"].
+        filepath : String
+            Path of the ".mat" file (see "new_filepath").
+
+        Returns
+        -------
+        out : String
+            The script.
+        """
+        variables = [data_name + "_" + field for field in fields]
+        script = ""
+        for variable, field in zip(variables, fields):
+            script += variable + " = " + data_name + "." + field + ";"
+        script += "matlabsave(\"" + filepath + "\"," + ",".join(variables) + ");"
+        script += "clear(" + ",".join(variables) + ");"
+        return script
+
+    def load(self, data_name, fields, filepath):
+        """
+        Open the fields saved by the script from "make_save_script".
+
+        Parameters
+        ----------
+        data_name : String
+            Name of the data in Lumerical.
+        fields : List of String
+            Fields of the data, e.g. ["E", "x", "y", "z"].
+        filepath : String
+            Path of the ".mat" file.
+
+        Returns
+        -------
+        out : Dict
+            {field: Array or MappedComplexArray}, real arrays are read-only memory maps of the file.
+        """
+        variables = [data_name + "_" + field for field in fields]
+        arrays = map_mat_arrays(filepath, variables)
+        if (type(arrays) == type(None)):
+            arrays = scipy.io.loadmat(filepath, variable_names=variables)
+        data = {}
+        for variable, field in zip(variables, fields):
+            if variable not in arrays:
+                raise Exception("\"" + field + "\" of \"" + data_name + "\" is not found in \"" + filepath + "\"!")
+            data[field] = arrays[variable]
+        self.__stale_files.append(filepath)
+        self.cleanup()
+        return data
+
+    def transfer(self, session, data_name, fields):
+        """
+        Save fields of a dataset in Lumerical into a new ".mat" file and open them.
+
+        Parameters
+        ----------
+        session : LumericalSession
+            Session of the Lumerical product.
+        data_name : String
+            Name of the data in Lumerical.
+        fields : List of String
+            Fields of the data, e.g. ["E", "x", "y", "z"].
+
+        Returns
+        -------
+        out : Dict
+            {field: Array or MappedComplexArray}, real arrays are read-only memory maps of the file.
+        """
+        filepath = self.new_filepath(data_name)
+        session.eval(self.make_save_script(data_name, fields, filepath), read=True)
+        return self.load(data_name, fields, filepath)
+
+    def cleanup(self):
+        """
+        Remove the transferred files that are not mapped any more.
+        """
+        remained = []
+        for filepath in self.__stale_files:
+            try:
+                if os.path.isfile(filepath):
+                    os.remove(filepath)
+            except OSError:
+                remained.append(filepath)
+        self.__stale_files = remained
+
+
+class MappedComplexArray(np.lib.mixins.NDArrayOperatorsMixin):
+    """
+    Complex array backed by the memory maps of its real and imaginary parts.
+
+    Slicing returns the complex values of the slice only, and numpy functions and arithmetic operators assemble the
+    whole complex array. Use "complex_einsum" to contract it without assembling it.
+
+    Parameters
+    ----------
+    real : Array
+        Real part.
+    imag : Array
+        Imaginary part, with the same size as real.
+    """
+    def __init__(self, real, imag):
+        self.real = real
+        self.imag = imag
+
+    @property
+    def shape(self):
+        return self.real.shape
+
+    @property
+    def ndim(self):
+        return self.real.ndim
+
+    @property
+    def size(self):
+        return self.real.size
+
+    @property
+    def dtype(self):
+        return np.result_type(self.real.dtype, self.imag.dtype, np.complex64)
+
+    def __len__(self):
+        return len(self.real)
+
+    def __getitem__(self, key):
+        return _assemble_complex(self.real[key], self.imag[key])
+
+    def reshape(self, *shape):
+        """
+        Reshape the array without assembling it.
+
+        Returns
+        -------
+        out : MappedComplexArray
+            The reshaped array.
+        """
+        if (len(shape) == 1 and type(shape[0]) == tuple):
+            shape = shape[0]
+        return MappedComplexArray(self.real.reshape(shape), self.imag.reshape(shape))
+
+    def __array__(self, dtype = None, copy = None):
+        array = _assemble_complex(self.real, self.imag)
+        if (type(dtype) != type(None)):
+            array = array.astype(dtype)
+        return array
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        inputs = [np.asarray(x) if isinstance(x, MappedComplexArray) else x for x in inputs]
+        return getattr(ufunc, method)(*inputs, **kwargs)
+
+
+def complex_einsum(subscripts, operand_0, operand_1):
+    """
+    np.einsum of two operands, MappedComplexArray operands are contracted through their real and imaginary parts.
+
+    Parameters
+    ----------
+    subscripts : String
+        Subscripts of np.einsum, e.g. "xyzfc,xyzfc->xyf".
+    operand_0 : Array or MappedComplexArray
+        First operand.
+    operand_1 : Array or MappedComplexArray
+        Second operand.
+
+    Returns
+    -------
+    out : Array
+        The result.
+    """
+    if not isinstance(operand_0, MappedComplexArray) and not isinstance(operand_1, MappedComplexArray):
+        return np.einsum(subscripts, operand_0, operand_1)
+    real_0, imag_0 = _split_complex(operand_0)
+    real_1, imag_1 = _split_complex(operand_1)
+    ## (a + ib)(c + id) = ac - bd + i(ad + bc)
+    real = np.einsum(subscripts, real_0, real_1)
+    imag = np.zeros(real.shape)
+    if (type(imag_0) != type(None) and type(imag_1) != type(None)):
+        real = real - np.einsum(subscripts, imag_0, imag_1)
+    if (type(imag_1) != type(None)):
+        imag = imag + np.einsum(subscripts, real_0, imag_1)
+    if (type(imag_0) != type(None)):
+        imag = imag + np.einsum(subscripts, imag_0, real_1)
+    return _assemble_complex(real, imag)
+
+
+def _split_complex(operand):
+    if isinstance(operand, MappedComplexArray):
+        return operand.real, operand.imag
+    operand = np.asarray(operand)
+    if np.iscomplexobj(operand):
+        return operand.real, operand.imag
+    return operand, None
+
+
+def _assemble_complex(real, imag):
+    array = np.empty(np.shape(real), dtype=np.result_type(real, imag, np.complex64))
+    array.real = real
+    array.imag = imag
+    return array
+
+
+def map_mat_arrays(filepath, names = None):
+    """
+    Open the numeric arrays of an uncompressed MAT-file (level 5) as memory maps.
+
+    Parameters
+    ----------
+    filepath : String
+        Path to the ".mat" file.
+    names : List of String
+        Names of the arrays, None means all the arrays (default: None).
+
+    Returns
+    -------
+    out : Dict or None
+        {name: Array or MappedComplexArray}, real arrays are read-only memory maps (Fortran order), complex arrays are
+        MappedComplexArray objects over the mapped real and imaginary parts. None if the file contains data elements
+        that can not be mapped.
+    """
+    file_size = os.path.getsize(filepath)
+    with open(filepath, "rb") as file:
+        header = file.read(128)
+    if (len(header) < 128 or header[126:128] != b"IM"):
+        return None
+    arrays = {}
+    offset = 128
+    while (offset + 8 <= file_size):
+        element_type, element_size, data_offset, offset = _read_tag(filepath, offset)
+        if (element_type != _MI_MATRIX):
+            return None
+        array = _map_matrix(filepath, data_offset, data_offset + element_size, names)
+        if (type(array) == type(None)):
+            return None
+        if (type(array[0]) != type(None)):
+            arrays[array[0]] = array[1]
+    return arrays
+
+
+def _read_tag(filepath, offset):
+    tag = np.fromfile(filepath, dtype="<u4", count=2, offset=offset)
+    if (tag[0] >> 16):
+        ## small data element, the data is packed in the tag
+        return int(tag[0] & 0xffff), int(tag[0] >> 16), offset + 4, offset + 8
+    element_size = int(tag[1])
+    return int(tag[0]), element_size, offset + 8, offset + 8 + element_size + (-element_size) % 8
+
+
+def _map_matrix(filepath, start, end, names):
+    flags_type, flags_size, flags_offset, offset = _read_tag(filepath, start)
+    flags = np.fromfile(filepath, dtype="<u4", count=1, offset=flags_offset)[0]
+    if ((flags & 0xff) not in _MX_NUMERIC_CLASSES):
+        return None
+    dims_type, dims_size, dims_offset, offset = _read_tag(filepath, offset)
+    shape = tuple(np.fromfile(filepath, dtype="<i4", count=dims_size // 4, offset=dims_offset))
+    name_type, name_size, name_offset, offset = _read_tag(filepath, offset)
+    name = np.fromfile(filepath, dtype="u1", count=name_size, offset=name_offset).tobytes().decode("ascii")
+    if (type(names) != type(None) and name not in names):
+        return None, None
+    parts = []
+    for i in range(0, 2 if (flags & _COMPLEX_FLAG) else 1):
+        part_type, part_size, part_offset, offset = _read_tag(filepath, offset)
+        if (part_type not in _MI_DTYPES or offset > end + 8):
+            return None
+        dtype = np.dtype("<" + _MI_DTYPES[part_type])
+        if (part_size != int(np.prod(shape)) * dtype.itemsize):
+            return None
+        if (part_size == 0):
+            parts.append(np.zeros(shape, dtype=dtype))
+        else:
+            parts.append(np.memmap(filepath, dtype=dtype, mode="r", offset=part_offset, shape=shape, order="F"))
+    if (len(parts) == 1):
+        return name, parts[0]
+    return name, MappedComplexArray(parts[0], parts[1])
@@ -0,0 +1,419 @@
+import sys, os
+import re
+import time
+import numpy as np
+import scipy.constants
+import scipy.io
+
+## script functions without a result that FakeLumapiTransport records, the other unknown names raise AttributeError
+_RECORDED_FUNCTIONS = ["save", "load", "redrawoff", "redrawon", "set", "updatemodes", "updatesourcemode"]
+
+class LumapiTransport:
+    """
+    Transport to a Lumerical product through the Lumerical Python API (lumapi).
+
+    A transport is the object FDTDSimulation and MODESimulation send their commands to. It should provide
+    eval(command), putv(name, value), getv(name) and getresult(name, dataset), other Lumerical script
+    functions (save, setglobalmonitor, ...) are called as methods with the same name.
+
+    Parameters
+    ----------
+    product : String
+        Name of the Lumerical product, "FDTD" or "MODE" (default: "FDTD").
+    hide : Bool
+        Whether the Lumerical window is hidden (default: False).
+    lumapi_path : String
+        Path to the Lumerical Python API folder.
+    """
+    def __init__(self, product = "FDTD", hide = 0, lumapi_path = "C:\\Program Files\\Lumerical\\v202\\api\\python\\"):
+        sys.path.append(lumapi_path)
+        sys.path.append(os.path.dirname(__file__))
+        try:
+            os.add_dll_directory(lumapi_path)
+        except:
+            pass
+        try:
+            import lumapi
+        except:
+            raise Exception(
+                "Lumerical " + product + " is not installed in the default path, please specify the python api path with fdtd_path=***.")
+        self.lumapi = lumapi
+        self.product = product
+        self.session = getattr(self.lumapi, product)(hide=hide)
+
+    def eval(self, command):
+        """
+        Execute a script in Lumerical.
+
+        Parameters
+        ----------
+        command : str
+            Command that can be evaluated in Lumerical.
+        """
+        self.session.eval(command)
+
+    def putv(self, name, value):
+        """
+        Send a variable to Lumerical.
+
+        Parameters
+        ----------
+        name : str
+            Name of the variable in Lumerical.
+        value : Array or Float or str
+            Value of the variable.
+        """
+        self.session.putv(name, value)
+
+    def getv(self, name):
+        """
+        Get a variable from Lumerical.
+
+        Parameters
+        ----------
+        name : str
+            Name of the variable in Lumerical.
+
+        Returns
+        -------
+        out : Array or Dict or Float or str
+            Value of the variable.
+        """
+        return self.session.getv(name)
+
+    def getresult(self, *args):
+        """
+        Get a result from Lumerical, the arguments are the same as the "getresult" script function.
+
+        Returns
+        -------
+        out : Dict or Array
+            The result.
+        """
+        return self.session.getresult(*args)
+
+    def __getattr__(self, name):
+        if (name.startswith("_") or "session" not in self.__dict__):
+            raise AttributeError(name)
+        return getattr(self.session, name)
+
+
+class FakeLumapiTransport:
+    """
+    In-process stand-in for a Lumerical product, for profiling and benchmarking without a license.
+
+    Every call is recorded and delayed by a fixed latency. Variables sent by putv are kept and returned by getv,
+    "getresult" returns randomly filled arrays with the shapes of the real results, and simple assignments in
+    eval scripts (e.g. 'data = getresult("monitor","T");' or 'wavelength = data.lambda;') and simple "if" blocks are
+    interpreted so that the data can be fetched with getv afterwards, and "matlabsave" writes the variables into a ".mat"
+    file. Nothing is solved.
+
+    Parameters
+    ----------
+    product : String
+        Name of the simulated Lumerical product (default: "FDTD").
+    latency : Float
+        Simulated delay for every call (unit: s, default: 0).
+    run_latency : Float
+        Additional simulated delay for every eval that contains "run;" or "runjobs;" (unit: s, default: 0).
+    frequency_points : Int
+        Frequency points of the results before any global monitor is set (default: 11).
+    monitor_shape : tuple
+        Spatial size (x mesh, y mesh, z mesh) of field and index results (default: (10,10,1)).
+    monitor_shapes : Dict
+        Spatial sizes of specified monitors, {monitor name: (x mesh, y mesh, z mesh)} (default: None).
+    mode_number : Int
+        Number of modes in mode expansion results (default: 1).
+    seed : Int
+        Seed for the synthetic data (default: None).
+    failure_rate : Float
+        Probability that a simulated run fails, i.e. the monitors have no data afterwards (default: 0).
+    recorded_functions : List of String
+        Names of additional script functions that are only recorded (default: None).
+
+    Notes
+    -----
+    Besides eval, putv, getv, getresult, sourcepower, setglobalmonitor and setglobalsource, only the script functions
+    in _RECORDED_FUNCTIONS (save, load, redrawoff, redrawon, set, updatemodes, updatesourcemode) and in
+    recorded_functions are accepted and recorded, any other name raises AttributeError like a missing function, so a
+    typo in a command does not pass silently.
+    """
+    def __init__(self, product = "FDTD", latency = 0, run_latency = 0, frequency_points = 11, monitor_shape = (10,10,1), monitor_shapes = None, mode_number = 1, seed = None, failure_rate = 0, recorded_functions = None):
+        self.product = product
+        self.latency = latency
+        self.run_latency = run_latency
+        self.frequency_points = frequency_points
+        self.monitor_shape = monitor_shape
+        self.monitor_shapes = monitor_shapes if type(monitor_shapes) != type(None) else {}
+        self.mode_number = mode_number
+        self.wavelength_start = 1.5e-6
+        self.wavelength_end = 1.6e-6
+        self.rng = np.random.default_rng(seed)
+        self.failure_rate = failure_rate
+        self.recorded_functions = _RECORDED_FUNCTIONS + (list(recorded_functions) if type(recorded_functions) != type(None) else [])
+        self.layout = 1
+        self.data_valid = False
+        self.variables = {}
+        self.calls = []
+        self.counts = {}
+
+    def reset(self):
+        """
+        Clear the recorded calls.
+        """
+        self.calls = []
+        self.counts = {}
+
+    def get_call_count(self, method = None):
+        """
+        Get the number of recorded calls.
+
+        Parameters
+        ----------
+        method : String
+            Name of the method (e.g. "eval", "putv", "getv"), None means all the calls (default: None).
+
+        Returns
+        -------
+        out : Int
+            Number of calls.
+        """
+        if (type(method) == type(None)):
+            return len(self.calls)
+        return self.counts.get(method, 0)
+
+    def __record(self, method, payload):
+        self.calls.append((method, payload))
+        self.counts[method] = self.counts.get(method, 0) + 1
+        if (self.latency > 0):
+            time.sleep(self.latency)
+
+    def eval(self, command):
+        """
+        Record a script and interpret the assignments in it.
+
+        Parameters
+        ----------
+        command : str
+            Command that can be evaluated in Lumerical.
+        """
+        self.__record("eval", command)
+        if (self.run_latency > 0 and re.search(r"(^|;)\s*run(jobs)?\s*;", command)):
+            time.sleep(self.run_latency)
+        position = 0
+        for block in re.finditer(r"if\s*\(([\w.]+)\)\s*\{([^{}]*)\}", command):
+            for statement in command[position:block.start()].split(";"):
+                self.__interpret(statement)
+            if self.__evaluate(block.group(1)):
+                for statement in block.group(2).split(";"):
+                    self.__interpret(statement)
+            position = block.end()
+        for statement in command[position:].split(";"):
+            self.__interpret(statement)
+
+    def putv(self, name, value):
+        """
+        Record and keep a variable.
+
+        Parameters
+        ----------
+        name : str
+            Name of the variable.
+        value : Array or Float or str
+            Value of the variable.
+        """
+        self.__record("putv", name)
+        self.variables[name] = value
+
+    def getv(self, name):
+        """
+        Record and return a variable.
+
+        Parameters
+        ----------
+        name : str
+            Name of the variable.
+
+        Returns
+        -------
+        out : Array or Dict or Float or str
+            Value of the variable.
+        """
+        self.__record("getv", name)
+        if name not in self.variables:
+            raise Exception("Variable \"" + name + "\" is not defined in the fake Lumerical session!")
+        return self.variables[name]
+
+    def getresult(self, monitor_name, dataset = None):
+        """
+        Record and return a synthetic result.
+
+        Parameters
+        ----------
+        monitor_name : str
+            Name of the monitor.
+        dataset : str
+            Name of the dataset ("T", "E", "index", "expansion for Output", ...).
+
+        Returns
+        -------
+        out : Dict
+            Synthetic dataset.
+        """
+        self.__record("getresult", (monitor_name, dataset))
+        return self.synthetic_result(monitor_name, dataset)
+
+    def sourcepower(self, frequency, *args):
+        """
+        Record and return a unit source power.
+
+        Parameters
+        ----------
+        frequency : Array
+            Frequency points.
+
+        Returns
+        -------
+        out : Array
+            Source power, size: (frequency points,1).
+        """
+        self.__record("sourcepower", args)
+        return np.ones((np.asarray(frequency).size, 1))
+
+    def setglobalmonitor(self, name, value):
+        """
+        Record a global monitor setting, "frequency points" changes the size of the synthetic results.
+        """
+        self.__record("setglobalmonitor", (name, value))
+        if (name == "frequency points"):
+            self.frequency_points = int(value)
+
+    def setglobalsource(self, name, value):
+        """
+        Record a global source setting, "wavelength start" and "wavelength stop" change the synthetic wavelength.
+        """
+        self.__record("setglobalsource", (name, value))
+        if (name == "wavelength start"):
+            self.wavelength_start = value
+        elif (name == "wavelength stop"):
+            self.wavelength_end = value
+
+    def synthetic_result(self, monitor_name, dataset):
+        """
+        Build a randomly filled result with the shape of the real one.
+
+        Parameters
+        ----------
+        monitor_name : str
+            Name of the monitor.
+        dataset : str
+            Name of the dataset.
+
+        Returns
+        -------
+        out : Dict
+            Synthetic dataset.
+        """
+        points = self.frequency_points
+        wavelength = np.linspace(self.wavelength_start, self.wavelength_end, points).reshape(points, 1)
+        result = {"lambda": wavelength, "f": scipy.constants.speed_of_light / wavelength}
+        shape = tuple(self.monitor_shapes.get(monitor_name, self.monitor_shape))
+        if (dataset == "E"):
+            result["E"] = self.rng.random(shape + (points, 3)) + 1j * self.rng.random(shape + (points, 3))
+            result["x"] = np.linspace(0, 1e-6, shape[0]).reshape(shape[0], 1)
+            result["y"] = np.linspace(0, 1e-6, shape[1]).reshape(shape[1], 1)
+            result["z"] = np.linspace(0, 1e-6, shape[2]).reshape(shape[2], 1)
+        elif (dataset == "index"):
+            for axis in ["x", "y", "z"]:
+                result["index_" + axis] = 1 + 2.5 * self.rng.random(shape + (1,))
+            result["x"] = np.linspace(0, 1e-6, shape[0]).reshape(shape[0], 1)
+            result["y"] = np.linspace(0, 1e-6, shape[1]).reshape(shape[1], 1)
+            result["z"] = np.linspace(0, 1e-6, shape[2]).reshape(shape[2], 1)
+        elif (type(dataset) == str and dataset.startswith("expansion")):
+            modes = (points, self.mode_number)
+            result["a"] = self.rng.random(modes) + 1j * self.rng.random(modes)
+            result["b"] = self.rng.random(modes) + 1j * self.rng.random(modes)
+            result["N"] = np.ones(modes)
+            result["T_forward"] = self.rng.random(modes)
+            result["T_backward"] = self.rng.random(modes)
+        else:
+            result[dataset if type(dataset) == str else "T"] = self.rng.random(points)
+        return result
+
+    def __interpret(self, statement):
+        command = statement.strip()
+        if (command == "run" or command == "runjobs"):
+            self.layout = 0
+            self.data_valid = self.rng.random() >= self.failure_rate
+            return
+        elif (command == "switchtolayout"):
+            self.layout = 1
+            self.data_valid = False
+            return
+        save = re.match(r"^\s*matlabsave\s*\((.*)\)\s*$", statement)
+        if save:
+            args = [arg.strip().strip("\"'") for arg in save.group(1).split(",")]
+            scipy.io.savemat(args[0], dict([(name, self.variables[name]) for name in args[1:] if name in self.variables]))
+            return
+        assignment = re.match(r"^\s*(\w+)(\.\w+)?\s*=\s*(.+?)\s*$", statement)
+        if not assignment:
+            return
+        name, key, expression = assignment.groups()
+        value = self.__evaluate(expression)
+        if (type(value) == type(None)):
+            return
+        if (type(key) == type(None)):
+            self.variables[name] = value
+        elif (type(self.variables.get(name)) == dict):
+            self.variables[name][key[1:]] = value
+
+    def __evaluate(self, expression):
+        if (expression == "struct"):
+            return {}
+        elif (expression == "layoutmode"):
+            return self.layout
+        elif re.match(r"^-?\d+(\.\d*)?$", expression):
+            return float(expression)
+        call = re.match(r"^(\w+)\s*\((.*)\)$", expression)
+        if call:
+            function, args = call.groups()
+            args = [arg.strip().strip("\"'") for arg in args.split(",")]
+            if (function == "getresult" and len(args) >= 2):
+                return self.synthetic_result(args[0], args[1])
+            elif (function == "sourcepower"):
+                points = np.asarray(self.variables[args[0]]).size if args[0] in self.variables else self.frequency_points
+                return np.ones((points, 1))
+            elif (function == "topoparamstoindex" and len(args) >= 2 and args[1] in self.variables):
+                return np.array(self.variables[args[1]], dtype=np.double)
+            elif (function == "topoparamstogradient" and len(args) >= 3 and args[2] in self.variables):
+                ## the filter and the projection are not modeled, dF_dEps is passed through as the gradient
+                return np.array(self.variables[args[2]], dtype=np.double)
+            elif (function == "havedata"):
+                return int(self.data_valid and not self.layout)
+            elif (function == "sum" and type(self.__evaluate(args[0])) != type(None)):
+                return np.sum(self.__evaluate(args[0]))
+            elif (type(self.variables.get(function)) == np.ndarray):
+                return self.variables[function][tuple([self.__index(arg) for arg in args])]
+            return None
+        field = re.match(r"^(\w+)\.(\w+)$", expression)
+        if field:
+            base, key = field.groups()
+            if (type(self.variables.get(base)) == dict and key in self.variables[base]):
+                return self.variables[base][key]
+        return None
+
+    @staticmethod
+    def __index(arg):
+        ## Lumerical indices start from 1 and keep the dimensions
+        if (arg == ":"):
+            return slice(None)
+        bounds = arg.split(":")
+        return slice(int(bounds[0]) - 1, int(bounds[-1]))
+
+    def __getattr__(self, name):
+        if (name.startswith("_") or "recorded_functions" not in self.__dict__ or name not in self.recorded_functions):
+            raise AttributeError("\"" + name + "\" is not a function of the fake Lumerical session!")
+
+        def call(*args, **kwargs):
+            self.__record(name, args)
+        return call
@@ -0,0 +1,238 @@
+import contextlib
+import re
+
+## functions that only read from Lumerical and keep the generation of the session
+_READ_FUNCTIONS = ["getv", "getresult", "getdata", "havedata", "haveresult", "getnamed", "getnumber", "getglobalmonitor",
+                   "getglobalsource", "sourcepower", "matlabsave"]
+
+
+class LumericalSession:
+    """
+    Session wrapper around a Lumerical transport (LumapiTransport, FakeLumapiTransport, ...).
+
+    Every call is forwarded to the wrapped transport. Inside a batch (see ``batch``) the
+    script strings passed to ``eval`` are buffered and sent to Lumerical as one single
+    eval when the batch is committed.
+
+    Parameters
+    ----------
+    session : LumapiTransport or FakeLumapiTransport
+        The transport that the commands are sent to.
+    profiler : LumericalProfiler
+        Profiler that records every call to the transport, None means no profiling (default: None).
+    recorder : LumericalTraceRecorder
+        Recorder that writes every call to the transport to a trace file, None means no recording (default: None).
+
+    Notes
+    -----
+    "generation" is increased by every call that may change the simulation (any eval that is not marked as read,
+    putv, save, run, ...), results derived from Lumerical can be cached as long as it does not change.
+    """
+    def __init__(self, session, profiler = None, recorder = None):
+        self.session = session
+        self.profiler = profiler
+        self.recorder = recorder
+        self.generation = 0
+        self.__batch_depth = 0
+        self.__buffer = []
+        self.__origins = []
+
+    def eval(self, command, read = False):
+        """
+        Execute (or buffer, in batch mode) a Lumerical script.
+
+        Parameters
+        ----------
+        command : str
+            Command that can be evaluated in Lumerical.
+        read : Bool
+            Whether the script only reads data into script variables (e.g. 'data = getresult("monitor","T");'), which
+            keeps the generation of the session (default: False).
+        """
+        if (not read):
+            self.generation += 1
+        if (self.__batch_depth > 0):
+            self.__buffer.append(command)
+            ## the origin is taken where the script is buffered, not where the batch is flushed
+            self.__origins.append(self.profiler.get_origin() if type(self.profiler) != type(None) else None)
+        else:
+            self.__eval(command)
+
+    def flush(self):
+        """
+        Send the buffered scripts to Lumerical as one single eval.
+        """
+        if (len(self.__buffer) > 0):
+            scripts = self.__buffer
+            origins = self.__origins
+            command = "\n".join([_terminate_script(script) for script in scripts])
+            self.__buffer = []
+            self.__origins = []
+            if (type(self.profiler) != type(None) and None not in origins):
+                if (type(self.recorder) != type(None)):
+                    self.recorder.record("eval", (command,))
+                self.profiler.profile_batch(self.session.eval, command, scripts, origins)
+            else:
+                self.__eval(command)
+
+    def __eval(self, command):
+        if (type(self.recorder) != type(None)):
+            self.recorder.record("eval", (command,))
+        if (type(self.profiler) == type(None)):
+            self.session.eval(command)
+        else:
+            self.profiler.profile_call("eval", self.session.eval, command)
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Context manager that buffers all the evals and flushes them as one single eval at commit.
+
+        Notes
+        -----
+        Any other call to the Lumerical API (putv, getv, getresult, save, ...) flushes the buffer first, so the
+        order of the commands is preserved. Batches can be nested, the buffer is flushed when the outermost batch
+        is committed. If an exception (or KeyboardInterrupt) leaves the outermost batch, the evals queued since the
+        last flush are dropped without being sent to Lumerical, and the exception is raised again.
+        """
+        self.__batch_depth += 1
+        committed = False
+        try:
+            yield self
+            committed = True
+        finally:
+            self.__batch_depth -= 1
+            if (self.__batch_depth == 0):
+                if committed:
+                    self.flush()
+                else:
+                    self.__buffer = []
+                    self.__origins = []
+
+    def is_batching(self):
+        """
+        Whether the session is buffering evals.
+
+        Returns
+        -------
+        out : Bool
+            True in batch mode.
+        """
+        return self.__batch_depth > 0
+
+    def __getattr__(self, name):
+        if (name.startswith("_") or "session" not in self.__dict__):
+            raise AttributeError(name)
+        self.flush()
+        attribute = getattr(self.session, name)
+        if (callable(attribute) and name not in _READ_FUNCTIONS):
+            self.generation += 1
+        if ((type(self.profiler) == type(None) and type(self.recorder) == type(None)) or not callable(attribute)):
+            return attribute
+
+        def instrumented_call(*args, **kwargs):
+            if (type(self.recorder) != type(None)):
+                self.recorder.record(name, args, kwargs)
+            if (type(self.profiler) == type(None)):
+                return attribute(*args, **kwargs)
+            return self.profiler.profile_call(name, attribute, *args, **kwargs)
+        return instrumented_call
+
+
+def _terminate_script(script):
+    ## a buffered script without the final ";" would be merged with the next one
+    script = script.rstrip()
+    if (len(script) > 0 and script[-1] not in ";}"):
+        script += ";"
+    return script
+
+
+def make_item_script(item_name, action):
+    """
+    Generate one Lumerical script that enables, disables or removes items.
+
+    Parameters
+    ----------
+    item_name : String or list
+        Name(s) of the item(s), "*" matches any characters (e.g. "pixels*"), a group name applies to the whole group.
+    action : String
+        "enable", "disable" or "remove".
+
+    Returns
+    -------
+    out : String
+        The script.
+
+    Notes
+    -----
+    The items are selected with "select" as in the single item functions, so names of items inside groups are resolved
+    the same way (e.g. "group::name"). The items matched by a pattern are set through their index in the selection.
+    """
+    if action not in ["enable", "disable", "remove"]:
+        raise Exception("Wrong item action!")
+    names = [item_name] if (type(item_name) == str) else list(item_name)
+    script = ""
+    for name in names:
+        if "*" in name:
+            if (action == "remove"):
+                script += _make_pattern_script(name, "select(splayout_name);delete;")
+            else:
+                script += _make_pattern_script(name, "set(\"enabled\"," + _enabled_value(action) + ",splayout_i);")
+        else:
+            script += _make_action_script("\"" + name + "\"", action)
+    return script
+
+
+def match_item_names(item_name, names):
+    """
+    Find the names matched by the item name(s) of "make_item_script".
+
+    Parameters
+    ----------
+    item_name : String or list
+        Name(s) of the item(s), "*" matches any characters (e.g. "pixels*").
+    names : List of String
+        Names to match.
+
+    Returns
+    -------
+    out : List of String
+        The matched names.
+    """
+    patterns = [item_name] if (type(item_name) == str) else list(item_name)
+    expressions = [re.compile("^" + ".*".join([re.escape(fragment) for fragment in pattern.split("*")]) + "$") for pattern in patterns]
+    return [name for name in names if any([expression.match(name) for expression in expressions])]
+
+
+def _make_action_script(name, action):
+    if (action == "remove"):
+        return "select(" + name + ");delete;"
+    return "select(" + name + ");set(\"enabled\"," + _enabled_value(action) + ");"
+
+
+def _enabled_value(action):
+    return "1" if action == "enable" else "0"
+
+
+def _make_pattern_script(pattern, action_script):
+    fragments = pattern.split("*")
+    longest = max(fragments, key=len)
+    script = ("selectpartial(\"" + longest + "\");" if len(longest) > 0 else "selectall;")
+    script += "splayout_n = getnumber;splayout_names = cell(splayout_n);"
+    script += "for (splayout_i = 1:splayout_n) { splayout_names{splayout_i} = get(\"name\",splayout_i); }"
+    conditions = []
+    if (len(fragments[0]) > 0):
+        conditions.append("substring(splayout_name,1,{0}) == \"{1}\"".format(len(fragments[0]), fragments[0]))
+    if (len(fragments[-1]) > 0):
+        conditions.append("substring(splayout_name,length(splayout_name)-{0},{1}) == \"{2}\"".format(
+            len(fragments[-1]) - 1, len(fragments[-1]), fragments[-1]))
+    for fragment in fragments[1:-1]:
+        if (len(fragment) > 0):
+            conditions.append("findstring(splayout_name,\"" + fragment + "\") > 0")
+    matched_script = action_script
+    if (len(conditions) > 0):
+        matched_script = "if (" + " & ".join(conditions) + ") { " + action_script + " }"
+    script += "for (splayout_i = 1:splayout_n) { splayout_name = splayout_names{splayout_i};"
+    script += "if (length(splayout_name) >= " + str(len("".join(fragments))) + ") { " + matched_script + " } }"
+    script += "unselectall;"
+    return script
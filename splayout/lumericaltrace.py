@@ -0,0 +1,163 @@
+import gzip
+import pickle
+import time
+import numpy as np
+
+
+class LumericalTraceRecorder:
+    """
+    Recorder that writes every call sent to Lumerical (the script strings of eval, the payloads of putv and the other
+    calls, e.g. getv, getresult and save) to a compact trace file. Start it with FDTDSimulation.start_trace or
+    MODESimulation.start_trace.
+
+    Parameters
+    ----------
+    filename : String
+        Path of the trace file (gzip compressed).
+
+    Notes
+    -----
+    Every distinct script string is written once, repeated scripts are written as references. Replay the trace
+    with LumericalTraceReplayer.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.__file = gzip.open(filename, "wb")
+        self.__scripts = {}
+        self.counts = {}
+
+    def record(self, method, args = (), kwargs = None):
+        """
+        Write a call to the trace.
+
+        Parameters
+        ----------
+        method : String
+            Name of the method, e.g. "eval", "putv" or "getv".
+        args : tuple
+            Inputs of the call.
+        kwargs : Dict
+            Keyword inputs of the call (default: None).
+        """
+        if (type(self.__file) == type(None)):
+            raise Exception("The trace file is closed!")
+        kwargs = kwargs if type(kwargs) != type(None) else {}
+        if (method == "eval" and len(args) == 1 and type(args[0]) == str):
+            if args[0] in self.__scripts:
+                entry = ("eval_ref", self.__scripts[args[0]])
+            else:
+                self.__scripts[args[0]] = len(self.__scripts)
+                entry = ("eval", args[0])
+        else:
+            entry = ("call", method, tuple(args), kwargs)
+        pickle.dump(entry, self.__file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.counts[method] = self.counts.get(method, 0) + 1
+
+    def close(self):
+        """
+        Close the trace file.
+        """
+        if (type(self.__file) != type(None)):
+            self.__file.close()
+            self.__file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class LumericalTraceReplayer:
+    """
+    Replayer for the trace files written by LumericalTraceRecorder.
+
+    Parameters
+    ----------
+    filename : String
+        Path of the trace file.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+
+    def read(self):
+        """
+        Read the calls in the trace.
+
+        Yields
+        ------
+        method : String
+            Name of the method.
+        args : tuple
+            Inputs of the call.
+        kwargs : Dict
+            Keyword inputs of the call.
+        """
+        scripts = []
+        with gzip.open(self.filename, "rb") as file:
+            while True:
+                try:
+                    entry = pickle.load(file)
+                except EOFError:
+                    break
+                if (entry[0] == "eval"):
+                    scripts.append(entry[1])
+                    yield "eval", (entry[1],), {}
+                elif (entry[0] == "eval_ref"):
+                    yield "eval", (scripts[entry[1]],), {}
+                else:
+                    yield entry[1], entry[2], entry[3]
+
+    def replay(self, target, ignore_errors = False):
+        """
+        Issue the calls in the trace again.
+
+        Parameters
+        ----------
+        target : LumapiTransport, FakeLumapiTransport or LumericalSession
+            The target of the calls, e.g. FakeLumapiTransport() or FDTDSimulation().fdtd.
+        ignore_errors : Bool
+            Whether to continue when a call raises (default: False).
+
+        Returns
+        -------
+        out : Dict
+            {"calls": number of calls, "errors": number of calls that raised, "time": time for replaying (unit: s),
+            "method_time": {method: time (unit: s)}}.
+        """
+        statistics = {"calls": 0, "errors": 0, "time": 0, "method_time": {}}
+        time_before_replay = time.perf_counter()
+        for method, args, kwargs in self.read():
+            time_before_call = time.perf_counter()
+            try:
+                getattr(target, method)(*args, **kwargs)
+            except Exception:
+                statistics["errors"] += 1
+                if not ignore_errors:
+                    raise
+            statistics["calls"] += 1
+            statistics["method_time"][method] = statistics["method_time"].get(method, 0) + time.perf_counter() - time_before_call
+        statistics["time"] = time.perf_counter() - time_before_replay
+        return statistics
+
+    def get_statistics(self):
+        """
+        Get the command volume of the trace, e.g. for comparing the traces of two splayout versions.
+
+        Returns
+        -------
+        out : Dict
+            {"calls": {method: number of calls}, "script_characters": total length of the eval scripts,
+            "unique_scripts": number of distinct eval scripts, "putv_bytes": total size of the putv payloads}.
+        """
+        statistics = {"calls": {}, "script_characters": 0, "unique_scripts": 0, "putv_bytes": 0}
+        scripts = set()
+        for method, args, kwargs in self.read():
+            statistics["calls"][method] = statistics["calls"].get(method, 0) + 1
+            if (method == "eval"):
+                statistics["script_characters"] += len(args[0])
+                scripts.add(args[0])
+            elif (method == "putv" and len(args) == 2):
+                statistics["putv_bytes"] += np.asarray(args[1]).nbytes
+        statistics["unique_scripts"] = len(scripts)
+        return statistics
@@ -1,5 +1,11 @@
 import sys, os
 from splayout.utils import *
+from splayout.lumericalsession import LumericalSession, make_item_script
+from splayout.lumapitransport import LumapiTransport
+from splayout.simulationresult import make_fetch_script, parse_fetched_results
+from splayout.fieldtransfer import FieldTransfer
+from splayout.profiler import LumericalProfiler
+from splayout.lumericaltrace import LumericalTraceRecorder
 import numpy as np
 import scipy.constants
 
@@ -15,26 +21,21 @@ class MODESimulation:
         Path to the Lumerical Python API folder.
     load_file : String
         Path to the .lms file that what want to be loaded (default: None).
+    transport : LumapiTransport or FakeLumapiTransport
+        The transport that the commands are sent to, None means a LumapiTransport to Lumerical MODE (default: None).
 
     """
-    def __init__(self,hide=0,fdtd_path = "C:\\Program Files\\Lumerical\\v202\\api\\python\\", load_file = None):
-        sys.path.append(fdtd_path)
-        sys.path.append(os.path.dirname(__file__))
-        try:
-            os.add_dll_directory(fdtd_path)
-        except:
-            pass
-        try:
-            import lumapi
-        except:
-            raise Exception(
-                "Lumerical MODE is not installed in the default path, please specify the python api path with fdtd_path=***.")
-        self.lumapi = lumapi
-        self.mode = self.lumapi.MODE(hide=hide)
+    def __init__(self,hide=0,fdtd_path = "C:\\Program Files\\Lumerical\\v202\\api\\python\\", load_file = None, transport = None):
+        if (type(transport) == type(None)):
+            transport = LumapiTransport("MODE", hide=hide, lumapi_path=fdtd_path)
+        self.transport = transport
+        self.lumapi = getattr(transport, "lumapi", None)
+        self.mode = LumericalSession(self.transport)
         if (type(load_file) != type(None)):
             self.mode.eval("load(\"" + load_file + "\");")
         self.global_source_set_flag = 0
         self.global_monitor_set_flag = 0
+        self.field_transfer = None
 
     def save(self,filename="temp"):
         """
@@ -384,6 +385,87 @@ class MODESimulation:
         '''
         self.mode.eval(command)
 
+    def enable_profiler(self, profiler = None):
+        """
+        Time and count every call to Lumerical MODE (eval, putv, getv, getresult, run, ...) by the splayout method it originates from.
+
+        Parameters
+        ----------
+        profiler : LumericalProfiler
+            The profiler, None means a new one (default: None).
+
+        Returns
+        -------
+        out : LumericalProfiler
+            The profiler, e.g. pass "profiler.wrap_callback()" as the callback function of an optimizer and export the
+            per-iteration reports with "profiler.export_json" or "profiler.export_csv".
+        """
+        if (type(profiler) == type(None)):
+            profiler = LumericalProfiler()
+        self.mode.profiler = profiler
+        return profiler
+
+    def disable_profiler(self):
+        """
+        Stop profiling the calls to Lumerical MODE.
+        """
+        self.mode.profiler = None
+
+    def get_profiler(self):
+        """
+        Get the profiler.
+
+        Returns
+        -------
+        out : LumericalProfiler or None
+            The profiler, None if profiling is not enabled.
+        """
+        return self.mode.profiler
+
+    def start_trace(self, filename):
+        """
+        Record every call to Lumerical MODE (the eval scripts, the putv payloads and the other calls) to a trace file.
+
+        Parameters
+        ----------
+        filename : String
+            Path of the trace file.
+
+        Returns
+        -------
+        out : LumericalTraceRecorder
+            The recorder, replay the trace with LumericalTraceReplayer(filename).replay(target).
+        """
+        self.stop_trace()
+        self.mode.recorder = LumericalTraceRecorder(filename)
+        return self.mode.recorder
+
+    def stop_trace(self):
+        """
+        Stop recording and close the trace file.
+        """
+        if (type(self.mode.recorder) != type(None)):
+            self.mode.flush()
+            self.mode.recorder.close()
+            self.mode.recorder = None
+
+    def batch(self):
+        '''
+        Buffer the scripts generated by the functions of this object and send them to Lumerical as one single eval.
+
+        Returns
+        -------
+        out : context manager
+            Use as "with sim.batch(): ...", the scripts are flushed when the block ends.
+
+        Notes
+        -----
+        Calls that need data from Lumerical (e.g. getting results) flush the buffered scripts first.
+        If an exception leaves the block, the scripts buffered since the last flush are dropped without being sent
+        to Lumerical, and the exception is raised again.
+        '''
+        return self.mode.batch()
+
     def add_structure_circle(self, center_point, radius, material=SiO2, z_start = -0.11, z_end = 0.11,rename = "circle"):
         '''
         Draw the a circle on the simulation CAD.
@@ -574,51 +656,48 @@ class MODESimulation:
 
     def set_disable(self,item_name):
         """
-        Set an item of the simulation to "disable" state.
+        Set items of the simulation to "disable" state.
 
         Parameters
         ----------
-        item_name : String
-            Name of the item.
+        item_name : String or list
+            Name(s) of the item(s), "*" matches any characters (e.g. "pixels*"), a group name applies to the whole group.
 
         Notes
         -----
-        This function should be called in "Layout" mode for the Lumerical MODE simulaiton.
+        This function should be called in "Layout" mode for the Lumerical MODE simulaiton. All the items are handled by one script.
         """
-        self.mode.eval("select(\""+item_name+"\");")
-        self.mode.eval("set(\"enabled\",0);")
+        self.mode.eval(make_item_script(item_name, "disable"))
 
     def set_enable(self,item_name):
         """
-        Set an item of the simulation to "enable" state.
+        Set items of the simulation to "enable" state.
 
         Parameters
         ----------
-        item_name : String
-            Name of the item.
+        item_name : String or list
+            Name(s) of the item(s), "*" matches any characters (e.g. "pixels*"), a group name applies to the whole group.
 
         Notes
         -----
-        This function should be called in "Layout" mode for the Lumerical MODE simulaiton.
+        This function should be called in "Layout" mode for the Lumerical MODE simulaiton. All the items are handled by one script.
         """
-        self.mode.eval("select(\"" + item_name + "\");")
-        self.mode.eval("set(\"enabled\",1);")
+        self.mode.eval(make_item_script(item_name, "enable"))
 
     def remove(self, item_name):
         """
-        Remove an item of the simulation.
+        Remove items of the simulation.
 
         Parameters
         ----------
-        item_name : String
-            Name of the item.
+        item_name : String or list
+            Name(s) of the item(s), "*" matches any characters (e.g. "pixels*"), a group name applies to the whole group.
 
         Notes
         -----
-        This function should be called in "Layout" mode for the Lumerical MODE simulaiton.
+        This function should be called in "Layout" mode for the Lumerical MODE simulaiton. All the items are handled by one script.
         """
-        self.mode.eval("select(\"" + item_name + "\");")
-        self.mode.eval("delete;")
+        self.mode.eval(make_item_script(item_name, "remove"))
 
     def get_transmission(self,monitor_name,datafile = None):
         """
@@ -636,8 +715,8 @@ class MODESimulation:
         out : Array
             Spectrum [wavelength,transmission], size: (2,frequency points).
         """
-        self.mode.eval("data = getresult(\"" + monitor_name + "\",\"T\");")
-        data = self.lumapi.getVar(self.mode.handle, varname="data")
+        self.mode.eval("data = getresult(\"" + monitor_name + "\",\"T\");", read=True)
+        data = self.mode.getv("data")
         wavelength = np.reshape(data["lambda"],(data["lambda"].shape[0]))
         transmission = data["T"]
         spectrum = np.zeros((2,data["T"].shape[0]))
@@ -663,15 +742,15 @@ class MODESimulation:
         out : Array
             Spectrum [[wavelength,transmission],...], size: (number of modes,2,frequency points).
         """
-        self.mode.eval("data = getresult(\"" + expansion_name + "\",\"expansion for Output\");")
+        self.mode.eval("data = getresult(\"" + expansion_name + "\",\"expansion for Output\");", read=True)
         self.mode.eval("wavelength = data.lambda;")
         if (direction == FORWARD):
             self.mode.eval("mode_transmission = data.T_forward;")
         elif (direction == BACKWARD):
             self.mode.eval("mode_transmission = data.T_backward;")
-        wavelength = self.lumapi.getVar(self.mode.handle, varname="wavelength")
+        wavelength = self.mode.getv("wavelength")
         wavelength = np.reshape(wavelength, (wavelength.shape[0]))
-        transmission = self.lumapi.getVar(self.mode.handle, varname="mode_transmission").T
+        transmission = self.mode.getv("mode_transmission").T
         spectrum = np.zeros((transmission.shape[0], 2, transmission.shape[1]))
         for i in range(0, transmission.shape[0]):
             spectrum[i, 0, :] = wavelength
@@ -680,6 +759,34 @@ class MODESimulation:
             np.save(datafile, spectrum)
         return spectrum
 
+    def fetch_results(self, spec, direction = FORWARD):
+        """
+        Get several quantities from several monitors and sources with one script and one data transfer.
+
+        Parameters
+        ----------
+        spec : Dict
+            {monitor or source name: quantity or list of quantities}, available quantities: "transmission" (power monitor),
+            "mode_transmission", "mode_coefficient", "mode_phase" (mode expansion monitor) and "source_power" (source).
+        direction : Int
+            The light propagation direction for the mode expansion quantities 1: the positive direction of x-axis, 0: the negative direction of x-axis(FORWARD:1, BACKWARD:0 , default: FORWARD).
+
+        Returns
+        -------
+        out : SimulationResult
+            The results, e.g. result["expansion", "mode_transmission"] has the same format as get_mode_transmission("expansion").
+
+        Notes
+        -----
+        "mode_coefficient" and "mode_phase" of the same monitor share one transfer.
+        """
+        if not (self.global_source_set_flag and self.global_monitor_set_flag):
+            raise Exception("The source is not well defined!")
+        script, requests = make_fetch_script(spec, direction, self.wavelength_start, self.wavelength_end, self.frequency_points)
+        self.mode.eval(script, read=True)
+        result = parse_fetched_results(self.mode.getv("splayout_results"), requests, self.get_wavelength())
+        return result
+
     def get_mode_phase(self, expansion_name, direction = FORWARD, datafile = None):
         """
         Get data and calculate phase vs wavelength from mode expansion monitor after running the simulation.
@@ -765,9 +872,9 @@ class MODESimulation:
         if self.global_source_set_flag  and self.global_monitor_set_flag:
             wavelength = np.linspace(self.wavelength_start, self.wavelength_end, self.frequency_points,endpoint=True)
             frequency = scipy.constants.speed_of_light / wavelength
-            self.lumapi.putMatrix(self.mode.handle, "frequency", frequency)
-            self.mode.eval("data = sourcepower(frequency,2,\""+source_name+"\");")
-            source_power = self.lumapi.getVar(self.mode.handle, varname="data")
+            self.mode.putv("frequency", frequency)
+            self.mode.eval("data = sourcepower(frequency,2,\""+source_name+"\");", read=True)
+            source_power = self.mode.getv("data")
         else:
             raise Exception("The source is not well defined!")
         if (datafile != None):
@@ -834,6 +941,37 @@ class MODESimulation:
         return omega
 
 
+    def set_field_transfer(self, mode = "getv", transfer_dir = None):
+        """
+        Set how the field and index distributions are transferred from Lumerical MODE.
+
+        Parameters
+        ----------
+        mode : String
+            "getv": through the Python API, "file": through ".mat" files that are opened memory-mapped (default: "getv").
+        transfer_dir : String
+            Scratch directory for the ".mat" files in "file" mode, it should be accessible for Lumerical MODE, None means a new temporary directory (default: None).
+
+        Notes
+        -----
+        The "file" mode avoids copying multi-GB field arrays (e.g. TopologyOptRegion3D with fine mesh and many frequency points)
+        through the Python API, it affects get_E_distribution and get_epsilon_distribution. The fields are then returned
+        as MappedComplexArray objects over the memory-mapped real and imaginary parts (see FieldTransfer).
+        """
+        if (mode == "getv"):
+            self.field_transfer = None
+        elif (mode == "file"):
+            self.field_transfer = FieldTransfer(transfer_dir)
+        else:
+            raise Exception("Wrong field transfer mode!")
+
+    def __get_data(self, data_name, result_script, fields):
+        self.mode.eval(data_name + " = " + result_script + ";", read=True)
+        if (type(self.field_transfer) == type(None)):
+            data = self.mode.getv(data_name)
+            return dict([(field, data[field]) for field in fields])
+        return self.field_transfer.transfer(self.mode, data_name, fields)
+
     def get_epsilon_distribution(self,index_monitor_name="index", data_name = "index_data",  datafile = None):
         """
         Get epsilon distribution from index monitor.
@@ -852,13 +990,12 @@ class MODESimulation:
         out : Array
             Spectrum, size: (x mesh, y mesh, z mesh, 1).
         """
-        self.mode.eval("{0} = getresult(\"".format(data_name) + index_monitor_name + "\",\"index\");")
-        index = self.lumapi.getVar(self.mode.handle, "{0}".format(data_name))
-        fields_eps = np.stack((np.power(index['index_x'], 2),
-                               np.power(index['index_y'], 2),
-                               np.power(index['index_z'], 2)),
-                              axis=-1)
-        fields_eps = np.squeeze(fields_eps,axis = -2)
+        index = self.__get_data(data_name, "getresult(\"" + index_monitor_name + "\",\"index\")", ["index_x", "index_y", "index_z"])
+        shape = index['index_x'].shape
+        shape = (shape + (1,) * (4 - len(shape)))[:-1]
+        fields_eps = np.empty(shape + (3,), dtype=np.result_type(index['index_x']))
+        for i, axis in enumerate(["index_x", "index_y", "index_z"]):
+            np.square(index[axis].reshape(shape), out=fields_eps[..., i])
         if (datafile != None):
             np.save(datafile, fields_eps)
         return fields_eps
@@ -886,8 +1023,8 @@ class MODESimulation:
             if if_get_spatial == 1: field, x mesh, y mesh, z mesh
                 size: (x mesh, y mesh, z mesh, frequency points, 3), (x mesh,), (y mesh,), (z mesh,)
         """
-        self.mode.eval("{0} = getresult(\"".format(data_name) + field_monitor_name + "\",\"E\");")
-        field = self.lumapi.getVar(self.mode.handle, "{0}".format(data_name))
+        field = self.__get_data(data_name, "getresult(\"" + field_monitor_name + "\",\"E\")", ["E", "x", "y", "z"] if if_get_spatial else ["E"])
+        field['E'] = field['E'].reshape(field['E'].shape + (1,) * (5 - field['E'].ndim))
         if (datafile != None):
             np.save(datafile, field['E'])
         if if_get_spatial:
@@ -1,9 +1,153 @@
 from splayout.utils import *
 from splayout.filledpattern import Circle,Rectangle
+from splayout.symmetry import get_symmetry_index
 import numpy as np
+import gdspy
 import os
 import time
 
+
+def _material_script(material):
+    '''
+    Generate the Lumerical script that sets the material of the selected structure.
+
+    Parameters
+    ----------
+    material : str or float
+        Material name in Lumerical, or the index of <Object defined dielectric> when it is a float.
+
+    Returns
+    -------
+    out : String
+        The script.
+    '''
+    if type(material) == str:
+        return 'set("material", "' + material + '");'
+    elif type(material) == float:
+        return 'set("material", "<Object defined dielectric>");set("index", ' + str(material) + ');'
+    else:
+        raise Exception("Wrong material specification!")
+
+
+def _pixel_radius(values, pixel_radius):
+    ## radius and enabled flag of circle pixels, pixels smaller than 1 nm are disabled
+    radius = pixel_radius * np.array(values, dtype=np.double)
+    enabled = radius > 0.001
+    radius[~enabled] = 0
+    radius[np.isclose(radius, pixel_radius) | (radius > pixel_radius)] = pixel_radius
+    return radius, enabled
+
+
+def _pixel_lengths(values, pixel_x_length, pixel_y_length):
+    ## x/y lengths and enabled flag of rectangle pixels, pixels smaller than 1 nm are disabled
+    values = np.array(values, dtype=np.double)
+    x_length = pixel_x_length * values
+    y_length = pixel_y_length * values
+    enabled = (x_length >= 0.001) & (y_length >= 0.001)
+    x_length[x_length < 0.001] = 0
+    y_length[y_length < 0.001] = 0
+    x_length[np.isclose(x_length, pixel_x_length) | (x_length > pixel_x_length)] = pixel_x_length
+    y_length[np.isclose(y_length, pixel_y_length) | (y_length > pixel_y_length)] = pixel_y_length
+    return x_length, y_length, enabled
+
+
+
+def _get_mask_positions(matrix_mask, symmetry = None):
+    ## positions of the free pixels and their indices in the input vector (row by row, symmetric copies share an index)
+    if (type(matrix_mask) == type(None)):
+        if (type(symmetry) != type(None)):
+            raise Exception("matrix_mask should be specified for the symmetry!")
+        return None
+    index = get_symmetry_index(matrix_mask.shape, symmetry, matrix_mask == 1, order="F")
+    enable_positions = np.where(np.transpose(matrix_mask) == 1)
+    return enable_positions[1], enable_positions[0], index[enable_positions[1], enable_positions[0]], int(index.max()) + 1
+
+
+def _apply_matrix_mask(matrix, matrix_mask, mask_positions):
+    ## scatter the input vector (or population x DOF array) into the pixel matrix (or matrices)
+    matrix = np.asarray(matrix, dtype=np.double)
+    if (type(matrix_mask) != type(None)):
+        if (len(matrix.shape) > 2 or matrix.shape[-1] != mask_positions[3]):
+            raise Exception("The input matrix can not match the matrix_mask!")
+        masked_matrix = np.empty(matrix.shape[:-1] + matrix_mask.shape)
+        masked_matrix[...] = matrix_mask
+        masked_matrix[..., mask_positions[0], mask_positions[1]] = matrix[..., mask_positions[2]]
+    elif (len(matrix.shape) != 2 and len(matrix.shape) != 3):
+        raise Exception("The input matrix should be two-dimensional when matrix_mask not specified!")
+    else:
+        masked_matrix = matrix
+    return masked_matrix
+
+
+def _merge_pixel_runs(labels):
+    ## maximal rectangles of equal labels (-1 means empty): run-length encoding of every row, then identical runs of
+    ## consecutive rows are merged, returns [(label, col_start, col_stop, row_start, row_stop)]
+    rectangles = []
+    active = {}
+    for row in range(0, labels.shape[1]):
+        line = labels[:, row]
+        edges = np.flatnonzero(np.diff(line)) + 1
+        runs = {}
+        for start, stop in zip(np.concatenate(([0], edges)), np.concatenate((edges, [len(line)]))):
+            if (line[start] >= 0):
+                runs[(int(line[start]), int(start), int(stop))] = row
+        for run, row_start in active.items():
+            if run in runs:
+                runs[run] = row_start
+            else:
+                rectangles.append(run + (row_start, row))
+        active = runs
+    for run, row_start in active.items():
+        rectangles.append(run + (row_start, labels.shape[1]))
+    return rectangles
+
+
+def _draw_merged_rectangles(masked_matrix, left_down_point, right_up_point, pixel_x_length, pixel_y_length, cell, layer):
+    ## rectangle pixels as one polygon set, the full pixels that touch each other are merged
+    block_x_length = np.abs(left_down_point.x - right_up_point.x) / masked_matrix.shape[0]
+    block_y_length = np.abs(left_down_point.y - right_up_point.y) / masked_matrix.shape[1]
+    x_length, y_length, enabled = _pixel_lengths(masked_matrix, pixel_x_length, pixel_y_length)
+    full = enabled & np.isclose(x_length, block_x_length) & np.isclose(y_length, block_y_length)
+    polygons = []
+    for label, col_start, col_stop, row_start, row_stop in _merge_pixel_runs(np.where(full, 0, -1)):
+        polygons.append(_rectangle_points(left_down_point.x + col_start * block_x_length, right_up_point.y - row_stop * block_y_length,
+                                          left_down_point.x + col_stop * block_x_length, right_up_point.y - row_start * block_y_length))
+    for col, row in np.transpose(np.where(enabled & ~full)):
+        x = left_down_point.x + (col + 0.5) * block_x_length
+        y = right_up_point.y - (row + 0.5) * block_y_length
+        polygons.append(_rectangle_points(x - x_length[col, row]/2, y - y_length[col, row]/2, x + x_length[col, row]/2, y + y_length[col, row]/2))
+    if (len(polygons) > 0):
+        cell.cell.add(gdspy.PolygonSet(polygons, layer=layer.layer, datatype=layer.datatype))
+
+
+def _rectangle_points(x_min, y_min, x_max, y_max):
+    return np.array([(x_min, y_min), (x_max, y_min), (x_max, y_max), (x_min, y_max)])
+
+
+def _draw_instanced_circles(masked_matrix, left_down_point, right_up_point, pixel_radius, cell, layer, cell_prefix):
+    ## circle pixels as references (arrays) of one cached cell for every radius
+    block_x_length = np.abs(left_down_point.x - right_up_point.x) / masked_matrix.shape[0]
+    block_y_length = np.abs(left_down_point.y - right_up_point.y) / masked_matrix.shape[1]
+    radius, enabled = _pixel_radius(masked_matrix, pixel_radius)
+    radius = np.round(radius, 4)
+    radius_values, labels = np.unique(radius, return_inverse=True)
+    labels = np.where(enabled, labels.reshape(radius.shape), -1)
+    for label, col_start, col_stop, row_start, row_stop in _merge_pixel_runs(labels):
+        pixel_cell = _get_circle_cell(radius_values[label], layer, cell_prefix, cell.lib)
+        origin = (left_down_point.x + (col_start + 0.5) * block_x_length, right_up_point.y - (row_stop - 0.5) * block_y_length)
+        if (col_stop - col_start == 1 and row_stop - row_start == 1):
+            cell.cell.add(gdspy.CellReference(pixel_cell, origin))
+        else:
+            cell.cell.add(gdspy.CellArray(pixel_cell, col_stop - col_start, row_stop - row_start, (block_x_length, block_y_length), origin))
+
+
+def _get_circle_cell(radius, layer, cell_prefix, lib):
+    ## cell with one circle at the origin in the library of the target cell, reused by the later exports
+    name = "{}_circle_{:.4f}_{}_{}".format(cell_prefix, radius, layer.layer, layer.datatype)
+    if name not in lib.cells:
+        Circle(center_point=Point(0, 0), radius=radius).draw(Cell(name, lib=lib), layer)
+    return lib.cells[name]
+
 class CirclePixelsRegion:
     """
     Rectangle pixels region for FDTD simulation. It will create a region with etched blocks that can be updated by a two-dimensional matrix.
@@ -30,8 +174,12 @@ class CirclePixelsRegion:
         Mask array for the matrix in update function (default: None).
     relaxing_time : Float
         Relaxing time for eval in Lumerical FDTD (unit: s, default: 0).
+    symmetry : String
+        Symmetry of the pixels about the center of the region, X_MIRROR (x -> -x), Y_MIRROR (y -> -y), XY_MIRROR or C2
+        (180 degree rotation). The input vector of update then only contains one pixel of every symmetric pair, and
+        matrix_mask (np.ones((columns, rows)) for a region without fixed pixels) should be specified (default: None).
     """
-    def __init__(self, bottom_left_corner_point, top_right_corner_point, pixel_radius, fdtd_engine, material=SiO2, z_start=-0.11, z_end=0.11 , group_name = "pixels", matrix_mask = None, relaxing_time = 0):
+    def __init__(self, bottom_left_corner_point, top_right_corner_point, pixel_radius, fdtd_engine, material=SiO2, z_start=-0.11, z_end=0.11 , group_name = "pixels", matrix_mask = None, relaxing_time = 0, symmetry = None):
         self.left_down_point = tuple_to_point(bottom_left_corner_point)
         self.right_up_point = tuple_to_point(top_right_corner_point)
         self.pixel_radius = pixel_radius
@@ -47,6 +195,8 @@ class CirclePixelsRegion:
             self.matrix_mask = np.array(matrix_mask, dtype=np.int32)
         else:
             self.matrix_mask = matrix_mask
+        self.symmetry = symmetry
+        self.__mask_positions = _get_mask_positions(self.matrix_mask, symmetry)
 
 
     def __initialize(self):
@@ -54,25 +204,42 @@ class CirclePixelsRegion:
         self.block_y_length = np.abs(self.left_down_point.y - self.right_up_point.y) / self.__lastest_array.shape[1]
         self.x_start_point = self.left_down_point.x + self.block_x_length/2
         self.y_start_point = self.right_up_point.y - self.block_y_length/2
-        for row in range(0, self.__lastest_array.shape[1]):
-            for col in range(0, self.__lastest_array.shape[0]):
-                center_point = Point(self.x_start_point+col*self.block_x_length,self.y_start_point-row*self.block_y_length)
-                radius = self.pixel_radius * self.__lastest_array[col,row]
-                disable_flag = 0
-                if ( radius <= 0.001):
-                    radius = 0
-                    disable_flag = 1
-                if (np.isclose(radius, self.pixel_radius) or radius > self.pixel_radius):
-                    radius = self.pixel_radius
-                self.fdtd_engine.add_structure_circle(center_point, radius, material=self.material,
-                                                      z_start=self.z_start, z_end=self.z_end,
-                                                      rename=self.group_name + str(col) + "_" + str(row))
-                if (disable_flag):
-                    self.fdtd_engine.set_disable(self.group_name + str(col) + "_" + str(row))
-
-
-
-
+        cols, rows = np.meshgrid(np.arange(self.__lastest_array.shape[0]), np.arange(self.__lastest_array.shape[1]), indexing="ij")
+        cols = cols.flatten(order="F")
+        rows = rows.flatten(order="F")
+        radius, enabled = _pixel_radius(self.__lastest_array[cols, rows], self.pixel_radius)
+        self.fdtd_engine.fdtd.putv("splayout_pixels", np.column_stack((cols.astype(np.double),
+                                                                       rows.astype(np.double),
+                                                                       (self.x_start_point + cols * self.block_x_length) * 1e-6,
+                                                                       (self.y_start_point - rows * self.block_y_length) * 1e-6,
+                                                                       radius * 1e-6,
+                                                                       enabled.astype(np.double))))
+        self.fdtd_engine.fdtd.eval('splayout_size = size(splayout_pixels);' +
+                                   'for (splayout_i = 1:splayout_size(1)) {' +
+                                   'addcircle;' +
+                                   'set("x", splayout_pixels(splayout_i, 3));' +
+                                   'set("y", splayout_pixels(splayout_i, 4));' +
+                                   'set("radius", splayout_pixels(splayout_i, 5));' +
+                                   'set("z min", %.6fe-6);' % (self.z_start) +
+                                   'set("z max", %.6fe-6);' % (self.z_end) +
+                                   'set("name", "{}" + num2str(splayout_pixels(splayout_i, 1)) + "_" + num2str(splayout_pixels(splayout_i, 2)));'.format(self.group_name) +
+                                   _material_script(self.material) +
+                                   'set("enabled", splayout_pixels(splayout_i, 6));' +
+                                   '}' +
+                                   'clear(splayout_pixels, splayout_size, splayout_i);')
+
+    def get_dof(self):
+        """
+        Return the length of the input vector of update when matrix_mask is specified.
+
+        Returns
+        -------
+        out : Int
+            Number of the free pixels (one pixel of every symmetric pair).
+        """
+        if (type(self.matrix_mask) == type(None)):
+            raise Exception("matrix_mask is not specified!")
+        return self.__mask_positions[3]
 
     def update(self, matrix):
         '''
@@ -83,19 +250,11 @@ class CirclePixelsRegion:
         matrix : numpy.array
             Array (values:0~1) that represent the pixels in the region.
         '''
-        if (type(self.matrix_mask) != type(None)):
-            enable_positions = np.where(np.transpose(self.matrix_mask) == 1)
-            if (len(np.transpose(enable_positions)) != len(matrix)):
-                raise Exception("The input matrix can not match the matrix_mask!")
-            masked_matrix = self.matrix_mask.copy().astype(np.double)
-            for i,position in enumerate(np.transpose(enable_positions)):
-                masked_matrix[position[1], position[0]] = matrix[i]
-        elif (len(matrix.shape) != 2):
-            raise Exception("The input matrix should be two-dimensional when matrix_mask not specified!")
-        else:
-            masked_matrix = matrix
+        masked_matrix = _apply_matrix_mask(matrix, self.matrix_mask, self.__mask_positions)
 
         self.fdtd_engine.switch_to_layout()
+        if (len(masked_matrix.shape) != 2):
+            raise Exception("The input matrix should be two-dimensional!")
         if (type(self.__lastest_array) == type(None)):
             self.__lastest_array = np.array(masked_matrix,dtype=np.double)
             self.__last_array = np.array(masked_matrix,dtype=np.double)
@@ -105,29 +264,25 @@ class CirclePixelsRegion:
             self.__diff = self.__lastest_array - self.__last_array
             self.__last_array = np.array(masked_matrix,dtype=np.double)
             reconfig_positions = np.where(~np.isclose(np.abs(self.__diff), 0))
-            command = ""
-            for position in np.transpose(reconfig_positions):
-                radius = self.pixel_radius * self.__lastest_array[position[0], position[1]]
-                disable_flag = 0
-                if ( radius <= 0.001):
-                    radius = 0
-                    disable_flag = 1
-                if ( radius > self.pixel_radius):
-                    radius = self.pixel_radius
-
-                command += 'select("{}");'.format(self.group_name + str(position[0]) + "_" + str(position[1]))
-                command += 'set("radius", %.6fe-6);' % (radius)
-                if (disable_flag):
-                    command += 'set("enabled", 0);'
-                else:
-                    command += 'set("enabled", 1);'
+            radius, enabled = _pixel_radius(self.__lastest_array[reconfig_positions], self.pixel_radius)
 
             self.fdtd_engine.fdtd.eval("clear;")
             time.sleep(self.relaxing_time)
-            self.fdtd_engine.fdtd.eval(command)
-
-
-    def draw_layout(self, matrix, cell, layer):
+            if (len(radius) > 0):
+                self.fdtd_engine.fdtd.putv("splayout_pixels", np.column_stack((reconfig_positions[0].astype(np.double),
+                                                                               reconfig_positions[1].astype(np.double),
+                                                                               radius * 1e-6,
+                                                                               enabled.astype(np.double))))
+                self.fdtd_engine.fdtd.eval('splayout_size = size(splayout_pixels);' +
+                                           'for (splayout_i = 1:splayout_size(1)) {' +
+                                           'select("{}" + num2str(splayout_pixels(splayout_i, 1)) + "_" + num2str(splayout_pixels(splayout_i, 2)));'.format(self.group_name) +
+                                           'set("radius", splayout_pixels(splayout_i, 3));' +
+                                           'set("enabled", splayout_pixels(splayout_i, 4));' +
+                                           '}' +
+                                           'clear(splayout_pixels, splayout_size, splayout_i);')
+
+
+    def draw_layout(self, matrix, cell, layer, merge = False):
         '''
         Draw pixels on layout.
 
@@ -135,23 +290,32 @@ class CirclePixelsRegion:
         ----------
         matrix : numpy.array
             Array (values:0~1) that represent the pixels in the region.
-        cell : Cell
-            Cell to draw the component.
+        cell : Cell or List of Cell
+            Cell to draw the component, one cell for every matrix when a batch of matrices is given.
         layer : Layer
             Layer to draw.
+        merge : Bool
+            Whether to export a compact layout (default: False). Adjacent full rectangle pixels are merged into maximal
+            rectangles in one polygon set, and circle pixels of the same radius are placed as references of one cell.
+
+        Notes
+        -----
+        A batch of candidates can be drawn at once with a three-dimensional matrix (candidates, x, y), or a
+        two-dimensional matrix (candidates, DOF) when matrix_mask is specified.
         '''
-        if (type(self.matrix_mask) != type(None)):
-            enable_positions = np.where(np.transpose(self.matrix_mask) == 1)
-            if (len(np.transpose(enable_positions)) != len(matrix)):
-                raise Exception("The input matrix can not match the matrix_mask!")
-            masked_matrix = self.matrix_mask.copy().astype(np.double)
-            for i,position in enumerate(np.transpose(enable_positions)):
-                masked_matrix[position[1], position[0]] = matrix[i]
-        elif (len(matrix.shape) != 2):
-            raise Exception("The input matrix should be two-dimensional when matrix_mask not specified!")
+        masked_matrix = _apply_matrix_mask(matrix, self.matrix_mask, self.__mask_positions)
+        if (len(masked_matrix.shape) == 3):
+            if ((type(cell) != list and type(cell) != tuple) or len(cell) != masked_matrix.shape[0]):
+                raise Exception("One cell should be given for every matrix in the batch!")
+            for i in range(0, masked_matrix.shape[0]):
+                self.__draw_matrix(masked_matrix[i], cell[i], layer, merge)
         else:
-            masked_matrix = matrix
+            self.__draw_matrix(masked_matrix, cell, layer, merge)
 
+    def __draw_matrix(self, masked_matrix, cell, layer, merge):
+        if (merge):
+            _draw_instanced_circles(masked_matrix, self.left_down_point, self.right_up_point, self.pixel_radius, cell, layer, self.group_name)
+            return
         self.block_x_length = np.abs(self.left_down_point.x - self.right_up_point.x) / masked_matrix.shape[0]
         self.block_y_length = np.abs(self.left_down_point.y - self.right_up_point.y) / masked_matrix.shape[1]
         self.x_start_point = self.left_down_point.x + self.block_x_length / 2
@@ -201,8 +365,12 @@ class RectanglePixelsRegion:
         Mask array for the matrix in update function (default: None).
     relaxing_time : Float
         Relaxing time for eval in Lumerical FDTD (unit: s, default: 0).
+    symmetry : String
+        Symmetry of the pixels about the center of the region, X_MIRROR (x -> -x), Y_MIRROR (y -> -y), XY_MIRROR or C2
+        (180 degree rotation). The input vector of update then only contains one pixel of every symmetric pair, and
+        matrix_mask (np.ones((columns, rows)) for a region without fixed pixels) should be specified (default: None).
     """
-    def __init__(self, bottom_left_corner_point, top_right_corner_point, pixel_x_length, pixel_y_length, fdtd_engine, material=SiO2, z_start=-0.11, z_end=0.11, group_name = "p", matrix_mask = None, relaxing_time = 0):
+    def __init__(self, bottom_left_corner_point, top_right_corner_point, pixel_x_length, pixel_y_length, fdtd_engine, material=SiO2, z_start=-0.11, z_end=0.11, group_name = "p", matrix_mask = None, relaxing_time = 0, symmetry = None):
         self.left_down_point = tuple_to_point(bottom_left_corner_point)
         self.right_up_point = tuple_to_point(top_right_corner_point)
         self.pixel_x_length = pixel_x_length
@@ -219,33 +387,52 @@ class RectanglePixelsRegion:
             self.matrix_mask = np.array(matrix_mask, dtype=np.int32)
         else:
             self.matrix_mask = matrix_mask
+        self.symmetry = symmetry
+        self.__mask_positions = _get_mask_positions(self.matrix_mask, symmetry)
 
     def __initialize(self):
         self.block_x_length = np.abs(self.left_down_point.x - self.right_up_point.x) / self.__lastest_array.shape[0]
         self.block_y_length = np.abs(self.left_down_point.y - self.right_up_point.y) / self.__lastest_array.shape[1]
         self.x_start_point = self.left_down_point.x + self.block_x_length/2
         self.y_start_point = self.right_up_point.y - self.block_y_length/2
-
-        for row in range(0, self.__lastest_array.shape[1]):
-            for col in range(0, self.__lastest_array.shape[0]):
-                center_point = Point(self.x_start_point+col*self.block_x_length,self.y_start_point-row*self.block_y_length)
-                x_length = self.pixel_x_length * self.__lastest_array[col,row]
-                y_length = self.pixel_y_length * self.__lastest_array[col,row]
-                disable_flag = 0
-                if ( x_length < 0.001):
-                    x_length = 0
-                    disable_flag = 1
-                if ( y_length < 0.001):
-                    y_length = 0
-                    disable_flag = 1
-                if (np.isclose(x_length, self.pixel_x_length) or x_length > self.pixel_x_length):
-                    x_length = self.pixel_x_length
-                if (np.isclose(y_length, self.pixel_y_length) or y_length > self.pixel_y_length):
-                    y_length = self.pixel_y_length
-
-                self.fdtd_engine.add_structure_rectangle(center_point,x_length,y_length,material=self.material, z_start = self.z_start, z_end = self.z_end ,rename =self.group_name +  str(col)+"_"+str(row))
-                if (disable_flag):
-                    self.fdtd_engine.set_disable(self.group_name + str(col) + "_" + str(row))
+        cols, rows = np.meshgrid(np.arange(self.__lastest_array.shape[0]), np.arange(self.__lastest_array.shape[1]), indexing="ij")
+        cols = cols.flatten(order="F")
+        rows = rows.flatten(order="F")
+        x_length, y_length, enabled = _pixel_lengths(self.__lastest_array[cols, rows], self.pixel_x_length, self.pixel_y_length)
+        self.fdtd_engine.fdtd.putv("splayout_pixels", np.column_stack((cols.astype(np.double),
+                                                                       rows.astype(np.double),
+                                                                       (self.x_start_point + cols * self.block_x_length) * 1e-6,
+                                                                       (self.y_start_point - rows * self.block_y_length) * 1e-6,
+                                                                       x_length * 1e-6,
+                                                                       y_length * 1e-6,
+                                                                       enabled.astype(np.double))))
+        self.fdtd_engine.fdtd.eval('splayout_size = size(splayout_pixels);' +
+                                   'for (splayout_i = 1:splayout_size(1)) {' +
+                                   'addrect;' +
+                                   'set("x", splayout_pixels(splayout_i, 3));' +
+                                   'set("x span", splayout_pixels(splayout_i, 5));' +
+                                   'set("y", splayout_pixels(splayout_i, 4));' +
+                                   'set("y span", splayout_pixels(splayout_i, 6));' +
+                                   'set("z min", %.6fe-6);' % (self.z_start) +
+                                   'set("z max", %.6fe-6);' % (self.z_end) +
+                                   'set("name", "{}" + num2str(splayout_pixels(splayout_i, 1)) + "_" + num2str(splayout_pixels(splayout_i, 2)));'.format(self.group_name) +
+                                   _material_script(self.material) +
+                                   'set("enabled", splayout_pixels(splayout_i, 7));' +
+                                   '}' +
+                                   'clear(splayout_pixels, splayout_size, splayout_i);')
+
+    def get_dof(self):
+        """
+        Return the length of the input vector of update when matrix_mask is specified.
+
+        Returns
+        -------
+        out : Int
+            Number of the free pixels (one pixel of every symmetric pair).
+        """
+        if (type(self.matrix_mask) == type(None)):
+            raise Exception("matrix_mask is not specified!")
+        return self.__mask_positions[3]
 
     def update(self, matrix):
         '''
@@ -256,17 +443,7 @@ class RectanglePixelsRegion:
         matrix : numpy.array
             Array (values:0~1) that represent the pixels in the region.
         '''
-        if (type(self.matrix_mask) != type(None)):
-            enable_positions = np.where(np.transpose(self.matrix_mask) == 1)
-            if (len(np.transpose(enable_positions)) != len(matrix)):
-                raise Exception("The input matrix can not match the matrix_mask!")
-            masked_matrix = self.matrix_mask.copy().astype(np.double)
-            for i,position in enumerate(np.transpose(enable_positions)):
-                masked_matrix[position[1], position[0]] = matrix[i]
-        elif (len(matrix.shape) != 2):
-            raise Exception("The input matrix should be two-dimensional when matrix_mask not specified!")
-        else:
-            masked_matrix = matrix
+        masked_matrix = _apply_matrix_mask(matrix, self.matrix_mask, self.__mask_positions)
 
         self.fdtd_engine.switch_to_layout()
         if (len(masked_matrix.shape) != 2):
@@ -280,35 +457,26 @@ class RectanglePixelsRegion:
             self.__diff = self.__lastest_array - self.__last_array
             self.__last_array = np.array(masked_matrix,dtype=np.double)
             reconfig_positions = np.where(~np.isclose(np.abs(self.__diff), 0))
-            command = ""
-            for position in np.transpose(reconfig_positions):
-                x_length = self.pixel_x_length * self.__lastest_array[position[0], position[1]]
-                y_length = self.pixel_y_length * self.__lastest_array[position[0], position[1]]
-                disable_flag = 0
-                if (x_length < 0.001):
-                    x_length = 0
-                    disable_flag = 1
-                if (y_length < 0.001):
-                    y_length = 0
-                    disable_flag = 1
-                if (np.isclose(x_length, self.pixel_x_length) or x_length > self.pixel_x_length):
-                    x_length = self.pixel_x_length
-                if (np.isclose(y_length, self.pixel_y_length) or y_length > self.pixel_y_length):
-                    y_length = self.pixel_y_length
-
-                command += 'select("{}");'.format(self.group_name + str(position[0]) + "_" + str(position[1]))
-                command += 'set("x span", {:.6f}e-6);'.format(x_length)
-                command += 'set("y span", {:.6f}e-6);'.format(y_length)
-                if (disable_flag):
-                    command += 'set("enabled", 0);'
-                else:
-                    command += 'set("enabled", 1);'
+            x_length, y_length, enabled = _pixel_lengths(self.__lastest_array[reconfig_positions], self.pixel_x_length, self.pixel_y_length)
 
             self.fdtd_engine.fdtd.eval("clear;")
             time.sleep(self.relaxing_time)
-            self.fdtd_engine.fdtd.eval(command)
-
-    def draw_layout(self, matrix, cell, layer):
+            if (len(x_length) > 0):
+                self.fdtd_engine.fdtd.putv("splayout_pixels", np.column_stack((reconfig_positions[0].astype(np.double),
+                                                                               reconfig_positions[1].astype(np.double),
+                                                                               x_length * 1e-6,
+                                                                               y_length * 1e-6,
+                                                                               enabled.astype(np.double))))
+                self.fdtd_engine.fdtd.eval('splayout_size = size(splayout_pixels);' +
+                                           'for (splayout_i = 1:splayout_size(1)) {' +
+                                           'select("{}" + num2str(splayout_pixels(splayout_i, 1)) + "_" + num2str(splayout_pixels(splayout_i, 2)));'.format(self.group_name) +
+                                           'set("x span", splayout_pixels(splayout_i, 3));' +
+                                           'set("y span", splayout_pixels(splayout_i, 4));' +
+                                           'set("enabled", splayout_pixels(splayout_i, 5));' +
+                                           '}' +
+                                           'clear(splayout_pixels, splayout_size, splayout_i);')
+
+    def draw_layout(self, matrix, cell, layer, merge = False):
         '''
         Draw pixels on layout.
 
@@ -316,23 +484,32 @@ class RectanglePixelsRegion:
         ----------
         matrix : numpy.array
             Array (values:0~1) that represent the pixels in the region.
-        cell : Cell
-            Cell to draw the component.
+        cell : Cell or List of Cell
+            Cell to draw the component, one cell for every matrix when a batch of matrices is given.
         layer : Layer
             Layer to draw.
+        merge : Bool
+            Whether to export a compact layout (default: False). Adjacent full rectangle pixels are merged into maximal
+            rectangles in one polygon set, and circle pixels of the same radius are placed as references of one cell.
+
+        Notes
+        -----
+        A batch of candidates can be drawn at once with a three-dimensional matrix (candidates, x, y), or a
+        two-dimensional matrix (candidates, DOF) when matrix_mask is specified.
         '''
-        if (type(self.matrix_mask) != type(None)):
-            enable_positions = np.where(np.transpose(self.matrix_mask) == 1)
-            if (len(np.transpose(enable_positions)) != len(matrix)):
-                raise Exception("The input matrix can not match the matrix_mask!")
-            masked_matrix = self.matrix_mask.copy().astype(np.double)
-            for i,position in enumerate(np.transpose(enable_positions)):
-                masked_matrix[position[1], position[0]] = matrix[i]
-        elif (len(matrix.shape) != 2):
-            raise Exception("The input matrix should be two-dimensional when matrix_mask not specified!")
+        masked_matrix = _apply_matrix_mask(matrix, self.matrix_mask, self.__mask_positions)
+        if (len(masked_matrix.shape) == 3):
+            if ((type(cell) != list and type(cell) != tuple) or len(cell) != masked_matrix.shape[0]):
+                raise Exception("One cell should be given for every matrix in the batch!")
+            for i in range(0, masked_matrix.shape[0]):
+                self.__draw_matrix(masked_matrix[i], cell[i], layer, merge)
         else:
-            masked_matrix = matrix
+            self.__draw_matrix(masked_matrix, cell, layer, merge)
 
+    def __draw_matrix(self, masked_matrix, cell, layer, merge):
+        if (merge):
+            _draw_merged_rectangles(masked_matrix, self.left_down_point, self.right_up_point, self.pixel_x_length, self.pixel_y_length, cell, layer)
+            return
         self.block_x_length = np.abs(self.left_down_point.x - self.right_up_point.x) / masked_matrix.shape[0]
         self.block_y_length = np.abs(self.left_down_point.y - self.right_up_point.y) / masked_matrix.shape[1]
         self.x_start_point = self.left_down_point.x + self.block_x_length / 2
@@ -357,3 +534,231 @@ class RectanglePixelsRegion:
                     rectangle.draw(cell,layer)
 
 
+
+
+class RasterPixelsRegion:
+    """
+    Rasterized pixels region for FDTD simulation. The pixels (etched blocks) are rendered into the index distribution of one import object instead of being created as separate structures, so an update is one array push regardless of the number of pixels.
+
+    Parameters
+    ----------
+    bottom_left_corner_point : Point
+        Lower left corner of the region.
+    top_right_corner_point : Point
+        Upper right corner of the region.
+    pixel_size : Float or tuple
+        Radius of the pixel for "circle" pixels, (x length, y length) or side length of the pixel for "rectangle" pixels.
+    fdtd_engine : FDTDSimulation
+        The FDTDSimulation object.
+    pixel_shape : String
+        Shape of the pixels, "rectangle" or "circle" (default: "rectangle").
+    pixel_index : Float
+        Refractive index of the pixels (default: 1.444).
+    background_index : Float
+        Refractive index of the region outside the pixels (default: 3.478).
+    x_mesh : Float
+        The grid unit of the index distribution in x-axis (unit: μm, default: 0.01).
+    y_mesh : Float
+        The grid unit of the index distribution in y-axis (unit: μm, default: 0.01).
+    z_start : Float
+        The start point for the structure in z axis (unit: μm, default: -0.11).
+    z_end : Float
+        The end point for the structure in z axis (unit: μm, default: 0.11).
+    rename : String
+        Name of the import object in Lumerical (default: "RasterPixels").
+    matrix_mask : Array
+        Mask array for the matrix in update function (default: None).
+    symmetry : String
+        Symmetry of the pixels about the center of the region, X_MIRROR (x -> -x), Y_MIRROR (y -> -y), XY_MIRROR or C2
+        (180 degree rotation). The input vector of update then only contains one pixel of every symmetric pair, and
+        matrix_mask (np.ones((columns, rows)) for a region without fixed pixels) should be specified (default: None).
+
+    Notes
+    -----
+    The import object replaces all the structures inside the region, so the background_index should be the index of the etched layer.
+    """
+    def __init__(self, bottom_left_corner_point, top_right_corner_point, pixel_size, fdtd_engine, pixel_shape = "rectangle", pixel_index = 1.444, background_index = 3.478,
+                 x_mesh = 0.01, y_mesh = 0.01, z_start=-0.11, z_end=0.11, rename = "RasterPixels", matrix_mask = None, symmetry = None):
+        self.left_down_point = tuple_to_point(bottom_left_corner_point)
+        self.right_up_point = tuple_to_point(top_right_corner_point)
+        if (pixel_shape == "circle"):
+            self.pixel_radius = pixel_size
+        elif (pixel_shape == "rectangle"):
+            if (type(pixel_size) == tuple or type(pixel_size) == list):
+                self.pixel_x_length = pixel_size[0]
+                self.pixel_y_length = pixel_size[1]
+            else:
+                self.pixel_x_length = pixel_size
+                self.pixel_y_length = pixel_size
+        else:
+            raise Exception("Wrong pixel shape specification!")
+        self.pixel_shape = pixel_shape
+        self.fdtd_engine = fdtd_engine
+        self.pixel_index = pixel_index
+        self.background_index = background_index
+        self.x_mesh = x_mesh
+        self.y_mesh = y_mesh
+        self.z_start = z_start
+        self.z_end = z_end
+        self.rename = rename
+        self.x_size = int(np.abs(self.right_up_point.x - self.left_down_point.x)/self.x_mesh) + 1
+        self.y_size = int(np.abs(self.right_up_point.y - self.left_down_point.y)/self.y_mesh) + 1
+        self.x_positions = np.linspace(self.left_down_point.x, self.right_up_point.x, self.x_size)
+        self.y_positions = np.linspace(self.left_down_point.y, self.right_up_point.y, self.y_size)
+        self.__lastest_array = None
+        self.__grid_shape = None
+        self.__created = 0
+        if (type(matrix_mask) != type(None)):
+            self.matrix_mask = np.array(matrix_mask, dtype=np.int32)
+        else:
+            self.matrix_mask = matrix_mask
+        self.symmetry = symmetry
+        self.__mask_positions = _get_mask_positions(self.matrix_mask, symmetry)
+
+    def __initialize(self):
+        ## pixel (col, row) of every grid point and its offset from the pixel center
+        self.block_x_length = np.abs(self.left_down_point.x - self.right_up_point.x) / self.__grid_shape[0]
+        self.block_y_length = np.abs(self.left_down_point.y - self.right_up_point.y) / self.__grid_shape[1]
+        cols = np.clip(np.floor((self.x_positions - self.left_down_point.x) / self.block_x_length), 0, self.__grid_shape[0] - 1).astype(int)
+        rows = np.clip(np.floor((self.right_up_point.y - self.y_positions) / self.block_y_length), 0, self.__grid_shape[1] - 1).astype(int)
+        x_offsets = self.x_positions - (self.left_down_point.x + (cols + 0.5) * self.block_x_length)
+        y_offsets = self.y_positions - (self.right_up_point.y - (rows + 0.5) * self.block_y_length)
+        self.__cols, self.__rows = np.meshgrid(cols, rows, indexing="ij")
+        self.__x_offsets, self.__y_offsets = np.meshgrid(x_offsets, y_offsets, indexing="ij")
+
+    def get_index_distribution(self, matrix):
+        '''
+        Render the pixels into the index distribution of the import object.
+
+        Parameters
+        ----------
+        matrix : numpy.array
+            Array (values:0~1) that represent the pixels in the region.
+
+        Returns
+        -------
+        out : Array
+            Refractive index, size: (x grid points, y grid points).
+        '''
+        return self.__render(self.__get_masked_matrix(matrix))
+
+    def __render(self, masked_matrix):
+        if (masked_matrix.shape != self.__grid_shape):
+            self.__grid_shape = masked_matrix.shape
+            self.__initialize()
+        values = masked_matrix[self.__cols, self.__rows]
+        if (self.pixel_shape == "circle"):
+            radius, enabled = _pixel_radius(values, self.pixel_radius)
+            inside = enabled & (np.square(self.__x_offsets) + np.square(self.__y_offsets) <= np.square(radius + 1e-9))
+        else:
+            x_length, y_length, enabled = _pixel_lengths(values, self.pixel_x_length, self.pixel_y_length)
+            inside = enabled & (np.abs(self.__x_offsets) <= x_length/2 + 1e-9) & (np.abs(self.__y_offsets) <= y_length/2 + 1e-9)
+        return np.where(inside, self.pixel_index, self.background_index)
+
+    def __get_masked_matrix(self, matrix):
+        masked_matrix = _apply_matrix_mask(matrix, self.matrix_mask, self.__mask_positions)
+        if (len(masked_matrix.shape) != 2):
+            raise Exception("The input matrix should be two-dimensional!")
+        return masked_matrix
+
+    def get_dof(self):
+        """
+        Return the length of the input vector of update when matrix_mask is specified.
+
+        Returns
+        -------
+        out : Int
+            Number of the free pixels (one pixel of every symmetric pair).
+        """
+        if (type(self.matrix_mask) == type(None)):
+            raise Exception("matrix_mask is not specified!")
+        return self.__mask_positions[3]
+
+    def update(self, matrix):
+        '''
+        Update pixel region according to the new matrix. The index distribution of the import object is replaced with one array push.
+
+        Parameters
+        ----------
+        matrix : numpy.array
+            Array (values:0~1) that represent the pixels in the region.
+        '''
+        masked_matrix = self.__get_masked_matrix(matrix)
+        if (type(self.__lastest_array) != type(None) and self.__lastest_array.shape == masked_matrix.shape
+                and np.allclose(self.__lastest_array, masked_matrix)):
+            return
+        self.__lastest_array = np.array(masked_matrix,dtype=np.double)
+        index = self.__render(masked_matrix)
+
+        self.fdtd_engine.switch_to_layout()
+        self.fdtd_engine.fdtd.putv("splayout_raster_index", index)
+        if (self.__created):
+            command = 'select("{}");delete;'.format(self.rename)
+        else:
+            command = ''
+            self.__created = 1
+        self.fdtd_engine.fdtd.eval(command +
+                                   'addimport;' +
+                                   'set("name","{}");'.format(self.rename) +
+                                   'splayout_raster_x = linspace({:.6f}e-6,{:.6f}e-6,{});'.format(self.x_positions[0], self.x_positions[-1], self.x_size) +
+                                   'splayout_raster_y = linspace({:.6f}e-6,{:.6f}e-6,{});'.format(self.y_positions[0], self.y_positions[-1], self.y_size) +
+                                   'splayout_raster_z = [{:.6f}e-6,{:.6f}e-6];'.format(self.z_start, self.z_end) +
+                                   'splayout_raster_n = zeros(length(splayout_raster_x),length(splayout_raster_y),2);' +
+                                   'splayout_raster_n(:,:,1) = splayout_raster_index;' +
+                                   'splayout_raster_n(:,:,2) = splayout_raster_index;' +
+                                   'importnk2(splayout_raster_n,splayout_raster_x,splayout_raster_y,splayout_raster_z);' +
+                                   'clear(splayout_raster_index,splayout_raster_x,splayout_raster_y,splayout_raster_z,splayout_raster_n);')
+
+    def draw_layout(self, matrix, cell, layer, merge = False):
+        '''
+        Draw pixels on layout.
+
+        Parameters
+        ----------
+        matrix : numpy.array
+            Array (values:0~1) that represent the pixels in the region.
+        cell : Cell or List of Cell
+            Cell to draw the component, one cell for every matrix when a batch of matrices is given.
+        layer : Layer
+            Layer to draw.
+        merge : Bool
+            Whether to export a compact layout (default: False). Adjacent full rectangle pixels are merged into maximal
+            rectangles in one polygon set, and circle pixels of the same radius are placed as references of one cell.
+
+        Notes
+        -----
+        A batch of candidates can be drawn at once with a three-dimensional matrix (candidates, x, y), or a
+        two-dimensional matrix (candidates, DOF) when matrix_mask is specified.
+        '''
+        masked_matrix = _apply_matrix_mask(matrix, self.matrix_mask, self.__mask_positions)
+        if (len(masked_matrix.shape) == 3):
+            if ((type(cell) != list and type(cell) != tuple) or len(cell) != masked_matrix.shape[0]):
+                raise Exception("One cell should be given for every matrix in the batch!")
+            for i in range(0, masked_matrix.shape[0]):
+                self.__draw_matrix(masked_matrix[i], cell[i], layer, merge)
+        else:
+            self.__draw_matrix(masked_matrix, cell, layer, merge)
+
+    def __draw_matrix(self, masked_matrix, cell, layer, merge):
+        if (merge and self.pixel_shape == "circle"):
+            _draw_instanced_circles(masked_matrix, self.left_down_point, self.right_up_point, self.pixel_radius, cell, layer, self.rename)
+            return
+        elif (merge):
+            _draw_merged_rectangles(masked_matrix, self.left_down_point, self.right_up_point, self.pixel_x_length, self.pixel_y_length, cell, layer)
+            return
+        block_x_length = np.abs(self.left_down_point.x - self.right_up_point.x) / masked_matrix.shape[0]
+        block_y_length = np.abs(self.left_down_point.y - self.right_up_point.y) / masked_matrix.shape[1]
+        x_start_point = self.left_down_point.x + block_x_length / 2
+        y_start_point = self.right_up_point.y - block_y_length / 2
+
+        for row in range(0, masked_matrix.shape[1]):
+            for col in range(0, masked_matrix.shape[0]):
+                center_point = Point(x_start_point + col * block_x_length, y_start_point - row * block_y_length)
+                if (self.pixel_shape == "circle"):
+                    radius, enabled = _pixel_radius([masked_matrix[col, row]], self.pixel_radius)
+                    if (enabled[0]):
+                        Circle(center_point=center_point, radius=radius[0]).draw(cell, layer)
+                else:
+                    x_length, y_length, enabled = _pixel_lengths([masked_matrix[col, row]], self.pixel_x_length, self.pixel_y_length)
+                    if (enabled[0]):
+                        Rectangle(center_point=center_point, width=x_length[0], height=y_length[0]).draw(cell, layer)
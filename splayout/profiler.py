@@ -0,0 +1,296 @@
+import contextlib
+import csv
+import json
+import os
+import re
+import sys
+import time
+import numpy as np
+
+## files whose frames are never reported as the origin of a call
+_BRIDGE_FILES = ("lumericalsession.py", "profiler.py", "lumapitransport.py")
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _get_eval_category(script):
+    ## scripts that contain "run;" or "runjobs;" are recorded as "run"
+    if (type(script) == str and re.search(r"(^|;)\s*run(jobs)?\s*;", script)):
+        return "run"
+    return "eval"
+
+
+class LumericalProfiler:
+    """
+    Opt-in profiler for the calls from splayout to Lumerical (eval, putv, getv, getresult, run, ...).
+
+    Every call is timed and counted by its category and the splayout method it originates from (the outermost
+    splayout method in the call stack, e.g. "RectanglePixelsRegion.update" or "AdjointForTO.call_grad").
+    Enable it with FDTDSimulation.enable_profiler or MODESimulation.enable_profiler.
+
+    Notes
+    -----
+    Call "next_iteration" after every iteration of an optimization (or pass "wrap_callback(callback)" as the callback
+    function of an optimizer) to get per-iteration reports. The time of an iteration that is not spent in the calls
+    to Lumerical is reported as "python_time" (e.g. NumPy post-processing), and parts of it can be timed with "section".
+    """
+    def __init__(self):
+        self.durations = {}
+        self.iterations = []
+        self.__current = {}
+        self.__iteration_start = time.perf_counter()
+
+    def record(self, category, origin, duration):
+        """
+        Record a call.
+
+        Parameters
+        ----------
+        category : String
+            Category of the call, e.g. "eval", "putv", "getv", "getresult" or "run".
+        origin : String
+            The splayout method that the call originates from.
+        duration : Float
+            Duration of the call (unit: s).
+        """
+        key = (origin, category)
+        self.durations.setdefault(key, []).append(duration)
+        count, total = self.__current.get(key, (0, 0))
+        self.__current[key] = (count + 1, total + duration)
+
+    def profile_call(self, category, function, *args, **kwargs):
+        """
+        Call a function of the transport and record it.
+
+        Parameters
+        ----------
+        category : String
+            Category of the call, "eval" scripts that contain "run;" or "runjobs;" are recorded as "run".
+        function : func
+            The function.
+        args, kwargs : Any
+            Inputs of the function.
+
+        Returns
+        -------
+        out : Any
+            Output of the function.
+        """
+        if (category == "eval" and len(args) > 0):
+            category = _get_eval_category(args[0])
+        origin = self.get_origin()
+        time_before_call = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            self.record(category, origin, time.perf_counter() - time_before_call)
+
+    def profile_batch(self, function, command, scripts, origins):
+        """
+        Call the eval function of the transport with the scripts of a batch and record every script with its origin.
+
+        Parameters
+        ----------
+        function : func
+            The eval function.
+        command : String
+            The joined scripts.
+        scripts : List of String
+            The buffered scripts.
+        origins : List of String
+            The origins of the scripts, from "get_origin" when they are buffered.
+
+        Notes
+        -----
+        Every buffered script is counted as one call with an equal share of the time of the eval.
+        """
+        time_before_call = time.perf_counter()
+        try:
+            function(command)
+        finally:
+            duration = (time.perf_counter() - time_before_call) / max(len(scripts), 1)
+            for script, origin in zip(scripts, origins):
+                self.record(_get_eval_category(script), origin, duration)
+
+    @staticmethod
+    def get_origin():
+        """
+        Get the outermost splayout method of the splayout calls that lead to the current call (the search stops at the
+        first user frame, so the optimizers calling user cost functions are not reported).
+
+        Returns
+        -------
+        out : String
+            "Class.method" or "function", "user" if the call is made directly from user code.
+        """
+        origin = "user"
+        frame = sys._getframe(1)
+        while (type(frame) != type(None)):
+            filename = frame.f_code.co_filename
+            if (os.path.dirname(os.path.abspath(filename)) != _PACKAGE_DIR):
+                if (origin != "user"):
+                    break
+            elif (os.path.basename(filename) not in _BRIDGE_FILES):
+                instance = frame.f_locals.get("self")
+                if (type(instance) != type(None)):
+                    origin = type(instance).__name__ + "." + frame.f_code.co_name
+                else:
+                    origin = frame.f_code.co_name
+            frame = frame.f_back
+        return origin
+
+    @contextlib.contextmanager
+    def section(self, name):
+        """
+        Context manager that times a block of Python code (e.g. post-processing) as category "python".
+
+        Parameters
+        ----------
+        name : String
+            Name of the block, reported as the origin.
+        """
+        time_before_block = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.record("python", name, time.perf_counter() - time_before_block)
+
+    def next_iteration(self):
+        """
+        Close the current iteration and start a new one.
+
+        Returns
+        -------
+        out : Dict
+            Report of the closed iteration (see "get_iterations").
+        """
+        now = time.perf_counter()
+        calls = [{"origin": origin, "category": category, "count": count, "time": total}
+                 for (origin, category), (count, total) in sorted(self.__current.items())]
+        bridge_time = sum([call["time"] for call in calls if call["category"] != "python"])
+        report = {"iteration": len(self.iterations),
+                  "wall_time": now - self.__iteration_start,
+                  "bridge_time": bridge_time,
+                  "python_time": now - self.__iteration_start - bridge_time,
+                  "calls": calls}
+        self.iterations.append(report)
+        self.__current = {}
+        self.__iteration_start = now
+        return report
+
+    def wrap_callback(self, callback_function = None):
+        """
+        Wrap the callback function of an optimizer so that every call closes an iteration.
+
+        Parameters
+        ----------
+        callback_function : func
+            Self-defined callback function without input (default: None).
+
+        Returns
+        -------
+        out : func
+            The callback function for the optimizer.
+        """
+        def call_back():
+            self.next_iteration()
+            if (type(callback_function) != type(None)):
+                callback_function()
+        return call_back
+
+    def get_iterations(self):
+        """
+        Get the per-iteration reports.
+
+        Returns
+        -------
+        out : List of Dict
+            [{"iteration", "wall_time", "bridge_time", "python_time", "calls": [{"origin", "category", "count", "time"}]}].
+        """
+        return list(self.iterations)
+
+    def get_summary(self):
+        """
+        Get the statistics of all the recorded calls.
+
+        Returns
+        -------
+        out : List of Dict
+            [{"origin", "category", "count", "time", "mean", "max"}], sorted by the total time.
+        """
+        summary = []
+        for (origin, category), durations in self.durations.items():
+            summary.append({"origin": origin, "category": category, "count": len(durations),
+                            "time": float(np.sum(durations)), "mean": float(np.mean(durations)),
+                            "max": float(np.max(durations))})
+        return sorted(summary, key=lambda item: -item["time"])
+
+    def get_histogram(self, category = None, origin = None, bins = 20):
+        """
+        Get the histogram of the call durations.
+
+        Parameters
+        ----------
+        category : String
+            Category of the calls, None means all the categories (default: None).
+        origin : String
+            Origin of the calls, None means all the origins (default: None).
+        bins : Int
+            Number of the logarithmic bins (default: 20).
+
+        Returns
+        -------
+        counts : Array
+            Number of the calls in every bin, size: (bins,).
+        edges : Array
+            Edges of the bins (unit: s), size: (bins + 1,).
+        """
+        durations = [duration for (call_origin, call_category), values in self.durations.items()
+                     if (type(category) == type(None) or call_category == category) and
+                     (type(origin) == type(None) or call_origin == origin) for duration in values]
+        if (len(durations) == 0):
+            return np.zeros(bins, dtype=int), np.zeros(bins + 1)
+        durations = np.maximum(np.array(durations), 1e-9)
+        low = np.log10(durations.min())
+        edges = np.logspace(low, max(np.log10(durations.max()), low + 1e-9), bins + 1)
+        ## the rounding of logspace may leave the shortest or the longest call out of the bins
+        edges[0] = durations.min()
+        edges[-1] = max(edges[-1], durations.max())
+        return np.histogram(durations, bins=edges)
+
+    def export_json(self, filename):
+        """
+        Export the per-iteration reports and the summary as a JSON file.
+
+        Parameters
+        ----------
+        filename : String
+            File name or File path.
+        """
+        with open(filename, "w") as file:
+            json.dump({"iterations": self.get_iterations(), "summary": self.get_summary()}, file, indent=1)
+
+    def export_csv(self, filename):
+        """
+        Export the per-iteration reports as a CSV file, one row for every (iteration, origin, category).
+
+        Parameters
+        ----------
+        filename : String
+            File name or File path.
+        """
+        with open(filename, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["iteration", "origin", "category", "count", "time", "wall_time", "bridge_time", "python_time"])
+            for report in self.iterations:
+                for call in report["calls"]:
+                    writer.writerow([report["iteration"], call["origin"], call["category"], call["count"], call["time"],
+                                     report["wall_time"], report["bridge_time"], report["python_time"]])
+
+    def reset(self):
+        """
+        Clear all the records.
+        """
+        self.durations = {}
+        self.iterations = []
+        self.__current = {}
+        self.__iteration_start = time.perf_counter()
@@ -0,0 +1,197 @@
+import collections
+import hashlib
+import pickle
+import os
+import threading
+import numpy as np
+
+
+class ResultCache:
+    """
+    Content-addressed cache for simulation results with a bounded LRU memory tier and an optional disk tier.
+
+    The results are stored under a hash of the full design state, e.g. the pixel matrix of a RectanglePixelsRegion
+    or CirclePixelsRegion or the params of a TopologyOptRegion2D, together with the configuration of the sources
+    and the monitors, so a repeated solution can be served without running the simulation again.
+
+    Parameters
+    ----------
+    max_size : Int
+        Maximum number of results kept in memory, the least recently used result is evicted first (default: 1024).
+    cache_dir : String
+        Directory for the disk tier, None means no disk tier (default: None).
+
+    Notes
+    -----
+    Wrap the function that updates the region, runs the simulation and returns the spectrum with "memoize", e.g.
+    cached_get_spectrum = cache.memoize(get_spectrum, config={"source": "source", "monitor": "expansion"},
+    state=lambda: other_region_matrix). The cache can be shared by the threads of an executor.
+    """
+    def __init__(self, max_size = 1024, cache_dir = None):
+        self.max_size = max_size
+        self.cache_dir = cache_dir
+        self.__memory = collections.OrderedDict()
+        self.__lock = threading.RLock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if (type(cache_dir) != type(None)) and not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+    @staticmethod
+    def hash_state(*states):
+        """
+        Hash a design state.
+
+        Parameters
+        ----------
+        states : Array, Float, String, List, Tuple or Dict
+            Anything that defines the result, e.g. the pixel matrix and the source/monitor configuration.
+
+        Returns
+        -------
+        out : String
+            Hex digest of the state.
+        """
+        digest = hashlib.sha1()
+        for state in states:
+            ResultCache.__update_digest(digest, state)
+        return digest.hexdigest()
+
+    @staticmethod
+    def __update_digest(digest, state):
+        if (type(state) == np.ndarray):
+            digest.update(b"ndarray" + str(state.dtype).encode() + str(state.shape).encode())
+            digest.update(np.ascontiguousarray(state).tobytes())
+        elif (type(state) == dict):
+            digest.update(b"dict" + str(len(state)).encode())
+            for key in sorted(state.keys(), key=repr):
+                ResultCache.__update_digest(digest, key)
+                ResultCache.__update_digest(digest, state[key])
+        elif (type(state) == list or type(state) == tuple):
+            digest.update(type(state).__name__.encode() + str(len(state)).encode())
+            for item in state:
+                ResultCache.__update_digest(digest, item)
+        else:
+            digest.update(type(state).__name__.encode() + repr(state).encode())
+
+    def get(self, key, default = None):
+        """
+        Get a result from the cache.
+
+        Parameters
+        ----------
+        key : String
+            Hash of the design state (see "hash_state").
+        default : Any
+            Value returned when the result is not cached (default: None).
+
+        Returns
+        -------
+        out : Any
+            The cached result or default.
+        """
+        with self.__lock:
+            if key in self.__memory:
+                self.__memory.move_to_end(key)
+                self.hits += 1
+                return self.__memory[key]
+            if (type(self.cache_dir) != type(None)):
+                filepath = os.path.join(self.cache_dir, key + ".pkl")
+                if os.path.isfile(filepath):
+                    with open(filepath, "rb") as file:
+                        value = pickle.load(file)
+                    value = self.__store(key, value)
+                    self.disk_hits += 1
+                    return value
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        """
+        Put a result into the cache.
+
+        Parameters
+        ----------
+        key : String
+            Hash of the design state (see "hash_state").
+        value : Any
+            The result, e.g. the spectrum from "get_mode_transmission" or "get_transmission".
+        """
+        with self.__lock:
+            self.__store(key, value)
+            if (type(self.cache_dir) != type(None)):
+                with open(os.path.join(self.cache_dir, key + ".pkl"), "wb") as file:
+                    pickle.dump(value, file)
+
+    def __store(self, key, value):
+        ## freeze a copy, so that the array of the caller stays writable
+        if (type(value) == np.ndarray):
+            value = value.copy()
+            value.flags.writeable = False
+        self.__memory[key] = value
+        self.__memory.move_to_end(key)
+        while (len(self.__memory) > self.max_size):
+            self.__memory.popitem(last=False)
+        return value
+
+    def memoize(self, function, config, state = None):
+        """
+        Wrap a function of a single solution with the cache.
+
+        Parameters
+        ----------
+        function : func
+            Function that runs the simulation for a solution and returns the result, input: Array.
+        config : Any
+            Configuration of the simulation that is hashed together with the solution, e.g. the names, modes, positions
+            and wavelength range of the sources and monitors. Two setups must not share a configuration.
+        state : func
+            Function without input that returns the design state outside the solution, e.g. the matrices of the other
+            regions or the fixed part of the region, hashed at every call (default: None).
+
+        Returns
+        -------
+        out : func
+            The cached function, input: Array.
+        """
+        def cached_function(solution):
+            key = self.hash_state(np.asarray(solution), config, state() if type(state) != type(None) else None)
+            value = self.get(key)
+            if (type(value) == type(None)):
+                value = function(solution)
+                self.put(key, value)
+            return value
+        return cached_function
+
+    def clear(self):
+        """
+        Clear the memory tier and the statistics (the disk tier is kept).
+        """
+        with self.__lock:
+            self.__memory.clear()
+            self.hits = 0
+            self.disk_hits = 0
+            self.misses = 0
+
+    def get_statistics(self):
+        """
+        Get the hit/miss statistics.
+
+        Returns
+        -------
+        out : Dict
+            {"hits", "disk_hits", "misses", "hit_rate", "size"}.
+        """
+        total = self.hits + self.disk_hits + self.misses
+        return {"hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / total if total > 0 else 0,
+                "size": len(self.__memory)}
+
+    def __len__(self):
+        return len(self.__memory)
+
+    def __contains__(self, key):
+        return key in self.__memory
@@ -0,0 +1,137 @@
+from splayout.fdtdapi import FDTDSimulation
+import multiprocessing
+import numpy as np
+import os
+
+## the FDTDSimulation object of the worker process
+_worker_engine = None
+
+
+def _initialize_worker(load_file, hide, fdtd_path, transport_factory, setup_function):
+    global _worker_engine
+    transport = transport_factory() if (type(transport_factory) != type(None)) else None
+    _worker_engine = FDTDSimulation(hide=hide, fdtd_path=fdtd_path, load_file=load_file, transport=transport)
+    _worker_engine.pool_worker_id = os.getpid()
+    if (type(setup_function) != type(None)):
+        setup_function(_worker_engine)
+
+
+def _evaluate(task):
+    cost_function, candidate, pass_engine = task
+    if pass_engine:
+        return cost_function(_worker_engine, candidate)
+    return cost_function(candidate)
+
+
+class SimulationPool:
+    """
+    Pool of Lumerical FDTD sessions for evaluating solutions in parallel. Every worker process owns one
+    FDTDSimulation object that loads the same base project.
+
+    Parameters
+    ----------
+    load_file : String
+        Path to the .fsp file that will be loaded in every session (default: None).
+    processes : Int
+        Number of worker processes, each of them owns a Lumerical session (default: 2).
+    hide : Bool
+        Whether the Lumerical windows are hidden (default: True).
+    fdtd_path : String
+        Path to the Lumerical Python API folder.
+    transport_factory : func
+        Function without input that returns the transport for a session, e.g. FakeLumapiTransport (default: None, means the Lumerical FDTD).
+    setup_function : func
+        Function that will be called once in every worker after the project is loaded, input: FDTDSimulation (default: None).
+    pass_engine : Bool
+        Whether the FDTDSimulation object of the worker is passed to the cost functions (default: True).
+
+    Notes
+    -----
+    The cost functions are called in the worker processes as cost_function(fdtd_engine, solution), where fdtd_engine
+    is the FDTDSimulation object of the worker. With pass_engine=False, they are called as cost_function(solution), the
+    signature the optimizers use (e.g. BinaryBatAlgorithm(..., executor=pool)), and get the object of the worker with
+    "SimulationPool.get_worker_engine()". As the sessions share the working directory, the cost function
+    should save the simulation with a unique file name, e.g. fdtd_engine.run("temp" + str(fdtd_engine.pool_worker_id)).
+    The cost functions, transport_factory and setup_function should be defined at the top level of a module so that
+    they can be sent to the worker processes.
+    """
+    def __init__(self, load_file = None, processes = 2, hide = 1, fdtd_path = "C:\\Program Files\\Lumerical\\v202\\api\\python\\", transport_factory = None, setup_function = None, pass_engine = True):
+        self.load_file = load_file
+        self.processes = processes
+        self.pass_engine = pass_engine
+        self.pool = multiprocessing.Pool(processes=processes, initializer=_initialize_worker,
+                                         initargs=(load_file, hide, fdtd_path, transport_factory, setup_function))
+
+    def map(self, cost_function, candidates):
+        """
+        Evaluate solutions in parallel and wait for all of them.
+
+        Parameters
+        ----------
+        cost_function : func
+            Cost function for evaluating a single solution, input: (FDTDSimulation, Array), or Array with
+            pass_engine=False, output: Float.
+        candidates : Array or List
+            Solutions to evaluate, size: (number of solutions, loS).
+
+        Returns
+        -------
+        out : Array
+            Costs of the solutions, size: (number of solutions,).
+        """
+        tasks = [(cost_function, candidate, self.pass_engine) for candidate in candidates]
+        return np.array(self.pool.map(_evaluate, tasks, chunksize=1))
+
+    def submit(self, cost_function, candidate):
+        """
+        Evaluate a solution asynchronously.
+
+        Parameters
+        ----------
+        cost_function : func
+            Cost function for evaluating a single solution, input: (FDTDSimulation, Array), or Array with
+            pass_engine=False, output: Float.
+        candidate : Array
+            Solution to evaluate.
+
+        Returns
+        -------
+        out : AsyncResult
+            Call "out.get()" to wait for the cost.
+        """
+        return self.pool.apply_async(_evaluate, ((cost_function, candidate, self.pass_engine),))
+
+    @staticmethod
+    def get_worker_engine():
+        """
+        Get the FDTDSimulation object of the worker process, to be called in a cost function.
+
+        Returns
+        -------
+        out : FDTDSimulation
+            The object of the worker, None outside the worker processes.
+        """
+        return _worker_engine
+
+    def close(self):
+        """
+        Wait for the submitted evaluations and close all the sessions.
+        """
+        self.pool.close()
+        self.pool.join()
+
+    def terminate(self):
+        """
+        Stop the worker processes immediately.
+        """
+        self.pool.terminate()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if (type(exc_type) == type(None)):
+            self.close()
+        else:
+            self.terminate()
@@ -0,0 +1,196 @@
+from splayout.utils import *
+import numpy as np
+
+## dataset of Lumerical that every quantity comes from
+_QUANTITY_DATASETS = {"transmission": "T",
+                      "mode_transmission": "expansion for Output",
+                      "mode_coefficient": "expansion for Output",
+                      "mode_phase": "expansion for Output",
+                      "source_power": None}
+
+
+class SimulationResult:
+    """
+    Results fetched from several monitors and sources at once, returned by "fetch_results" of FDTDSimulation and MODESimulation.
+
+    Every quantity has the same format as the corresponding function of the simulation object, e.g.
+    result["expansion", "mode_transmission"] is the same as get_mode_transmission("expansion").
+
+    Parameters
+    ----------
+    wavelength : Array
+        Wavelength points, size: (frequency points,).
+    data : Dict
+        {(name, quantity): value}.
+    """
+    def __init__(self, wavelength, data):
+        self.wavelength = wavelength
+        self.data = data
+
+    def get(self, name, quantity):
+        """
+        Get a fetched quantity.
+
+        Parameters
+        ----------
+        name : String
+            Name of the monitor or the source.
+        quantity : String
+            "transmission", "mode_transmission", "mode_coefficient", "mode_phase" or "source_power".
+
+        Returns
+        -------
+        out : Array
+            The quantity.
+        """
+        if (name, quantity) not in self.data:
+            raise Exception("\"" + quantity + "\" of \"" + name + "\" is not fetched!")
+        return self.data[(name, quantity)]
+
+    def get_wavelength(self):
+        """
+        Get wavelength points of the results.
+
+        Returns
+        -------
+        out : Array
+            Wavelength points, size: (frequency points,).
+        """
+        return self.wavelength
+
+    def __getitem__(self, key):
+        return self.get(key[0], key[1])
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def keys(self):
+        """
+        Get the fetched (name, quantity) pairs.
+
+        Returns
+        -------
+        out : List of tuple
+            (name, quantity) pairs.
+        """
+        return list(self.data.keys())
+
+
+def make_fetch_script(spec, direction, wavelength_start, wavelength_end, frequency_points, result_name = "splayout_results"):
+    """
+    Generate the Lumerical script that collects the requested quantities into one struct.
+
+    Parameters
+    ----------
+    spec : Dict
+        {monitor or source name: quantity or list of quantities}.
+    direction : Int
+        FORWARD or BACKWARD for the mode expansion quantities.
+    wavelength_start : Float
+        Start wavelength of the source (unit: m).
+    wavelength_end : Float
+        End wavelength of the source (unit: m).
+    frequency_points : Int
+        Number of the frequency points.
+    result_name : String
+        Name of the struct in Lumerical (default: "splayout_results").
+
+    Returns
+    -------
+    script : String
+        The script.
+    requests : List of tuple
+        (name, quantity, field) for every requested quantity.
+    """
+    if (direction == FORWARD):
+        coefficient_name, transmission_name = "a", "T_forward"
+    elif (direction == BACKWARD):
+        coefficient_name, transmission_name = "b", "T_backward"
+    else:
+        raise Exception("Wrong direction setting!")
+    script = result_name + " = struct;"
+    clear_list = []
+    requests = []
+    wavelength_flag = 0
+    for index, name in enumerate(spec):
+        quantities = spec[name] if (type(spec[name]) == list or type(spec[name]) == tuple) else [spec[name]]
+        data_name = "splayout_data_" + str(index)
+        fetched_datasets = []
+        for quantity in quantities:
+            if quantity not in _QUANTITY_DATASETS:
+                raise Exception("Unknown quantity \"" + str(quantity) + "\"!")
+            dataset = _QUANTITY_DATASETS[quantity]
+            field = "q" + str(index) + "_" + quantity
+            if (type(dataset) == type(None)):
+                if "splayout_frequency" not in clear_list:
+                    script += "splayout_frequency = 299792458/linspace({0:.12e},{1:.12e},{2});".format(wavelength_start, wavelength_end, frequency_points)
+                    clear_list.append("splayout_frequency")
+                script += result_name + "." + field + " = sourcepower(splayout_frequency,2,\"" + name + "\");"
+            else:
+                if dataset not in fetched_datasets:
+                    if (len(fetched_datasets) > 0):
+                        raise Exception("\"" + name + "\" can not provide both power monitor and mode expansion quantities!")
+                    script += data_name + " = getresult(\"" + name + "\",\"" + dataset + "\");"
+                    clear_list.append(data_name)
+                    fetched_datasets.append(dataset)
+                    if not wavelength_flag:
+                        script += result_name + ".wavelength = " + data_name + ".lambda;"
+                        wavelength_flag = 1
+                if (quantity == "transmission"):
+                    script += result_name + "." + field + " = " + data_name + ".T;"
+                elif (quantity == "mode_transmission"):
+                    script += result_name + "." + field + " = " + data_name + "." + transmission_name + ";"
+                else:
+                    field = "q" + str(index) + "_coefficient"
+                    if not any([request[2] == field for request in requests]):
+                        script += result_name + "." + field + " = " + data_name + "." + coefficient_name + ";"
+                        script += result_name + "." + field + "_N = " + data_name + ".N;"
+            requests.append((name, quantity, field))
+    if (len(clear_list) > 0):
+        script += "clear(" + ",".join(clear_list) + ");"
+    return script, requests
+
+
+def parse_fetched_results(raw, requests, default_wavelength):
+    """
+    Convert the struct fetched from Lumerical into a SimulationResult.
+
+    Parameters
+    ----------
+    raw : Dict
+        The struct fetched from Lumerical.
+    requests : List of tuple
+        (name, quantity, field) from "make_fetch_script".
+    default_wavelength : Array
+        Wavelength points used when no monitor is fetched.
+
+    Returns
+    -------
+    out : SimulationResult
+        The results.
+    """
+    if "wavelength" in raw:
+        wavelength = np.asarray(raw["wavelength"]).flatten()
+    else:
+        wavelength = default_wavelength
+    data = {}
+    for name, quantity, field in requests:
+        if (quantity == "transmission"):
+            transmission = np.asarray(raw[field])
+            spectrum = np.zeros((2, transmission.shape[0]))
+            spectrum[0, :] = wavelength
+            spectrum[1, :] = transmission.flatten()
+            data[(name, quantity)] = spectrum
+        elif (quantity == "mode_transmission"):
+            transmission = np.asarray(raw[field]).T
+            spectrum = np.zeros((transmission.shape[0], 2, transmission.shape[1]))
+            spectrum[:, 0, :] = wavelength
+            spectrum[:, 1, :] = transmission
+            data[(name, quantity)] = spectrum
+        elif (quantity == "mode_coefficient"):
+            data[(name, quantity)] = (raw[field] * np.sqrt(raw[field + "_N"].real)).flatten()
+        elif (quantity == "mode_phase"):
+            data[(name, quantity)] = np.angle(raw[field] * np.sqrt(raw[field + "_N"].real)).flatten()
+        else:
+            data[(name, quantity)] = np.asarray(raw[field]).flatten()
+    return SimulationResult(wavelength, data)
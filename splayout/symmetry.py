@@ -0,0 +1,99 @@
+from splayout.utils import *
+import numpy as np
+
+
+def get_symmetry_index(shape, symmetry, free = None, order = "C"):
+    """
+    Map the elements of a two-dimensional parameter matrix to the reduced parameter vector of a symmetric design.
+
+    Parameters
+    ----------
+    shape : tuple
+        Shape of the parameter matrix (x size, y size).
+    symmetry : String
+        X_MIRROR (x -> -x), Y_MIRROR (y -> -y), XY_MIRROR (both) or C2 (180 degree rotation) about the center of the
+        region, None means no symmetry.
+    free : Array
+        Boolean matrix of the free elements, the others are not mapped (default: None, all the elements are free).
+    order : String
+        Order of the reduced vector, "C" (x outer, y inner) or "F" (y outer, x inner) (default: "C").
+
+    Returns
+    -------
+    out : Array
+        Index of every element in the reduced vector (-1 for the elements that are not free), size: shape.
+    """
+    flat = np.arange(shape[0] * shape[1]).reshape(shape, order=order)
+    if (type(symmetry) == type(None)):
+        images = [flat]
+    elif (symmetry == X_MIRROR):
+        images = [flat, flat[::-1, :]]
+    elif (symmetry == Y_MIRROR):
+        images = [flat, flat[:, ::-1]]
+    elif (symmetry == XY_MIRROR):
+        images = [flat, flat[::-1, :], flat[:, ::-1], flat[::-1, ::-1]]
+    elif (symmetry == C2):
+        images = [flat, flat[::-1, ::-1]]
+    else:
+        raise Exception("Wrong symmetry specification!")
+    if (type(free) == type(None)):
+        free = np.ones(shape, dtype=bool)
+    else:
+        free = np.array(free, dtype=bool)
+        if any([np.any(free != free.flatten(order=order)[image]) for image in images]):
+            raise Exception("The free elements do not have the symmetry!")
+    ## the element that comes first in the reduced order represents its symmetric copies
+    representative = np.min(images, axis=0)
+    representatives = np.unique(representative[free])
+    index = np.full(shape, -1, dtype=int)
+    index[free] = np.searchsorted(representatives, representative[free])
+    return index
+
+
+def expand_symmetric(params, index, fixed = None):
+    """
+    Expand reduced parameter vectors to the parameter matrix.
+
+    Parameters
+    ----------
+    params : Array
+        Reduced parameter vector, size: (parameters,), or a batch of them, size: (candidates, parameters).
+    index : Array
+        Index from "get_symmetry_index".
+    fixed : Array
+        Values of the elements that are not free (default: None, zero).
+
+    Returns
+    -------
+    out : Array
+        Parameter matrix, size: index.shape, or (candidates,) + index.shape for a batch.
+    """
+    params = np.asarray(params, dtype=np.double)
+    free = index >= 0
+    matrix = np.zeros(params.shape[:-1] + index.shape)
+    if (type(fixed) != type(None)):
+        matrix[...] = fixed
+    matrix[..., free] = params[..., index[free]]
+    return matrix
+
+
+def reduce_symmetric(gradient, index):
+    """
+    Reduce the gradient with respect to the parameter matrix to the gradient with respect to the reduced vector
+    (the gradients of the symmetric copies are summed).
+
+    Parameters
+    ----------
+    gradient : Array
+        Gradient, size: index.shape (or flattened in the order of the matrix).
+    index : Array
+        Index from "get_symmetry_index".
+
+    Returns
+    -------
+    out : Array
+        Reduced gradient, size: (parameters,).
+    """
+    gradient = np.reshape(gradient, index.shape)
+    free = index >= 0
+    return np.bincount(index[free], weights=gradient[free], minlength=int(index.max()) + 1)
@@ -0,0 +1,33 @@
+import pytest
+
+from splayout.fdtdapi import FDTDSimulation
+from splayout.lumapitransport import FakeLumapiTransport
+
+
+@pytest.fixture
+def make_fdtd():
+    """
+    Factory of FDTDSimulation objects on a FakeLumapiTransport, the keyword inputs are passed to the transport.
+    The calls made while building the simulation are reset, so the tests only count their own calls.
+    """
+    def make(**transport_options):
+        transport = FakeLumapiTransport(**transport_options)
+        fdtd = FDTDSimulation(transport=transport)
+        transport.reset()
+        return fdtd, transport
+    return make
+
+
+@pytest.fixture
+def fdtd_and_transport(make_fdtd):
+    return make_fdtd()
+
+
+@pytest.fixture
+def fdtd(fdtd_and_transport):
+    return fdtd_and_transport[0]
+
+
+@pytest.fixture
+def transport(fdtd_and_transport):
+    return fdtd_and_transport[1]
@@ -0,0 +1,122 @@
+import numpy as np
+import pytest
+from splayout.BinaryBatAlgorithm import BinaryBatAlgorithm
+from splayout.BinaryParticleSwarmAlgorithm import BinaryParitcleSwarmAlgorithm
+from splayout.BinaryGeneticAlgorithm import BinaryGeneticAlgorithm
+from splayout.DirectBinarySearchAlgorithm import DirectBianrySearchAlgorithm
+
+TARGET = np.random.default_rng(5).integers(0, 2, 20)
+
+
+def cost(solution):
+    return float(np.sum(np.abs(np.asarray(solution) - TARGET)))
+
+
+def make_optimizer(index, cost_function):
+    np.random.seed(index)
+    if (index == 0):
+        return BinaryBatAlgorithm(8, TARGET.size, cost_function, max_iteration=10)
+    elif (index == 1):
+        return BinaryParitcleSwarmAlgorithm(8, TARGET.size, cost_function, max_iteration=10)
+    elif (index == 2):
+        return BinaryGeneticAlgorithm(8, TARGET.size, cost_function, max_iteration=10)
+    return DirectBianrySearchAlgorithm(TARGET.size, cost_function, max_iteration=2)
+
+
+@pytest.mark.parametrize("index", range(4))
+def test_ask_tell_matches_run(index):
+    optimizer = make_optimizer(index, None)
+    while not optimizer.is_finished():
+        candidates = optimizer.ask()
+        optimizer.tell(candidates, [cost(candidate) for candidate in candidates])
+    next_candidates = optimizer.ask()
+    reference = make_optimizer(index, cost)
+    reference.run()
+    assert optimizer.get_min_cost() == reference.get_min_cost()
+    assert np.all(optimizer.cg_curve == reference.cg_curve)
+    assert optimizer.get_iteration_number() == reference.get_iteration_number()
+    ## ask still proposes candidates after the last iteration, but run does not go on silently
+    assert np.all(next_candidates == reference.ask())
+    with pytest.raises(Exception):
+        reference.run()
+
+
+@pytest.mark.parametrize("index", range(4))
+def test_repeated_ask_returns_pending_candidates(index):
+    optimizer = make_optimizer(index, cost)
+    candidates = optimizer.ask()
+    assert np.all(optimizer.ask() == candidates)
+    optimizer.tell(candidates, [cost(candidate) for candidate in candidates])
+    next_candidates = optimizer.ask()
+    reference = make_optimizer(index, cost)
+    reference_candidates = reference.ask()
+    reference.tell(reference_candidates, [cost(candidate) for candidate in reference_candidates])
+    assert np.all(next_candidates == reference.ask())
+
+
+def test_tell_checks_the_number_of_costs():
+    optimizer = BinaryGeneticAlgorithm(8, TARGET.size, cost, max_iteration=10)
+    with pytest.raises(Exception):
+        optimizer.tell(optimizer.ask(), [0.0])
+
+
+def test_run_without_cost_function():
+    with pytest.raises(Exception):
+        BinaryBatAlgorithm(4, 5, None).run()
+
+
+def test_bat_modes():
+    np.random.seed(0)
+    sequential = BinaryBatAlgorithm(8, TARGET.size, cost, max_iteration=3)
+    assert sequential.ask().shape == (1, TARGET.size)
+    synchronous = BinaryBatAlgorithm(8, TARGET.size, cost, max_iteration=3, synchronous=True)
+    assert synchronous.ask().shape == (8, TARGET.size)
+    batched = BinaryBatAlgorithm(8, TARGET.size, None, max_iteration=3,
+                                 batch_cost_function=lambda candidates: [cost(candidate) for candidate in candidates])
+    assert batched.synchronous
+    sequential.run()
+    assert sequential.get_iteration_number() == 3
+
+
+def test_particle_swarm_modes():
+    np.random.seed(0)
+    sequential = BinaryParitcleSwarmAlgorithm(8, TARGET.size, cost, max_iteration=3)
+    assert sequential.ask().shape == (1, TARGET.size)
+    synchronous = BinaryParitcleSwarmAlgorithm(8, TARGET.size, cost, max_iteration=3, synchronous=True)
+    assert synchronous.ask().shape == (8, TARGET.size)
+    sequential.run()
+    assert sequential.get_iteration_number() == 3
+
+
+def test_genetic_operators():
+    sol_0 = np.zeros((3, 6), dtype=int)
+    sol_1 = np.ones((3, 6), dtype=int)
+    new_sol_0, new_sol_1 = BinaryGeneticAlgorithm.crossover(sol_0, sol_1)
+    assert np.all(new_sol_0 + new_sol_1 == 1)
+    assert np.all(np.diff(new_sol_0, axis=1) >= 0)
+    swap = np.zeros(6, dtype=bool)
+    swap[2] = True
+    new_sol_0, new_sol_1 = BinaryGeneticAlgorithm.crossover(sol_0[0], sol_1[0], swap)
+    assert np.all(new_sol_0 == swap)
+    mutated = BinaryGeneticAlgorithm.mutation(sol_0)
+    assert np.all(np.sum(mutated, axis=1) == 1)
+    assert np.all(sol_0 == 0)
+
+
+def test_genetic_elitism_and_odd_population():
+    np.random.seed(0)
+    optimizer = BinaryGeneticAlgorithm(7, TARGET.size, None, max_iteration=10)
+    candidates = optimizer.ask()
+    optimizer.tell(candidates, np.arange(7, dtype=float) + 3)
+    best_solution = candidates[0].copy()
+    for i in range(0, 3):
+        candidates = optimizer.ask()
+        ## an odd population keeps its size
+        assert candidates.shape == (7, TARGET.size)
+        costs = np.full(7, 5.0)
+        costs[2] = costs[5] = 20.0
+        optimizer.tell(candidates, costs)
+        ## the first worst solution is replaced by the best one so far, with the minimum cost
+        assert np.all(optimizer.get_total_solutions()[2] == best_solution)
+        assert optimizer.get_total_cost()[2] == optimizer.get_min_cost() == 3.0
+        assert optimizer.get_total_cost()[5] == 20.0
@@ -0,0 +1,165 @@
+import numpy as np
+import pytest
+from splayout.fdtdapi import FDTDSimulation
+from splayout.lumapitransport import FakeLumapiTransport
+from splayout.utils import Point
+
+
+def test_batch_sends_one_eval(fdtd, transport):
+    with fdtd.batch():
+        fdtd.add_structure_circle(Point(0, 0), 0.1, rename="circle_0")
+        fdtd.add_structure_circle(Point(0.5, 0), 0.1, rename="circle_1")
+        fdtd.set_disable("circle_0")
+    assert transport.get_call_count("eval") == 1
+
+
+def test_run_checks_completion_only_when_set(fdtd, transport):
+    fdtd.add_power_monitor(Point(0, 0), monitor_name="monitor")
+    transport.reset()
+    fdtd.run("temp")
+    assert transport.get_call_count("getv") == 0
+    fdtd.set_completion_check("status")
+    fdtd.run("temp")
+    assert transport.get_call_count("getv") == 1
+    assert fdtd.get_run_statistics()["retries"] == 0
+
+
+def test_completion_check_skips_disabled_and_removed_monitors(fdtd, transport):
+    fdtd.set_completion_check("status")
+    for name in ["monitor_0", "monitor_1", "other"]:
+        fdtd.add_power_monitor(Point(0, 0), monitor_name=name)
+    fdtd.set_disable("monitor_*")
+    fdtd.remove("other")
+    fdtd.run("temp")
+    check_script = [call[1] for call in transport.calls if call[0] == "eval" and "splayout_status" in call[1]][-1]
+    assert "monitor_0" not in check_script and "other" not in check_script
+    fdtd.set_enable(["monitor_1"])
+    fdtd.run("temp")
+    check_script = [call[1] for call in transport.calls if call[0] == "eval" and "splayout_status" in call[1]][-1]
+    assert "monitor_1" in check_script and "monitor_0" not in check_script
+
+
+def test_fetch_results_matches_single_getters(make_fdtd):
+    fdtd, transport = make_fdtd(frequency_points=5)
+    fdtd.add_mode_source(Point(0, 0), width=1, source_name="source", wavelength_start=1.5, wavelength_end=1.6)
+    fdtd.add_power_monitor(Point(1, 0), width=1, monitor_name="monitor", points=5)
+    fdtd.add_mode_expansion(Point(1, 0), mode_list=[1], width=1, expansion_name="expansion", points=5)
+    fdtd.run("temp")
+    transport.reset()
+    result = fdtd.fetch_results({"monitor": "transmission", "expansion": ["mode_transmission", "mode_coefficient"],
+                                 "source": "source_power"})
+    assert transport.get_call_count("eval") == 1
+    assert transport.get_call_count("getv") == 1
+    assert result["monitor", "transmission"].shape == (2, 5)
+    assert result["expansion", "mode_transmission"].shape == (1, 2, 5)
+    assert result["source", "source_power"].shape == (5,)
+    ## the fake fills the datasets randomly, so only the formats are compared with the single getters
+    assert np.array_equal(result["monitor", "transmission"][0], fdtd.get_transmission("monitor")[0])
+    assert result["expansion", "mode_transmission"].shape == fdtd.get_mode_transmission("expansion").shape
+    assert result["expansion", "mode_coefficient"].shape == fdtd.get_mode_coefficient("expansion").shape
+
+
+def test_job_queue_order_and_saved_file(fdtd, transport):
+    fdtd.save("base")
+    fdtd.add_job("job_0")
+    fdtd.add_job("job_1")
+    jobs = fdtd.run_jobs()
+    evals = [call[1] for call in transport.calls if call[0] == "eval"]
+    assert evals == ["clearjobs;", "addjob(\"job_0.fsp\");", "addjob(\"job_1.fsp\");", "runjobs;"]
+    assert [job.filepath for job in jobs] == ["job_0.fsp", "job_1.fsp"]
+    assert fdtd._FDTDSimulation__saved_filename == "base"
+    jobs[1].load()
+    assert transport.calls[-1] == ("eval", "load(\"job_1.fsp\");")
+    ## the jobs do not replace the project file of run, so it is not saved again with the "never" policy
+    fdtd.set_save_policy("never")
+    transport.reset()
+    fdtd.run("base")
+    assert transport.get_call_count("save") == 0
+
+
+@pytest.mark.parametrize("policy, saved_runs", [("always", [1, 2, 3, 4]), ("every", [1, 3]), ("never", [1])])
+def test_save_policies(fdtd, transport, policy, saved_runs):
+    fdtd.set_save_policy(policy, every=2)
+    for i in range(4):
+        fdtd.run("temp")
+    statistics = fdtd.get_save_statistics()
+    assert [record["run"] for record in statistics["per_run"] if record["saved"]] == saved_runs
+    assert transport.get_call_count("save") == len(saved_runs)
+    with pytest.raises(Exception):
+        fdtd.set_save_policy("improvement")
+
+
+def test_checkpoint_copies_after_save(fdtd, transport, tmp_path):
+    filename = str(tmp_path / "design")
+    with open(filename + ".fsp", "wb") as file:
+        file.write(b"project")
+    fdtd.run(filename)
+    transport.reset()
+    assert fdtd.checkpoint(1.0)
+    assert transport.calls == [("save", (filename + ".fsp",))]
+    assert not fdtd.checkpoint(2.0)
+    assert fdtd.checkpoint(0.5, asynchronous=False)
+    checkpoints = fdtd.get_save_statistics()["checkpoints"]
+    assert len(checkpoints) == 2 and checkpoints[0]["bytes"] == len(b"project")
+    with open(filename + "_best.fsp", "rb") as file:
+        assert file.read() == b"project"
+
+
+class FailingRunTransport(FakeLumapiTransport):
+    def eval(self, command):
+        super().eval(command)
+        if (command == "run;"):
+            raise Exception("Solver error!")
+
+
+def test_run_raises_immediately_without_completion_check():
+    transport = FailingRunTransport()
+    fdtd = FDTDSimulation(transport=transport)
+    with pytest.raises(Exception):
+        fdtd.run("temp")
+    assert transport.calls.count(("eval", "run;")) == 1
+    assert fdtd.get_run_statistics() == {"runs": 1, "retries": 0, "failures": 1}
+    fdtd.set_completion_check("status", max_retries=2)
+    with pytest.raises(Exception):
+        fdtd.run("temp")
+    assert transport.calls.count(("eval", "run;")) == 4
+    assert fdtd.get_run_statistics()["retries"] == 2
+
+
+def test_run_retries_incomplete_simulations(make_fdtd):
+    fdtd, transport = make_fdtd(failure_rate=1)
+    fdtd.add_power_monitor(Point(0, 0), monitor_name="monitor")
+    fdtd.set_completion_check("status", max_retries=1)
+    transport.reset()
+    with pytest.raises(Exception):
+        fdtd.run("temp")
+    assert transport.calls.count(("eval", "run;")) == 2
+    fdtd.set_completion_check("time")
+    transport.reset()
+    fdtd.run("temp", min_time_threshold=0)
+    assert transport.calls.count(("eval", "run;")) == 1
+
+
+def count_source_power_fetches(transport):
+    return len([call for call in transport.calls if call[0] == "eval" and "sourcepower" in call[1]])
+
+
+@pytest.mark.parametrize("change", ["put_rectangle", "set_disable", "eval", "putv"])
+def test_changes_after_a_cached_read_force_a_fetch(fdtd, transport, change):
+    fdtd.add_mode_source(Point(0, 0), source_name="source")
+    fdtd.add_power_monitor(Point(1, 0), monitor_name="monitor", points=5)
+    fdtd.run("temp")
+    source_power = fdtd.get_source_power("source")
+    fdtd.get_transmission("monitor")
+    assert np.array_equal(fdtd.get_source_power("source"), source_power)
+    assert count_source_power_fetches(transport) == 1
+    if (change == "put_rectangle"):
+        fdtd.put_rectangle(Point(0, 0), Point(1, 1), -0.1, 0.1, "Si (Silicon) - Palik", "rectangle")
+    elif (change == "set_disable"):
+        fdtd.set_disable("monitor")
+    elif (change == "eval"):
+        fdtd.fdtd.eval("select(\"source\");set(\"x\",1e-6);")
+    else:
+        fdtd.fdtd.putv("topo_rho", np.ones((2, 2)))
+    fdtd.get_source_power("source")
+    assert count_source_power_fetches(transport) == 2
@@ -0,0 +1,81 @@
+import os
+import numpy as np
+import pytest
+from splayout.AdjointForTO import AdjointForTO
+from splayout.TopologyOptRegion2D import TopologyOptRegion2D
+from splayout.fdtdapi import FDTDSimulation
+from splayout.fieldtransfer import MappedComplexArray, complex_einsum
+from splayout.lumapitransport import FakeLumapiTransport
+from splayout.utils import Point
+
+
+@pytest.fixture
+def fdtd_and_transport(make_fdtd, tmp_path):
+    fdtd, transport = make_fdtd(frequency_points=4, monitor_shape=(5, 3, 2), seed=0)
+    fdtd.set_field_transfer("file", str(tmp_path))
+    return fdtd, transport
+
+
+def test_fields_are_memory_mapped(fdtd, transport):
+    E, x, y, z = fdtd.get_E_distribution(if_get_spatial=1)
+    assert isinstance(E, MappedComplexArray)
+    assert isinstance(E.real, np.memmap) and isinstance(E.imag, np.memmap)
+    assert E.shape == (5, 3, 2, 4, 3)
+    assert np.allclose(np.asarray(E), transport.variables["field_data"]["E"])
+    assert np.allclose(E[:, :, 0, 1, :], transport.variables["field_data"]["E"][:, :, 0, 1, :])
+    index = fdtd.get_epsilon_distribution()
+    assert index.shape == (5, 3, 2, 3)
+
+
+def test_transfers_do_not_overwrite_each_other(fdtd, transport, tmp_path):
+    first = fdtd.get_E_distribution()
+    first_values = np.array(first)
+    second = fdtd.get_E_distribution()
+    assert np.allclose(np.asarray(first), first_values)
+    assert not np.allclose(np.asarray(second), first_values)
+    assert len(os.listdir(str(tmp_path))) == 0
+
+
+def test_chunks_and_complex_einsum(fdtd, transport):
+    fdtd.add_mode_source(Point(0, 0))
+    fdtd.add_power_monitor(Point(1, 0), points=4)
+    fdtd.eval("field_data = getresult(\"field\",\"E\");")
+    E = transport.variables["field_data"]["E"]
+    for frequency_slice, field in fdtd.iter_E_distribution_in_CAD(chunk=3):
+        assert isinstance(field, MappedComplexArray)
+        assert np.allclose(complex_einsum("xyzfc,xyzfc->xyf", field, field),
+                           np.einsum("xyzfc,xyzfc->xyf", E[:, :, :, frequency_slice, :], E[:, :, :, frequency_slice, :]))
+    assert np.allclose(complex_einsum("xyzfc,xyzfc->xyf", E, E), np.einsum("xyzfc,xyzfc->xyf", E, E))
+
+
+class RepeatedResultTransport(FakeLumapiTransport):
+    ## the same synthetic data for every result, so that differently transferred gradients can be compared
+    def synthetic_result(self, monitor_name, dataset):
+        self.rng = np.random.default_rng(0)
+        return FakeLumapiTransport.synthetic_result(self, monitor_name, dataset)
+
+
+def get_adjoint(chunk):
+    transport = RepeatedResultTransport(frequency_points=7)
+    fdtd = FDTDSimulation(transport=transport)
+    fdtd.add_mode_source(Point(-1, 0), source_name="source")
+    fdtd.add_mode_source(Point(1, 0), source_name="adjoint_source")
+    fdtd.add_mode_expansion(Point(1, 0), mode_list=[1], expansion_name="fom", points=7)
+    region = TopologyOptRegion2D(Point(-0.2, -0.1), Point(0.2, 0.1), fdtd, x_mesh=0.1, y_mesh=0.04)
+    transport.monitor_shapes[region.field_region_name] = (region.get_x_size(), region.get_y_size(), 1)
+    adjoint = AdjointForTO(fdtd, "fom", np.full(7, 0.5), region, "source", "adjoint_source", chunk=chunk)
+    return adjoint, transport
+
+
+def test_chunked_gradient_matches_whole_gradient():
+    whole, _ = get_adjoint(None)
+    params = np.random.RandomState(0).rand(whole.design_region.get_x_size(), whole.design_region.get_y_size())
+    whole.call_fom(params)
+    whole_gradient = whole.call_grad(params)
+    assert np.all(whole_gradient != 0)
+    for chunk in [1, 3, 7]:
+        chunked, transport = get_adjoint(chunk)
+        chunked.call_fom(params)
+        assert chunked.forward_field_name in transport.variables
+        assert np.allclose(chunked.call_grad(params), whole_gradient, rtol=1e-9, atol=0)
+    assert chunked.forward_field_name != whole.forward_field_name
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from splayout.fdtdapi import FDTDSimulation
+from splayout.lumapitransport import FakeLumapiTransport
+
+
+def test_call_counts():
+    transport = FakeLumapiTransport()
+    transport.eval("a = 1;")
+    transport.putv("b", np.ones(3))
+    transport.getv("b")
+    transport.save("temp")
+    assert transport.get_call_count() == 4
+    assert transport.get_call_count("eval") == 1
+    assert transport.get_call_count("save") == 1
+    transport.reset()
+    assert transport.get_call_count() == 0
+
+
+def test_interpreted_results():
+    transport = FakeLumapiTransport(frequency_points=5, monitor_shape=(4, 3, 1))
+    transport.eval("run;")
+    transport.eval("data = getresult(\"field\",\"E\");splayout_E = data.E;ok = havedata(\"field\");")
+    assert transport.getv("splayout_E").shape == (4, 3, 1, 5, 3)
+    assert transport.getv("ok") == 1
+    transport.eval("switchtolayout;ok = havedata(\"field\");")
+    assert transport.getv("ok") == 0
+
+
+def test_if_blocks():
+    transport = FakeLumapiTransport()
+    transport.eval("flag = 0;if (flag) { a = 1; }b = 2;")
+    assert "a" not in transport.variables
+    assert transport.getv("b") == 2
+
+
+def test_unknown_functions_raise():
+    transport = FakeLumapiTransport(recorded_functions=["addjob"])
+    transport.addjob("temp.fsp")
+    assert transport.calls == [("addjob", ("temp.fsp",))]
+    with pytest.raises(AttributeError):
+        transport.svae("temp")
+    fdtd = FDTDSimulation(transport=transport)
+    generation = fdtd.fdtd.generation
+    with pytest.raises(AttributeError):
+        fdtd.fdtd.svae("temp")
+    assert fdtd.fdtd.generation == generation
+    assert type(fdtd.lumapi) == type(None)
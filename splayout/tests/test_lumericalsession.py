@@ -0,0 +1,93 @@
+import pytest
+from splayout.lumapitransport import FakeLumapiTransport
+from splayout.lumericalsession import LumericalSession, make_item_script, match_item_names
+
+
+def test_batch_sends_one_eval():
+    transport = FakeLumapiTransport()
+    session = LumericalSession(transport)
+    with session.batch():
+        for i in range(5):
+            session.eval("a" + str(i) + " = " + str(i) + ";")
+        assert transport.get_call_count("eval") == 0
+    assert transport.get_call_count("eval") == 1
+    assert transport.variables["a4"] == 4
+
+
+def test_batch_terminates_scripts():
+    transport = FakeLumapiTransport()
+    session = LumericalSession(transport)
+    with session.batch():
+        session.eval("a = 1")
+        session.eval("b = 2")
+    assert transport.get_call_count("eval") == 1
+    assert transport.variables["a"] == 1
+    assert transport.variables["b"] == 2
+
+
+def test_nested_batch_flushes_at_outermost_commit():
+    transport = FakeLumapiTransport()
+    session = LumericalSession(transport)
+    with session.batch():
+        with session.batch():
+            session.eval("a = 1;")
+        assert transport.get_call_count("eval") == 0
+        session.eval("b = 2;")
+    assert transport.get_call_count("eval") == 1
+
+
+def test_other_calls_flush_first():
+    transport = FakeLumapiTransport()
+    session = LumericalSession(transport)
+    with session.batch():
+        session.eval("a = 1;")
+        session.putv("b", 2)
+        session.eval("c = 3;")
+    assert [call[0] for call in transport.calls] == ["eval", "putv", "eval"]
+
+
+def test_exception_discards_buffer():
+    transport = FakeLumapiTransport()
+    session = LumericalSession(transport)
+    with pytest.raises(ValueError):
+        with session.batch():
+            session.eval("a = 1;")
+            raise ValueError()
+    assert transport.get_call_count("eval") == 0
+    assert not session.is_batching()
+
+
+def test_interrupted_batch_drops_scripts_and_origins(fdtd, transport):
+    profiler = fdtd.enable_profiler()
+    with pytest.raises(KeyboardInterrupt):
+        with fdtd.batch():
+            fdtd.eval("a = 1;")
+            fdtd.eval("b = 2;")
+            raise KeyboardInterrupt()
+    assert transport.get_call_count("eval") == 0
+    assert not fdtd.fdtd.is_batching()
+    with fdtd.batch():
+        fdtd.eval("c = 3;")
+    assert transport.calls == [("eval", "c = 3;")]
+    assert "a" not in transport.variables
+    assert [(record["origin"], record["count"]) for record in profiler.get_summary()] == [("FDTDSimulation.eval", 1)]
+
+
+def test_item_script_selects_names():
+    script = make_item_script(["a", "group::b"], "disable")
+    assert script == "select(\"a\");set(\"enabled\",0);select(\"group::b\");set(\"enabled\",0);"
+    assert make_item_script("a", "remove") == "select(\"a\");delete;"
+
+
+def test_item_script_sets_pattern_matches_by_index():
+    script = make_item_script("pixels*", "enable")
+    assert script.startswith("selectpartial(\"pixels\");")
+    assert "set(\"enabled\",1,splayout_i);" in script
+    assert "setnamed" not in script
+    assert "select(splayout_name);delete;" in make_item_script("pixels*", "remove")
+
+
+def test_match_item_names():
+    names = ["pixels_1", "pixels_2", "monitor", "my_pixels"]
+    assert match_item_names("pixels*", names) == ["pixels_1", "pixels_2"]
+    assert match_item_names(["monitor", "*_2"], names) == ["pixels_2", "monitor"]
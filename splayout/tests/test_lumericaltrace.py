@@ -0,0 +1,25 @@
+import numpy as np
+
+from splayout.lumapitransport import FakeLumapiTransport
+from splayout.lumericaltrace import LumericalTraceReplayer
+from splayout.utils import Point
+
+
+def test_trace_replays_the_same_calls(fdtd, transport, tmp_path):
+    filename = str(tmp_path / "trace.gz")
+    fdtd.start_trace(filename)
+    for i in range(3):
+        fdtd.add_structure_circle(Point(0, 0), 0.1, rename="circle")
+    fdtd.fdtd.putv("matrix", np.arange(6.0).reshape(2, 3))
+    fdtd.stop_trace()
+    replayer = LumericalTraceReplayer(filename)
+    statistics = replayer.get_statistics()
+    assert statistics["calls"] == {"eval": transport.get_call_count("eval"), "putv": 1}
+    ## the repeated circles only add references to the scripts of the first one
+    assert statistics["unique_scripts"] * 3 == statistics["calls"]["eval"]
+    target = FakeLumapiTransport()
+    replay_statistics = replayer.replay(target)
+    assert replay_statistics["calls"] == len(transport.calls)
+    assert replay_statistics["errors"] == 0
+    assert target.calls == transport.calls
+    assert np.array_equal(target.variables["matrix"], transport.variables["matrix"])
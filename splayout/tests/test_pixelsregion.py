@@ -0,0 +1,138 @@
+import gdspy
+import numpy as np
+import pytest
+
+from splayout.pixelsregion import CirclePixelsRegion, RectanglePixelsRegion, RasterPixelsRegion
+from splayout.utils import Point, Cell, Layer, Y_MIRROR, common_lib
+
+
+def make_region(region_type, fdtd, transport):
+    if region_type == "circle":
+        region = CirclePixelsRegion(Point(-1, -1), Point(1, 1), 0.05, fdtd)
+    else:
+        region = RectanglePixelsRegion(Point(-1, -1), Point(1, 1), 0.05, 0.05, fdtd)
+    transport.reset()
+    return region
+
+
+@pytest.mark.parametrize("region_type", ["circle", "rectangle"])
+def test_initialization_sends_one_putv_and_one_loop(region_type, fdtd, transport):
+    region = make_region(region_type, fdtd, transport)
+    matrix = np.zeros((4, 5))
+    matrix[1, 2] = 1
+    region.update(matrix)
+    assert [call[0] for call in transport.calls] == ["eval", "putv", "eval"]
+    assert "for (splayout_i" in transport.calls[-1][1]
+
+
+@pytest.mark.parametrize("region_type", ["circle", "rectangle"])
+def test_update_sends_only_changed_pixels(region_type, fdtd, transport):
+    region = make_region(region_type, fdtd, transport)
+    matrix = np.zeros((4, 5))
+    region.update(matrix)
+    matrix[0, 3] = 1
+    transport.reset()
+    region.update(matrix)
+    assert [call[0] for call in transport.calls] == ["eval", "eval", "putv", "eval"]
+    pixels = transport.variables["splayout_pixels"]
+    assert pixels.shape[0] == 1
+    assert np.array_equal(pixels[0, 0:2], [0, 3])
+    assert pixels[0, -1] == 1
+    transport.reset()
+    region.update(matrix)
+    assert transport.get_call_count("putv") == 0
+    assert transport.get_call_count("eval") == 2
+
+
+@pytest.mark.parametrize("pixel_shape, pixel_size", [("rectangle", 0.5), ("circle", 0.25)])
+def test_raster_update_imports_the_index(fdtd, transport, pixel_shape, pixel_size):
+    region = RasterPixelsRegion(Point(-1, -1), Point(1, 1), pixel_size, fdtd, pixel_shape=pixel_shape, x_mesh=0.05, y_mesh=0.05)
+    matrix = np.zeros((4, 4))
+    matrix[0, 0] = 1
+    region.update(matrix)
+    assert [call[0] for call in transport.calls] == ["eval", "putv", "eval"]
+    script = transport.calls[-1][1]
+    assert "delete;" not in script
+    assert script.count("addimport;") == 1 and "importnk2(splayout_raster_n," in script
+    index = transport.variables["splayout_raster_index"]
+    assert index.shape == (region.x_size, region.y_size)
+    ## the pixel (0, 0) is the upper left one, its center is etched and the rest of the region is not
+    center = (np.argmin(np.abs(region.x_positions + 0.75)), np.argmin(np.abs(region.y_positions - 0.75)))
+    assert index[center] == region.pixel_index
+    assert np.sum(index == region.pixel_index) < index.size / 16 + 2 * region.x_size
+    assert np.all(index[:, region.y_positions < 0] == region.background_index)
+    assert np.array_equal(index, region.get_index_distribution(matrix))
+    matrix[3, 3] = 1
+    transport.reset()
+    region.update(matrix)
+    assert [call[0] for call in transport.calls] == ["eval", "putv", "eval"]
+    assert transport.calls[-1][1].startswith("select(\"RasterPixels\");delete;addimport;")
+    transport.reset()
+    region.update(matrix)
+    assert transport.get_call_count() == 0
+
+
+def get_sorted_polygons(cell):
+    polygons = [np.round(polygon, 6) for polygon in cell.cell.get_polygons()]
+    return sorted(polygons, key=lambda polygon: tuple(polygon.flatten()))
+
+
+@pytest.mark.parametrize("merge", [False, True])
+@pytest.mark.parametrize("region_type", ["circle", "rectangle"])
+def test_batch_draw_layout_matches_single_draws(region_type, merge, fdtd):
+    matrix_mask = np.ones((4, 6))
+    matrix_mask[0, 0] = 0
+    matrix_mask[0, 5] = 0
+    if region_type == "circle":
+        region = CirclePixelsRegion(Point(-1, -1), Point(1, 1), 0.1, fdtd, matrix_mask=matrix_mask, symmetry=Y_MIRROR)
+    else:
+        region = RectanglePixelsRegion(Point(-1, -1), Point(1, 1), 0.25, 0.2, fdtd, matrix_mask=matrix_mask, symmetry=Y_MIRROR)
+    population = np.random.RandomState(0).rand(3, region.get_dof())
+    population[0, :] = 1
+    lib = gdspy.GdsLibrary()
+    layer = Layer(1)
+    ## gdspy keeps every cell name in its current library, so the names are unique across the parameters
+    name = "{}_{}".format(region_type, merge)
+    cells = [Cell("{}_batch_{}".format(name, i), lib=lib) for i in range(0, population.shape[0])]
+    region.draw_layout(population, cells, layer, merge=merge)
+    for i in range(0, population.shape[0]):
+        single = Cell("{}_single_{}".format(name, i), lib=lib)
+        region.draw_layout(population[i], single, layer, merge=merge)
+        batch_polygons = get_sorted_polygons(cells[i])
+        single_polygons = get_sorted_polygons(single)
+        assert len(batch_polygons) > 0 and len(batch_polygons) == len(single_polygons)
+        assert all(np.array_equal(a, b) for a, b in zip(batch_polygons, single_polygons))
+    with pytest.raises(Exception):
+        region.draw_layout(population, cells[0:2], layer, merge=merge)
+
+
+@pytest.mark.parametrize("region_type", ["circle", "rectangle"])
+def test_merged_drawing_matches_unmerged_drawing(region_type, fdtd):
+    if region_type == "circle":
+        region = CirclePixelsRegion(Point(-1, -1), Point(1, 1), 0.1, fdtd, group_name="merge_test")
+    else:
+        region = RectanglePixelsRegion(Point(-1, -1), Point(1, 1), 0.25, 0.2, fdtd)
+    matrix = np.random.RandomState(0).rand(8, 10)
+    matrix[matrix > 0.6] = 1
+    matrix[matrix < 0.2] = 0
+    lib = gdspy.GdsLibrary()
+    layer = Layer(1)
+    merged = Cell("{}_merged".format(region_type), lib=lib)
+    unmerged = Cell("{}_unmerged".format(region_type), lib=lib)
+    region.draw_layout(matrix, merged, layer, merge=True)
+    region.draw_layout(matrix, unmerged, layer)
+    merged_polygons = merged.cell.get_polygons()
+    unmerged_polygons = unmerged.cell.get_polygons()
+    if region_type == "circle":
+        ## every circle is still drawn once, as a reference of the cell of its radius in the library of the target cell
+        assert len(merged_polygons) == len(unmerged_polygons)
+        assert len(merged.cell.references) < len(unmerged_polygons)
+        assert all(reference.ref_cell.name in lib.cells for reference in merged.cell.references)
+        assert not any(name.startswith("merge_test_circle") for name in common_lib.cells)
+    else:
+        assert len(merged_polygons) < len(unmerged_polygons)
+    ## the merged circles have their radius rounded to 1e-4 um, so the XOR is at most a band of that width on the outlines
+    difference = gdspy.boolean(merged_polygons, unmerged_polygons, "xor", precision=1e-6)
+    area = 0 if type(difference) == type(None) else difference.area()
+    perimeter = np.sum([np.sum(np.linalg.norm(polygon - np.roll(polygon, 1, axis=0), axis=1)) for polygon in unmerged_polygons])
+    assert area < 1e-4 * perimeter
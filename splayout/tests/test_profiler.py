@@ -0,0 +1,58 @@
+import csv
+import json
+import numpy as np
+
+from splayout.utils import Point
+
+
+def get_counts(profiler):
+    return dict([((item["origin"], item["category"]), item["count"]) for item in profiler.get_summary()])
+
+
+def test_counts_and_origins(fdtd, transport):
+    profiler = fdtd.enable_profiler()
+    fdtd.add_structure_circle(Point(0, 0), 0.1, rename="circle")
+    circle_evals = transport.get_call_count("eval")
+    fdtd.run("temp")
+    fdtd.fdtd.eval("a = 1;")
+    counts = get_counts(profiler)
+    assert sum(counts.values()) == transport.get_call_count()
+    assert counts[("FDTDSimulation.add_structure_circle", "eval")] == circle_evals
+    assert counts[("FDTDSimulation.run", "run")] == 1
+    assert counts[("user", "eval")] == 1
+
+
+def test_batched_evals_keep_their_origins(fdtd, transport):
+    profiler = fdtd.enable_profiler()
+    with fdtd.batch():
+        fdtd.add_structure_circle(Point(0, 0), 0.1, rename="circle")
+        fdtd.set_disable("circle")
+    assert transport.get_call_count("eval") == 1
+    counts = get_counts(profiler)
+    assert set(counts.keys()) == {("FDTDSimulation.add_structure_circle", "eval"), ("FDTDSimulation.set_disable", "eval")}
+    assert counts[("FDTDSimulation.set_disable", "eval")] == 1
+
+
+def test_iterations_histogram_and_export(fdtd, transport, tmp_path):
+    profiler = fdtd.enable_profiler()
+    call_back = profiler.wrap_callback()
+    for i in range(2):
+        fdtd.fdtd.eval("a = 1;")
+        fdtd.fdtd.putv("b", np.ones(3))
+        with profiler.section("post-processing"):
+            np.ones(10).sum()
+        call_back()
+    iterations = profiler.get_iterations()
+    assert len(iterations) == 2
+    assert [call["category"] for call in iterations[0]["calls"]] == ["python", "eval", "putv"]
+    counts, edges = profiler.get_histogram(category="eval")
+    assert counts.sum() == 2 and edges.size == counts.size + 1
+    profiler.export_json(str(tmp_path / "profile.json"))
+    with open(str(tmp_path / "profile.json")) as file:
+        report = json.load(file)
+    assert len(report["iterations"]) == 2 and len(report["summary"]) == 3
+    profiler.export_csv(str(tmp_path / "profile.csv"))
+    with open(str(tmp_path / "profile.csv"), newline="") as file:
+        rows = list(csv.reader(file))
+    assert rows[0][0:4] == ["iteration", "origin", "category", "count"]
+    assert len(rows) == 1 + 2 * 3
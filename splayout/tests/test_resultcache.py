@@ -0,0 +1,71 @@
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from splayout.resultcache import ResultCache
+
+
+def test_memoize_hits_and_misses():
+    cache = ResultCache(max_size=2)
+    calls = []
+
+    def spectrum(solution):
+        calls.append(1)
+        return np.asarray(solution, dtype=np.double) * 2
+
+    cached = cache.memoize(spectrum, config={"monitor": "expansion"})
+    cached(np.array([1, 0, 1]))
+    cached(np.array([1, 0, 1]))
+    cached(np.array([0, 0, 1]))
+    assert len(calls) == 2
+    assert cache.get_statistics()["hits"] == 1
+    assert cache.get_statistics()["misses"] == 2
+
+
+def test_lru_eviction():
+    cache = ResultCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert "a" in cache and "c" in cache and "b" not in cache
+
+
+def test_returned_array_stays_writable():
+    cache = ResultCache()
+    gradient = np.ones(4)
+    cached = cache.memoize(lambda solution: gradient, config="gradient")
+    value = cached(np.zeros(4))
+    value *= 2
+    assert np.all(gradient == 2)
+    cached_value = cache.get(cache.hash_state(np.zeros(4), "gradient", None))
+    assert np.all(cached_value == 1)
+    assert not cached_value.flags.writeable
+
+
+def test_disk_tier(tmp_path):
+    ResultCache(cache_dir=str(tmp_path)).put("key", np.arange(3))
+    cache = ResultCache(cache_dir=str(tmp_path))
+    assert np.all(cache.get("key") == np.arange(3))
+    assert cache.get_statistics()["disk_hits"] == 1
+
+
+def test_setups_do_not_share_results():
+    cache = ResultCache()
+    other_region = np.zeros(3)
+    first = cache.memoize(lambda solution: 1.0, config={"monitor": "expansion_0"}, state=lambda: other_region)
+    second = cache.memoize(lambda solution: 2.0, config={"monitor": "expansion_1"}, state=lambda: other_region)
+    solution = np.array([1, 0, 1])
+    assert first(solution) == 1.0 and second(solution) == 2.0
+    other_region[0] = 1
+    first(solution)
+    assert cache.get_statistics()["misses"] == 3 and len(cache) == 3
+
+
+def test_threads_share_the_cache():
+    cache = ResultCache(max_size=8)
+    cached = cache.memoize(lambda solution: float(np.sum(solution)), config="sum")
+    solutions = [np.array([i % 16, 1]) for i in range(400)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        costs = list(executor.map(cached, solutions))
+    assert costs == [float(np.sum(solution)) for solution in solutions]
+    statistics = cache.get_statistics()
+    assert statistics["hits"] + statistics["misses"] == 400 and len(cache) == 8
@@ -0,0 +1,39 @@
+import numpy as np
+from splayout.simulationpool import SimulationPool
+from splayout.lumapitransport import FakeLumapiTransport
+from splayout.BinaryGeneticAlgorithm import BinaryGeneticAlgorithm
+
+TARGET = np.array([1, 0, 1, 1, 0, 0, 1, 0])
+
+
+def engine_cost(fdtd_engine, solution):
+    fdtd_engine.eval("a = 1;")
+    return float(np.sum(np.abs(np.asarray(solution) - TARGET)))
+
+
+def solution_cost(solution):
+    fdtd_engine = SimulationPool.get_worker_engine()
+    fdtd_engine.eval("a = 1;")
+    return float(np.sum(np.abs(np.asarray(solution) - TARGET)))
+
+
+def solution_cost_without_pool(solution):
+    return float(np.sum(np.abs(np.asarray(solution) - TARGET)))
+
+
+def test_map_passes_engine():
+    with SimulationPool(processes=2, transport_factory=FakeLumapiTransport) as pool:
+        costs = pool.map(engine_cost, [TARGET, 1 - TARGET])
+    assert np.all(costs == [0, 8])
+
+
+def test_optimizer_with_pool():
+    np.random.seed(0)
+    with SimulationPool(processes=2, transport_factory=FakeLumapiTransport, pass_engine=False) as pool:
+        optimizer = BinaryGeneticAlgorithm(6, TARGET.size, solution_cost, max_iteration=5, executor=pool)
+        optimizer.run()
+    np.random.seed(0)
+    sequential = BinaryGeneticAlgorithm(6, TARGET.size, solution_cost_without_pool, max_iteration=5)
+    sequential.run()
+    assert optimizer.get_min_cost() == sequential.get_min_cost()
+    assert np.all(optimizer.cg_curve == sequential.cg_curve)
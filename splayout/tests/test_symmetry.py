@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from splayout.AdjointForTO import AdjointForTO
+from splayout.TopologyOptRegion2D import TopologyOptRegion2D
+from splayout.symmetry import get_symmetry_index, expand_symmetric, reduce_symmetric
+from splayout.utils import Point, X_MIRROR, Y_MIRROR, XY_MIRROR, C2
+
+
+def make_region(fdtd, symmetry = None):
+    return TopologyOptRegion2D(Point(-0.2, -0.1), Point(0.2, 0.1), fdtd, x_mesh=0.1, y_mesh=0.04, symmetry=symmetry)
+
+
+@pytest.mark.parametrize("symmetry", [X_MIRROR, Y_MIRROR, XY_MIRROR, C2])
+def test_expand_reduce_round_trip(symmetry):
+    index = get_symmetry_index((5, 6), symmetry)
+    params = np.random.RandomState(0).rand(int(index.max()) + 1)
+    matrix = expand_symmetric(params, index)
+    if symmetry in [X_MIRROR, XY_MIRROR]:
+        assert np.array_equal(matrix, matrix[::-1, :])
+    if symmetry in [Y_MIRROR, XY_MIRROR]:
+        assert np.array_equal(matrix, matrix[:, ::-1])
+    if symmetry == C2:
+        assert np.array_equal(matrix, matrix[::-1, ::-1])
+    ## the reduced gradient of a linear function is the sum of the weights of the symmetric copies
+    weights = np.random.RandomState(1).rand(5, 6)
+    gradient = reduce_symmetric(weights, index)
+    step = np.random.RandomState(2).rand(params.size)
+    assert np.isclose(np.sum(weights * expand_symmetric(step, index)), np.dot(gradient, step))
+
+
+def test_region_accepts_matrix_and_vector(fdtd, transport):
+    region = make_region(fdtd, Y_MIRROR)
+    x_size, y_size = region.get_x_size(), region.get_y_size()
+    vector = np.linspace(0, 1, region.get_dof())
+    matrix = region.expand_parameters(vector)
+    assert matrix.shape == (x_size, y_size)
+    assert np.array_equal(region.expand_parameters(matrix), matrix)
+    assert np.array_equal(region.expand_parameters(matrix.flatten()), matrix)
+    region.update(vector)
+    assert np.array_equal(transport.variables["topo_rho"], matrix)
+    with pytest.raises(Exception):
+        region.expand_parameters(np.zeros(region.get_dof() + 1))
+
+
+def test_adjoint_gradient_of_y_antisymmetric_region(fdtd):
+    region = make_region(fdtd, Y_MIRROR)
+    adjoint = AdjointForTO(region.fdtd_engine, "fom", np.ones(3), region, "source", "adjoint_source", y_antisymmetric=1)
+    x_size, y_size = region.get_x_size(), region.get_y_size()
+    upper = np.random.RandomState(0).rand(x_size, y_size - int(y_size / 2))
+    full = adjoint._AdjointForTO__unfold_gradient(upper.flatten())
+    assert full.shape == (x_size, y_size)
+    assert np.array_equal(full, full[:, ::-1])
+    assert np.array_equal(full[:, int(y_size / 2):], upper)
+    assert np.allclose(region.reduce_gradient(full), region.reduce_gradient(np.reshape(full, -1)))
+    assert np.array_equal(adjoint._AdjointForTO__unfold_gradient(full.flatten()), full)
+
+
+def get_adjoint_gradient(make_fdtd, symmetry):
+    fdtd, transport = make_fdtd(frequency_points=4, seed=0)
+    fdtd.add_mode_source(Point(-1, 0), source_name="source")
+    fdtd.add_mode_source(Point(1, 0), source_name="adjoint_source")
+    fdtd.add_mode_expansion(Point(1, 0), mode_list=[1], expansion_name="fom", points=4)
+    region = make_region(fdtd, symmetry)
+    transport.monitor_shapes[region.field_region_name] = (region.get_x_size(), region.get_y_size(), 1)
+    adjoint = AdjointForTO(fdtd, "fom", np.ones(4), region, "source", "adjoint_source", y_antisymmetric=True)
+    params = np.full(region.get_dof(), 0.5)
+    adjoint.call_fom(params)
+    return adjoint.call_grad(params), region
+
+
+def test_y_antisymmetric_gradient_shapes(make_fdtd):
+    old_gradient, region = get_adjoint_gradient(make_fdtd, None)
+    x_size, y_size = region.get_x_size(), region.get_y_size()
+    ## without symmetry the gradient keeps the baseline shape: the upper half in y
+    assert old_gradient.shape == (x_size * (y_size - int(y_size / 2)),)
+    new_gradient, region = get_adjoint_gradient(make_fdtd, Y_MIRROR)
+    assert new_gradient.shape == (region.get_dof(),)
+    ## every reduced parameter is a mirrored pair of pixels, so it gets the upper-half gradient twice
+    upper = np.reshape(old_gradient, (x_size, y_size - int(y_size / 2)))
+    assert np.allclose(new_gradient, 2 * upper[:, ::-1][:, 0:int(y_size / 2)].flatten())
+    xy_gradient, region = get_adjoint_gradient(make_fdtd, XY_MIRROR)
+    assert xy_gradient.shape == (region.get_dof(),)
+    assert np.isclose(np.sum(xy_gradient), np.sum(new_gradient))
@@ -15,6 +15,10 @@ SiO2 = "SiO2 (Glass) - Palik"
 ETCH = "etch"
 FORWARD = 1
 BACKWARD = 0
+X_MIRROR = "x_mirror"
+Y_MIRROR = "y_mirror"
+XY_MIRROR = "xy_mirror"
+C2 = "c2"
 
 ## global library
 common_lib = gdspy.GdsLibrary(unit=1.0e-6, precision=1.0e-9)
@@ -166,6 +170,7 @@ class Cell():
         if type(name) != str :
             raise Exception("The name of a cell should be a string!")
         self.cell = lib.new_cell(name,  overwrite_duplicate=True)
+        self.lib = lib
 
     def remove_components(self):
         """